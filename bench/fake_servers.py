@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+"""Servidores locais que imitam os serviços externos usados nas verificações.
+
+- Bibliotecas de anúncios: páginas HTML (fixtures) do Facebook e do Google para
+  o navegador, e as respostas JSON que o backend HTTP direto consulta
+  (Graph API `ads_archive` e RPC SearchCreatives).
+- ReceitaWS: JSON de CNPJ com 429 configurável (fração das respostas ou
+  limite por minuto) e Retry-After.
+- LLM: endpoint `/v1/chat/completions` compatível com a API da OpenAI.
+
+Alvos com "semanuncios" no nome (usuário ou domínio) não têm anúncios; os
+demais têm. Cada servidor roda em uma thread própria em 127.0.0.1, porta livre.
+"""
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+FIXTURES = Path(__file__).parent / "fixtures"
+SEM_ANUNCIOS = "semanuncios"
+
+
+def _fixture(nome):
+    return (FIXTURES / nome).read_text(encoding="utf-8")
+
+
+def _preencher(modelo, **valores):
+    for chave, valor in valores.items():
+        modelo = modelo.replace("{" + chave + "}", str(valor))
+    return modelo
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, como os serviços reais
+
+    def log_message(self, formato, *args):
+        pass
+
+    def _atrasar(self):
+        atraso = self.server.config.get("latencia", 0.0)
+        if atraso:
+            time.sleep(atraso * random.uniform(0.5, 1.5))
+
+    def _responder(self, status, corpo, tipo="application/json; charset=utf-8", cabecalhos=None):
+        dados = corpo.encode("utf-8") if isinstance(corpo, str) else corpo
+        self.send_response(status)
+        self.send_header("Content-Type", tipo)
+        self.send_header("Content-Length", str(len(dados)))
+        for nome, valor in (cabecalhos or {}).items():
+            self.send_header(nome, valor)
+        self.end_headers()
+        self.wfile.write(dados)
+
+    def _json(self, status, dados, cabecalhos=None):
+        self._responder(status, json.dumps(dados, ensure_ascii=False), cabecalhos=cabecalhos)
+
+    def _ler_corpo(self):
+        tamanho = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(tamanho).decode("utf-8") if tamanho else ""
+
+
+class AdLibraryHandler(_Handler):
+    """Páginas e APIs das bibliotecas de anúncios do Facebook e do Google."""
+
+    def do_GET(self):
+        self._atrasar()
+        url = urlsplit(self.path)
+        params = parse_qs(url.query)
+        total = self.server.config.get("anuncios", 8)
+        if url.path.startswith("/ads/library"):
+            consulta = params.get("q", [""])[0]
+            self._responder(200, self._pagina("facebook", consulta, total), tipo="text/html; charset=utf-8")
+        elif url.path.endswith("/ads_archive"):
+            consulta = params.get("search_terms", [""])[0]
+            anuncios = [] if SEM_ANUNCIOS in consulta else [
+                {"page_name": consulta, "ad_delivery_start_time": f"2024-05-{i + 1:02d}"} for i in range(total)
+            ]
+            self._json(200, {"data": anuncios})
+        elif url.path == "/" and "domain" in params:
+            consulta = params["domain"][0]
+            self._responder(200, self._pagina("google", consulta, total), tipo="text/html; charset=utf-8")
+        else:
+            self._json(404, {"error": "not found"})
+
+    def do_POST(self):
+        self._atrasar()
+        if not urlsplit(self.path).path.endswith("/SearchCreatives"):
+            self._json(404, {"error": "not found"})
+            return
+        try:
+            req = json.loads(parse_qs(self._ler_corpo()).get("f.req", ["{}"])[0])
+            dominio = req["3"]["12"]["1"]
+        except (ValueError, KeyError, TypeError):
+            self._json(400, {"error": "bad request"})
+            return
+        total = self.server.config.get("anuncios", 8)
+        criativos = [] if SEM_ANUNCIOS in dominio else [
+            {"1": f"AR{i:08d}", "12": f"{dominio} Empresa Ltda"} for i in range(total)
+        ]
+        self._json(200, {"1": criativos})
+
+    def _pagina(self, plataforma, consulta, total):
+        if SEM_ANUNCIOS in consulta:
+            return _preencher(_fixture(f"{plataforma}_inactive.html"), consulta=consulta)
+        cartao = _fixture(f"{plataforma}_card.html")
+        cartoes = "\n".join(_preencher(cartao, consulta=consulta, indice=i + 1) for i in range(total))
+        return _preencher(_fixture(f"{plataforma}_active.html"), consulta=consulta, total=total, cards=cartoes)
+
+
+class ReceitaWSHandler(_Handler):
+    """API de CNPJ da ReceitaWS com limite de taxa simulado."""
+
+    def do_GET(self):
+        self._atrasar()
+        partes = urlsplit(self.path).path.rstrip("/").split("/")
+        if len(partes) < 2 or partes[-2] != "cnpj":
+            self._json(404, {"error": "not found"})
+            return
+        if self.server.deve_limitar():
+            self._json(429, {"status": "ERROR", "message": "Too many requests"},
+                       cabecalhos={"Retry-After": str(self.server.config.get("retry_after", 5))})
+            return
+        cnpj = partes[-1]
+        self._json(200, {
+            "status": "OK",
+            "cnpj": cnpj,
+            "nome": f"EMPRESA {cnpj[:8]} LTDA",
+            "situacao": "ATIVA",
+            "qsa": [
+                {"nome": "FULANO DE TAL", "qual": "49-Sócio-Administrador"},
+                {"nome": "BELTRANA DA SILVA", "qual": "22-Sócio"},
+            ],
+        })
+
+
+class OpenAIHandler(_Handler):
+    """Chat completions mínimo: responde "Sim"/"Não" conforme o alvo do prompt."""
+
+    def do_POST(self):
+        self._atrasar()
+        if not urlsplit(self.path).path.endswith("/chat/completions"):
+            self._json(404, {"error": {"message": "not found"}})
+            return
+        try:
+            corpo = json.loads(self._ler_corpo() or "{}")
+        except ValueError:
+            corpo = {}
+        prompt = " ".join(str(m.get("content", "")) for m in corpo.get("messages", []) if isinstance(m, dict))
+        resposta = "Não" if SEM_ANUNCIOS in prompt else "Sim"
+        if "Final Answer" in prompt:
+            # Agentes no formato ReAct (CrewAI) esperam a resposta final nesse formato
+            resposta = f"Thought: I now can give a great answer\nFinal Answer: {resposta}"
+        tokens_prompt = max(1, len(prompt) // 4)
+        self._json(200, {
+            "id": f"chatcmpl-bench-{random.getrandbits(32):08x}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": corpo.get("model", "gpt-4o-mini"),
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": resposta}}],
+            "usage": {"prompt_tokens": tokens_prompt, "completion_tokens": 2,
+                      "total_tokens": tokens_prompt + 2},
+        })
+
+
+class _Servidor(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, handler, config):
+        super().__init__(("127.0.0.1", 0), handler)
+        self.config = config
+        self._lock = threading.Lock()
+        self._janela = []  # Instantes das respostas do último minuto (limite por minuto)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def deve_limitar(self):
+        """429 por sorteio (`taxa_429`) ou ao passar de `limite_por_minuto` respostas."""
+        if random.random() < self.config.get("taxa_429", 0.0):
+            return True
+        limite = self.config.get("limite_por_minuto")
+        if not limite:
+            return False
+        with self._lock:
+            agora = time.monotonic()
+            self._janela = [t for t in self._janela if agora - t < 60]
+            if len(self._janela) >= limite:
+                return True
+            self._janela.append(agora)
+            return False
+
+
+class FakeUpstreams:
+    """Sobe os três servidores e informa as variáveis de ambiente que apontam para eles."""
+
+    def __init__(self, latencia=0.0, anuncios=8, taxa_429=0.0, limite_por_minuto=None, retry_after=5,
+                 latencia_llm=0.0):
+        self.servidores = {
+            "ads": _Servidor(AdLibraryHandler, {"latencia": latencia, "anuncios": anuncios}),
+            "receitaws": _Servidor(ReceitaWSHandler, {
+                "latencia": latencia, "taxa_429": taxa_429,
+                "limite_por_minuto": limite_por_minuto, "retry_after": retry_after,
+            }),
+            "llm": _Servidor(OpenAIHandler, {"latencia": latencia_llm}),
+        }
+        self._threads = []
+
+    def start(self):
+        for nome, servidor in self.servidores.items():
+            thread = threading.Thread(target=servidor.serve_forever, name=f"fake-{nome}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self):
+        for servidor in self.servidores.values():
+            servidor.shutdown()
+            servidor.server_close()
+
+    def environ(self):
+        ads = self.servidores["ads"].url
+        llm = self.servidores["llm"].url
+        return {
+            "FACEBOOK_ADS_LIBRARY_URL": f"{ads}/ads/library/",
+            "GOOGLE_ADS_TRANSPARENCY_URL": f"{ads}/",
+            "FACEBOOK_AD_LIBRARY_API_URL": f"{ads}/v19.0/ads_archive",
+            "FACEBOOK_AD_LIBRARY_TOKEN": "bench",
+            "GOOGLE_ADS_RPC_URL": f"{ads}/anji/_/rpc/SearchService/SearchCreatives?authuser=",
+            "RECEITAWS_API_URL": f"{self.servidores['receitaws'].url}/v1/cnpj/",
+            "OPENAI_API_BASE": f"{llm}/v1",
+            "OPENAI_BASE_URL": f"{llm}/v1",
+        }
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""Orçamento de tempo de import: src.main e os caminhos só de pontuação.
+
+Cada módulo é importado em um interpretador novo (como um worker recém-criado)
+algumas vezes; vale a mediana. Termina com código 1 se algum passar do
+orçamento ou se carregar um backend pesado (Crawl4AI, CrewAI, Playwright...)
+que deveria ficar para a primeira extração/análise.
+
+Uso:
+    python -m bench.import_budget
+    python -m bench.import_budget --budget 0.8 --runs 5 --top 15
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Módulo -> orçamento (s) padrão
+ORCAMENTOS = {
+    "src.main": 1.0,
+    "src.scoring": 0.2,
+}
+BACKENDS_PESADOS = ("crawl4ai", "crewai", "playwright", "litellm", "chromadb", "numpy")
+
+_SCRIPT = """
+import json, sys, time
+inicio = time.perf_counter()
+import {modulo}
+duracao = time.perf_counter() - inicio
+pesados = [m for m in {pesados!r} if m in sys.modules]
+print(json.dumps([duracao, pesados]))
+"""
+
+
+def _medir(modulo):
+    ambiente = dict(os.environ, OPENAI_API_KEY=os.environ.get("OPENAI_API_KEY", "budget"))
+    saida = subprocess.run(
+        [sys.executable, "-c", _SCRIPT.format(modulo=modulo, pesados=BACKENDS_PESADOS)],
+        cwd=RAIZ, env=ambiente, capture_output=True, text=True, check=True,
+    ).stdout.strip().splitlines()[-1]
+    return json.loads(saida)
+
+
+def _maiores_imports(modulo, quantidade):
+    """Os `quantidade` imports com maior tempo acumulado (python -X importtime)."""
+    saida = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {modulo}"],
+        cwd=RAIZ, capture_output=True, text=True,
+    ).stderr
+    linhas = []
+    for linha in saida.splitlines():
+        partes = linha.split("|")
+        if len(partes) == 3 and partes[1].strip().isdigit():
+            linhas.append((int(partes[1]), partes[2].strip()))
+    return sorted(linhas, reverse=True)[:quantidade]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Verifica o tempo de import da aplicação.")
+    parser.add_argument("--budget", type=float, default=None, help="Orçamento (s) para src.main")
+    parser.add_argument("--runs", type=int, default=3, help="Importações por módulo (vale a mediana)")
+    parser.add_argument("--top", type=int, default=0, help="Mostra os N imports mais lentos de src.main")
+    args = parser.parse_args(argv)
+
+    orcamentos = dict(ORCAMENTOS)
+    if args.budget is not None:
+        orcamentos["src.main"] = args.budget
+
+    falhas = []
+    for modulo, orcamento in orcamentos.items():
+        medicoes = [_medir(modulo) for _ in range(max(1, args.runs))]
+        mediana = statistics.median(d for d, _ in medicoes)
+        pesados = sorted({m for _, carregados in medicoes for m in carregados})
+        print(f"{modulo}: {mediana:.3f}s (orçamento {orcamento:.2f}s)"
+              + (f", carregou {', '.join(pesados)}" if pesados else ""))
+        if mediana > orcamento:
+            falhas.append(f"{modulo} levou {mediana:.3f}s (orçamento {orcamento:.2f}s)")
+        if pesados:
+            falhas.append(f"{modulo} importou backends pesados na carga: {', '.join(pesados)}")
+
+    if args.top:
+        print("Imports mais lentos de src.main (acumulado):")
+        for micros, nome in _maiores_imports("src.main", args.top):
+            print(f"  {micros / 1000:8.1f} ms  {nome}")
+
+    for falha in falhas:
+        print(f"FALHA: {falha}", file=sys.stderr)
+    return 1 if falhas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,283 @@
+# -*- coding: utf-8 -*-
+"""Benchmark das verificações contra servidores locais (bench/fake_servers.py).
+
+Exercita `run_verification_tasks`, as rotas /api/verify/* e /api/qualify com a
+concorrência pedida e registra latência (p50/p95/p99), vazão, erros, pico de
+RSS (processo + Chromium) e os tempos por etapa de src/metrics. O resultado é
+salvo em JSON; com --compare, compara o p95 e a vazão com uma execução anterior
+e termina com código 1 se houver regressão acima de --max-regression.
+
+Uso:
+    python -m bench.run --concurrency 1,4,8 --requests 40 -o bench/results.json
+    python -m bench.run --extractor browser --llm server --no-fast-path
+    python -m bench.run --llm server --analyzer direct --no-fast-path
+    python -m bench.run --receitaws-429-rate 0.2 --compare bench/baseline.json
+"""
+import argparse
+import json
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench.fake_servers import SEM_ANUNCIOS, FakeUpstreams
+
+CENARIOS = ("tasks", "verify", "qualify")
+
+
+def _percentil(valores, p):
+    """Percentil por posição mais próxima (valores já ordenados)."""
+    if not valores:
+        return None
+    indice = max(0, min(len(valores) - 1, math.ceil(p / 100 * len(valores)) - 1))
+    return valores[indice]
+
+
+def _resumo(latencias, erros, duracao, concorrencia):
+    ordenadas = sorted(latencias)
+    em_ms = lambda s: None if s is None else round(s * 1000, 2)
+    return {
+        "concurrency": concorrencia,
+        "requests": len(latencias),
+        "errors": erros,
+        "duration_s": round(duracao, 3),
+        "throughput_rps": round(len(latencias) / duracao, 3) if duracao else None,
+        "latency_ms": {
+            "p50": em_ms(_percentil(ordenadas, 50)),
+            "p95": em_ms(_percentil(ordenadas, 95)),
+            "p99": em_ms(_percentil(ordenadas, 99)),
+            "mean": em_ms(sum(ordenadas) / len(ordenadas)) if ordenadas else None,
+            "max": em_ms(ordenadas[-1]) if ordenadas else None,
+        },
+    }
+
+
+class _AmostradorRSS:
+    """Lê o RSS do processo e dos descendentes (Chromium) periodicamente e guarda o pico."""
+
+    def __init__(self, intervalo=0.2):
+        from src.browser_pool import _rss_processos_mb
+        self._medir = _rss_processos_mb
+        self.intervalo = intervalo
+        self.pico_mb = 0.0
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="bench-rss", daemon=True)
+
+    def _loop(self):
+        while not self._parar.is_set():
+            self.pico_mb = max(self.pico_mb, self._medir() or 0.0)
+            self._parar.wait(self.intervalo)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._parar.set()
+        self._thread.join()
+
+
+def _lead(i):
+    """Alterna alvos com e sem anúncios para cobrir os dois caminhos."""
+    sufixo = SEM_ANUNCIOS if i % 3 == 2 else "ativo"
+    return {
+        "instagram_username": f"bench_{sufixo}_{i}",
+        "domain": f"bench-{sufixo}-{i}.com.br",
+        "cnpj": f"{10000000 + i:08d}000191",
+    }
+
+
+def _operacoes(cenario, client, force_refresh):
+    """Devolve a função `op(i) -> ok` do cenário."""
+    from src.verifications import run_verification_tasks
+
+    if cenario == "tasks":
+        def op(i):
+            lead = _lead(i)
+            resultado = run_verification_tasks(lead["instagram_username"], lead["domain"], lead["cnpj"],
+                                               force_refresh=force_refresh)
+            return not resultado["error_messages"]
+    elif cenario == "verify":
+        rotas = [
+            ("/api/verify/instagram", "instagram_username"),
+            ("/api/verify/google", "domain"),
+            ("/api/verify/qsa", "cnpj"),
+        ]
+
+        def op(i):
+            rota, campo = rotas[i % len(rotas)]
+            resposta = client.post(rota, json={campo: _lead(i)[campo], "force_refresh": force_refresh})
+            return resposta.status_code == 200 and resposta.get_json().get("status") != "error"
+    else:
+        def op(i):
+            corpo = dict(_lead(i), valorInicial=1000, valorAtual=1500, force_refresh=force_refresh,
+                         checklist={"faturamento_401k_1M": True, "interesse_assessoria": True})
+            resposta = client.post("/api/qualify", json=corpo)
+            return resposta.status_code == 200 and not resposta.get_json()["verifications"]["error_messages"]
+    return op
+
+
+def _executar(op, total, concorrencia):
+    latencias, erros = [], 0
+    lock = threading.Lock()
+
+    def medir(i):
+        nonlocal erros
+        inicio = time.perf_counter()
+        try:
+            ok = op(i)
+        except Exception as e:
+            print(f"  erro na operação {i}: {e}", file=sys.stderr)
+            ok = False
+        duracao = time.perf_counter() - inicio
+        with lock:
+            latencias.append(duracao)
+            erros += 0 if ok else 1
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concorrencia) as executor:
+        list(executor.map(medir, range(total)))
+    return _resumo(latencias, erros, time.perf_counter() - inicio, concorrencia)
+
+
+def _resumo_etapas():
+    from src.metrics import stage_duration
+    return {
+        etapa: {"count": serie["count"], "mean_ms": round(serie["sum"] / serie["count"] * 1000, 2)}
+        for (etapa,), serie in sorted(stage_duration.snapshot().items()) if serie["count"]
+    }
+
+
+def _revisao_git():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def _comparar(atual, anterior, max_regressao):
+    """Compara p95 e vazão por (cenário, concorrência); devolve a lista de regressões."""
+    regressoes = []
+    base = {(r["scenario"], r["concurrency"]): r for r in anterior.get("results", [])}
+    for r in atual["results"]:
+        b = base.get((r["scenario"], r["concurrency"]))
+        if not b:
+            continue
+        p95, p95_base = r["latency_ms"]["p95"], b["latency_ms"]["p95"]
+        vazao, vazao_base = r["throughput_rps"], b["throughput_rps"]
+        linha = f"{r['scenario']} c={r['concurrency']}: p95 {p95_base} -> {p95} ms, vazão {vazao_base} -> {vazao} req/s"
+        print(linha)
+        if p95 and p95_base and p95 > p95_base * (1 + max_regressao):
+            regressoes.append(f"p95 piorou: {linha}")
+        if vazao and vazao_base and vazao < vazao_base * (1 - max_regressao):
+            regressoes.append(f"vazão caiu: {linha}")
+    return regressoes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark das verificações contra servidores locais.")
+    parser.add_argument("--scenario", choices=CENARIOS + ("all",), default="all")
+    parser.add_argument("--concurrency", default="1,4", help="Lista de níveis de concorrência (ex: 1,4,8)")
+    parser.add_argument("--requests", type=int, default=30, help="Operações por cenário e nível de concorrência")
+    parser.add_argument("--extractor", choices=("http", "browser"), default="http",
+                        help="Backend de extração (browser exige Chromium instalado)")
+    parser.add_argument("--llm", choices=("stub", "server"), default="stub",
+                        help="stub: análise de IA substituída no processo; server: CrewAI contra o LLM local")
+    parser.add_argument("--analyzer", choices=("crew", "direct"), default="crew",
+                        help="Com --llm server: CrewAI (crew) ou chamada direta de poucos tokens (direct)")
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="Latência simulada do LLM (s)")
+    parser.add_argument("--no-fast-path", action="store_true", help="Envia todas as páginas ao LLM")
+    parser.add_argument("--upstream-latency", type=float, default=0.05, help="Latência média dos upstreams (s)")
+    parser.add_argument("--receitaws-429-rate", type=float, default=0.0, help="Fração das respostas da ReceitaWS com 429")
+    parser.add_argument("--receitaws-per-minute", type=int, default=None, help="Limite por minuto da ReceitaWS simulada")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After (s) enviado nos 429")
+    parser.add_argument("--use-cache", action="store_true", help="Não força refresh (mede também o cache)")
+    parser.add_argument("-o", "--output", default=None, help="Arquivo JSON de saída")
+    parser.add_argument("--compare", default=None, help="JSON de uma execução anterior para comparação")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Regressão tolerada (fração)")
+    args = parser.parse_args(argv)
+
+    upstreams = FakeUpstreams(
+        latencia=args.upstream_latency, taxa_429=args.receitaws_429_rate,
+        limite_por_minuto=args.receitaws_per_minute, retry_after=args.retry_after,
+        latencia_llm=args.llm_latency if args.llm == "server" else 0.0,
+    ).start()
+
+    # As constantes dos módulos são lidas na importação: o ambiente precisa estar pronto antes
+    os.environ.update(upstreams.environ())
+    os.environ["EXTRACTOR_BACKEND"] = args.extractor
+    os.environ["AI_ANALYZER_MODE"] = args.analyzer
+    os.environ.setdefault("OPENAI_API_KEY", "bench")
+    os.environ.setdefault("FAST_PATH_SHADOW_RATE", "0")
+    # Bancos (inclusive o cache e o single-flight compartilhados) novos a cada rodada
+    diretorio = tempfile.mkdtemp(prefix="bench-")
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{diretorio}/app.db")
+    for variavel, arquivo in (("VERIFICATION_CACHE_DB", "cache.db"), ("SINGLE_FLIGHT_DB", "single_flight.db"),
+                              ("PREFETCH_DB", "prefetch.db"), ("JOBS_DB", "jobs.db")):
+        os.environ.setdefault(variavel, os.path.join(diretorio, arquivo))
+    for servico in ("RECEITAWS", "FACEBOOK", "GOOGLE"):
+        os.environ.setdefault(f"{servico}_RATE_PER_MINUTE", "60000")
+        os.environ.setdefault(f"{servico}_BURST", "1000")
+    if args.no_fast_path:
+        os.environ["FAST_PATH_ENABLED"] = "0"
+
+    import src.verifications as verifications
+    from src.main import app
+
+    if args.llm == "stub":
+        def analise_simulada(plataforma, conteudo, consulta):
+            time.sleep(args.llm_latency)
+            return SEM_ANUNCIOS not in consulta
+        verifications._analisar_com_llm = analise_simulada
+
+    cenarios = CENARIOS if args.scenario == "all" else (args.scenario,)
+    niveis = [int(n) for n in args.concurrency.split(",") if n.strip()]
+    client = app.test_client()
+    resultados = []
+    try:
+        with _AmostradorRSS() as rss:
+            for cenario in cenarios:
+                op = _operacoes(cenario, client, force_refresh=not args.use_cache)
+                for concorrencia in niveis:
+                    print(f"{cenario}: {args.requests} operações com concorrência {concorrencia}...")
+                    resumo = dict(scenario=cenario, **_executar(op, args.requests, concorrencia))
+                    latencia = resumo["latency_ms"]
+                    print(f"  p50={latencia['p50']}ms p95={latencia['p95']}ms p99={latencia['p99']}ms "
+                          f"vazão={resumo['throughput_rps']} req/s erros={resumo['errors']}")
+                    resultados.append(resumo)
+    finally:
+        upstreams.stop()
+
+    relatorio = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git_rev": _revisao_git(),
+        "config": vars(args),
+        "results": resultados,
+        "peak_rss_mb": round(rss.pico_mb, 1),
+        "stages": _resumo_etapas(),
+    }
+    print(f"Pico de RSS: {relatorio['peak_rss_mb']} MB")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(relatorio, f, indent=2, ensure_ascii=False)
+        print(f"Resultados salvos em {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressoes = _comparar(relatorio, json.load(f), args.max_regression)
+        for regressao in regressoes:
+            print(f"REGRESSÃO: {regressao}", file=sys.stderr)
+        if regressoes:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+"""Configuração do gunicorn.
+
+Uso: gunicorn -c gunicorn.conf.py src.main:app
+
+Importar src.main é leve (Crawl4AI e CrewAI são carregados sob demanda), então
+o master pré-carrega a aplicação e cada worker nasce pronto para atender; o
+post_fork antecipa a carga dos backends pesados em segundo plano, sem atrasar
+o primeiro atendimento do worker.
+"""
+import os
+import threading
+
+bind = os.getenv("GUNICORN_BIND", f"0.0.0.0:{os.getenv('PORT', '5001')}")
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+# O QSA pode esperar até 300s (QSA_CHECK_TIMEOUT)
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "330"))
+preload_app = os.getenv("GUNICORN_PRELOAD", "1").lower() in ("1", "true", "yes")
+# Reciclagem dos workers (barata com o import leve); 0 desativa
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "0"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "50"))
+
+WARMUP_ON_FORK = os.getenv("WARMUP_ON_FORK", "1").lower() in ("1", "true", "yes")
+
+
+def post_fork(server, worker):
+    if not WARMUP_ON_FORK:
+        return
+    from src.verifications import warmup
+
+    threading.Thread(target=warmup, name="warmup", daemon=True).start()
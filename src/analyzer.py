@@ -0,0 +1,306 @@
+# -*- coding: utf-8 -*-
+"""Serviço de análise de anúncios com LLM ("Sim"/"Não" por página extraída).
+
+O agente e o Crew de cada plataforma são montados uma única vez, com a
+descrição da tarefa como template ({consulta}, {conteudo}); como um Crew não
+pode atender duas execuções ao mesmo tempo, cada chamada pega um exemplar
+livre da plataforma e o devolve ao terminar (no máximo LLM_MAX_CONCURRENCY
+por plataforma). A análise em lote (src/batch_analysis.py) usa o mesmo pool
+com o seu próprio Crew (executar_crew).
+
+Um semáforo limita as chamadas simultâneas ao OpenAI no processo. Um 429
+pausa todas as chamadas pelo Retry-After (ou backoff exponencial com jitter)
+e a chamada é refeita até LLM_MAX_RETRIES vezes.
+
+Com AI_ANALYZER_MODE=direct, a pergunta vai direto para /chat/completions com
+max_tokens mínimo e temperatura 0, sem o prompt ReAct do CrewAI.
+"""
+import logging
+import os
+import random
+import threading
+import time
+
+from src.crawl_scheduler import tempo_restante
+from src.http_client import HTTP_CONNECT_TIMEOUT, get_session
+from src.metrics import llm_call_duration, llm_calls, llm_tokens, medir_etapa
+from src.rate_limit import parse_retry_after
+
+logger = logging.getLogger(__name__)
+
+AI_ANALYZER_MODE = os.getenv("AI_ANALYZER_MODE", "crew").lower()  # crew | direct
+OPENAI_MODEL_NAME = os.getenv("OPENAI_MODEL_NAME", "gpt-4o-mini")
+OPENAI_BASE_URL = (os.getenv("OPENAI_BASE_URL") or os.getenv("OPENAI_API_BASE") or "https://api.openai.com/v1").rstrip("/")
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "2"))  # Segundos; dobra a cada 429
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "60"))
+LLM_REQUEST_TIMEOUT = float(os.getenv("LLM_REQUEST_TIMEOUT", "60"))
+# "Sim" e "Não" cabem em 1-2 tokens; mais que isso só desperdiça a cota
+LLM_DIRECT_MAX_TOKENS = int(os.getenv("LLM_DIRECT_MAX_TOKENS", "2"))
+
+MAX_CONTENT_LENGTH = 15000
+
+# Critérios de decisão por plataforma, compartilhados com a análise em lote
+CRITERIOS_ANALISE = {
+    "facebook": (
+        "Procure por indicadores como 'nenhum anúncio encontrado', '0 resultados', ou a presença explícita de anúncios listados. "
+    ),
+    "google": (
+        "Procure por indicadores como 'Nenhum anúncio encontrado', 'não veiculou anúncios', ou a presença explícita de anúncios listados. "
+        "Se o texto extraído contiver a palavra 'Verificado' pelo menos uma vez próxima ao nome do domínio ou nome de empresa, considere que há anúncios ativos vinculados ao domínio analisado. "
+        "A presença da opção 'See all ads' também sugere que existem múltiplos anúncios disponíveis para navegação.\n"
+        "Elementos como filtros por período (ex: 'Qualquer horário'), localização (ex: 'Onde aparecem: Brasil') e plataformas são sempre mostrados, mas não indicam diretamente a presença de anúncios.\n"
+    ),
+}
+
+_PAGINAS = {
+    "facebook": ("Biblioteca de Anúncios do Facebook", "o usuário"),
+    "google": ("Centro de Transparência de Anúncios do Google", "o domínio"),
+}
+
+_INSTRUCAO_RESPOSTA = "Responda APENAS com 'Sim' se encontrar anúncios ativos, ou 'Não' caso contrário. Não inclua explicações."
+
+
+def _descricao_tarefa(plataforma):
+    """Template da pergunta da plataforma; {consulta} e {conteudo} são preenchidos a cada chamada."""
+    pagina, tipo_alvo = _PAGINAS[plataforma]
+    return (
+        f"Analise o seguinte conteúdo da {pagina} e determine se existem anúncios ATIVOS para {tipo_alvo} '{{consulta}}'.\n"
+        f"Conteúdo da página:\n--- INÍCIO ---\n{{conteudo}}\n--- FIM ---\n\n"
+        f"{CRITERIOS_ANALISE[plataforma]}"
+        f"{_INSTRUCAO_RESPOSTA}"
+    )
+
+
+class LLMRateLimited(Exception):
+    """O OpenAI respondeu 429; `retry_after` é a espera sugerida (s) ou None."""
+
+    def __init__(self, retry_after=None):
+        super().__init__("Limite de requisições do OpenAI atingido.")
+        self.retry_after = retry_after
+
+
+def _eh_429(erro):
+    if isinstance(erro, LLMRateLimited):
+        return True
+    if getattr(erro, "status_code", None) == 429 or type(erro).__name__ == "RateLimitError":
+        return True
+    return "429" in str(erro) or "rate limit" in str(erro).lower()
+
+
+def _uso_tokens(metricas):
+    """(prompt, completion) de um UsageMetrics do CrewAI ou do campo `usage` da API."""
+    if metricas is None:
+        return 0, 0
+    if isinstance(metricas, dict):
+        return int(metricas.get("prompt_tokens") or 0), int(metricas.get("completion_tokens") or 0)
+    return int(getattr(metricas, "prompt_tokens", 0) or 0), int(getattr(metricas, "completion_tokens", 0) or 0)
+
+
+class AdsAnalyzer:
+    """Análise "Sim/Não" com Crews reaproveitados, concorrência limitada e backoff em 429."""
+
+    def __init__(self, modo=AI_ANALYZER_MODE, max_concorrencia=LLM_MAX_CONCURRENCY):
+        self.modo = modo
+        self.max_concorrencia = max_concorrencia
+        self._semaforo = threading.BoundedSemaphore(max_concorrencia)
+        self._lock = threading.Lock()
+        self._livres = {plataforma: [] for plataforma in _PAGINAS}
+        self._pausa_ate = 0.0
+        self.em_andamento = 0
+
+    # --- Crews reaproveitados ---
+
+    def _criar_crew(self, plataforma):
+        from crewai import Agent, Crew, Task
+
+        pagina, _ = _PAGINAS[plataforma]
+        agent = Agent(
+            role="Analista de Anúncios",
+            goal=f"Interpretar o conteúdo da página da {pagina} para verificar se há anúncios ativos para '{{consulta}}'.",
+            backstory="Um especialista em marketing digital que analisa textos de páginas de bibliotecas de anúncios.",
+            tools=[],
+            verbose=False
+        )
+        task = Task(
+            description=_descricao_tarefa(plataforma),
+            expected_output="'Sim' ou 'Não'.",
+            agent=agent
+        )
+        return Crew(agents=[agent], tasks=[task], verbose=False)
+
+    def _pegar_crew(self, chave, criar):
+        with self._lock:
+            livres = self._livres.setdefault(chave, [])
+            if livres:
+                return livres.pop()
+        return criar()
+
+    def _devolver_crew(self, chave, crew):
+        with self._lock:
+            livres = self._livres.setdefault(chave, [])
+            if len(livres) < self.max_concorrencia:
+                livres.append(crew)
+
+    def preparar(self):
+        """Monta o Crew de cada plataforma antes da primeira análise (modo crew)."""
+        if self.modo != "crew":
+            return
+        for plataforma in _PAGINAS:
+            with self._lock:
+                pronto = bool(self._livres[plataforma])
+            if not pronto:
+                self._devolver_crew(plataforma, self._criar_crew(plataforma))
+
+    def _kickoff(self, chave, criar, inputs):
+        crew = self._pegar_crew(chave, criar)
+        try:
+            # O uso de tokens do Crew é acumulado entre execuções: a chamada é a diferença
+            antes = _uso_tokens(crew.calculate_usage_metrics())
+            result = crew.kickoff(inputs=inputs)
+            depois = _uso_tokens(crew.calculate_usage_metrics())
+        except Exception:
+            crew = None  # Estado interno incerto após a falha; o próximo uso monta outro
+            raise
+        finally:
+            if crew is not None:
+                self._devolver_crew(chave, crew)
+        return str(result), (depois[0] - antes[0], depois[1] - antes[1])
+
+    def _perguntar_via_crew(self, plataforma, conteudo, consulta):
+        return self._kickoff(plataforma, lambda: self._criar_crew(plataforma),
+                             {"consulta": consulta, "conteudo": conteudo})
+
+    # --- Chamada direta ---
+
+    def _perguntar_direto(self, plataforma, conteudo, consulta):
+        prompt = _descricao_tarefa(plataforma).replace("{consulta}", consulta).replace("{conteudo}", conteudo)
+        restante = tempo_restante()
+        timeout = LLM_REQUEST_TIMEOUT if restante is None else max(1.0, min(LLM_REQUEST_TIMEOUT, restante))
+        response = get_session().post(
+            f"{OPENAI_BASE_URL}/chat/completions",
+            headers={"Authorization": f"Bearer {os.getenv('OPENAI_API_KEY', '')}"},
+            json={
+                "model": OPENAI_MODEL_NAME,
+                "messages": [
+                    {"role": "system", "content": "Você é um especialista em marketing digital que analisa páginas de bibliotecas de anúncios."},
+                    {"role": "user", "content": prompt},
+                ],
+                "max_tokens": LLM_DIRECT_MAX_TOKENS,
+                "temperature": 0,
+            },
+            timeout=(HTTP_CONNECT_TIMEOUT, timeout),
+        )
+        if response.status_code == 429:
+            raise LLMRateLimited(parse_retry_after(response.headers.get("Retry-After"), padrao=None))
+        response.raise_for_status()
+        dados = response.json()
+        texto = dados["choices"][0]["message"]["content"] or ""
+        return texto, _uso_tokens(dados.get("usage"))
+
+    # --- Controle de concorrência e 429 ---
+
+    def _esperar(self, segundos):
+        """Dorme até `segundos`, sem passar do prazo da verificação atual."""
+        restante = tempo_restante()
+        if restante is not None and segundos > restante:
+            raise TimeoutError("Prazo da verificação esgota antes da próxima tentativa no OpenAI.")
+        time.sleep(segundos)
+
+    def _pausar(self, erro, tentativa):
+        espera = getattr(erro, "retry_after", None)
+        if espera is None:
+            espera = min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * 2 ** tentativa) * (1 + random.random() * 0.5)
+        with self._lock:
+            self._pausa_ate = max(self._pausa_ate, time.monotonic() + espera)
+        logger.warning(f"OpenAI respondeu 429; pausando as chamadas por {espera:.1f}s (tentativa {tentativa + 1}).")
+
+    def _chamar(self, funcao, *args):
+        """Executa uma chamada ao LLM dentro do limite de concorrência, repetindo em caso de 429."""
+        restante = tempo_restante()
+        if not self._semaforo.acquire(timeout=restante):
+            raise TimeoutError("Prazo da verificação esgotado esperando vaga para o OpenAI.")
+        with self._lock:
+            self.em_andamento += 1
+        try:
+            for tentativa in range(LLM_MAX_RETRIES + 1):
+                with self._lock:
+                    pausa = self._pausa_ate - time.monotonic()
+                if pausa > 0:
+                    self._esperar(pausa)
+                inicio = time.perf_counter()
+                try:
+                    resposta, uso = funcao(*args)
+                except Exception as e:
+                    if not _eh_429(e):
+                        llm_calls.inc(self.modo, "error")
+                        raise
+                    llm_calls.inc(self.modo, "rate_limited")
+                    if tentativa == LLM_MAX_RETRIES:
+                        raise
+                    self._pausar(e, tentativa)
+                    continue
+                duracao = time.perf_counter() - inicio
+                llm_calls.inc(self.modo, "ok")
+                llm_call_duration.observe(duracao, self.modo)
+                llm_tokens.inc(self.modo, "prompt", quantidade=uso[0])
+                llm_tokens.inc(self.modo, "completion", quantidade=uso[1])
+                return resposta, uso, duracao
+        finally:
+            with self._lock:
+                self.em_andamento -= 1
+            self._semaforo.release()
+
+    def analisar(self, plataforma, conteudo, consulta, levantar=False):
+        """Pergunta ao LLM se o conteúdo indica anúncios ativos.
+
+        Em caso de erro (inclusive 429 depois das novas tentativas) devolve False,
+        ou levanta a exceção com `levantar=True` (ex: comparação do fast path, que
+        não deve contar uma falha como resposta "Não").
+        """
+        funcao = self._perguntar_direto if self.modo == "direct" else self._perguntar_via_crew
+        try:
+            logger.info(f"Iniciando análise de IA para {consulta} na plataforma {plataforma}")
+            with medir_etapa("ai_kickoff"):
+                resposta, uso, duracao = self._chamar(funcao, plataforma, conteudo[:MAX_CONTENT_LENGTH], consulta)
+        except Exception as e:
+            logger.error(f"Erro durante a análise de IA para {consulta} ({plataforma}): {str(e)}")
+            if levantar:
+                raise
+            return False
+        logger.info(
+            f"Resultado da análise de IA para {consulta} ({plataforma}): {resposta} "
+            f"[{self.modo}, {duracao:.2f}s, tokens {uso[0]}+{uso[1]}]"
+        )
+        return resposta.strip().strip(".'\"").lower().startswith("sim")
+
+    def executar_crew(self, chave, criar, inputs):
+        """Roda um Crew do chamador (ex: análise em lote) sob o mesmo limite e backoff.
+
+        Os Crews ficam no pool em `chave`; `criar()` monta um novo (com a tarefa
+        como template) quando não há um livre, e `inputs` preenche o template.
+        Erros, inclusive 429 depois das novas tentativas, são levantados.
+        """
+        resposta, _, _ = self._chamar(self._kickoff, chave, criar, inputs)
+        return resposta
+
+    def stats(self):
+        with self._lock:
+            return {"modo": self.modo, "limite": self.max_concorrencia, "em_andamento": self.em_andamento,
+                    "crews_prontos": {p: len(c) for p, c in self._livres.items()}}
+
+
+_analyzer = None
+_analyzer_pid = None
+_analyzer_lock = threading.Lock()
+
+
+def get_analyzer():
+    """Devolve o analisador do processo (recriado após fork)."""
+    global _analyzer, _analyzer_pid
+    with _analyzer_lock:
+        if _analyzer is None or _analyzer_pid != os.getpid():
+            _analyzer = AdsAnalyzer()
+            _analyzer_pid = os.getpid()
+        return _analyzer
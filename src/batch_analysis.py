@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""Análise de anúncios em lote: várias páginas extraídas em uma única chamada ao modelo.
+
+Recebe uma lista de itens (plataforma, consulta, conteudo) e os agrupa em
+prompts que respeitam um orçamento de tokens. Cada prompt pede uma resposta
+estruturada "N: Sim/Não" por item; itens cuja resposta não puder ser lida
+são reanalisados individualmente. Falhas na chamada ao modelo (inclusive 429
+depois do backoff do analisador) não viram N chamadas individuais: são
+levantadas para quem pediu o lote.
+
+O Crew do lote é montado uma vez, com a tarefa como template, e fica no pool
+de Crews do analisador (src/analyzer.py).
+"""
+import logging
+import os
+import re
+
+from src.analyzer import CRITERIOS_ANALISE, MAX_CONTENT_LENGTH, get_analyzer
+from src.fast_path import ACTIVE, UNCERTAIN, classificar_rapido, fast_path_stats
+from src.verifications import OPENAI_API_KEY
+
+logger = logging.getLogger(__name__)
+
+# Orçamento aproximado de tokens por prompt (conteúdo + instruções)
+BATCH_TOKEN_BUDGET = int(os.getenv("BATCH_TOKEN_BUDGET", "24000"))
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "10"))
+CHARS_PER_TOKEN = 4  # Estimativa conservadora para textos em português
+_TOKENS_POR_ITEM = 60  # Cabeçalho e delimitadores de cada item
+_TOKENS_INSTRUCOES = 600
+
+_NOMES_PLATAFORMA = {
+    "facebook": ("Biblioteca de Anúncios do Facebook", "usuário"),
+    "google": ("Centro de Transparência de Anúncios do Google", "domínio"),
+}
+
+_CREW_LOTE = "lote"  # Chave do Crew do lote no pool do analisador
+_TAREFA_LOTE = (
+    "{itens}\nResponda com exatamente {total} linhas, uma por item, no formato 'N: Sim' ou 'N: Não' "
+    "(N é o número do item). Não inclua explicações."
+)
+
+_RESPOSTA_ITEM = re.compile(r"^\W*(?:item\s*)?(\d+)\W*[:=\-–]\s*\W*(sim|não|nao)\b", re.IGNORECASE | re.MULTILINE)
+
+
+def _estimar_tokens(texto):
+    return len(texto) // CHARS_PER_TOKEN + 1
+
+
+def _montar_lotes(pendentes, orcamento=BATCH_TOKEN_BUDGET, max_itens=BATCH_MAX_ITEMS):
+    """Agrupa (indice, plataforma, consulta, conteudo) em lotes dentro do orçamento de tokens.
+
+    Conteúdos maiores que o espaço disponível em um lote vazio são truncados.
+    """
+    espaco_util = max(orcamento - _TOKENS_INSTRUCOES, _TOKENS_POR_ITEM + 1)
+    max_chars_item = min(MAX_CONTENT_LENGTH, (espaco_util - _TOKENS_POR_ITEM) * CHARS_PER_TOKEN)
+
+    lotes, atual, usado = [], [], 0
+    for indice, plataforma, consulta, conteudo in pendentes:
+        conteudo = conteudo[:max_chars_item]
+        custo = _estimar_tokens(conteudo) + _TOKENS_POR_ITEM
+        if atual and (usado + custo > espaco_util or len(atual) >= max_itens):
+            lotes.append(atual)
+            atual, usado = [], 0
+        atual.append((indice, plataforma, consulta, conteudo))
+        usado += custo
+    if atual:
+        lotes.append(atual)
+    return lotes
+
+
+def _itens_lote(lote):
+    """Instruções, critérios e conteúdos do lote (o {itens} de _TAREFA_LOTE)."""
+    plataformas = sorted({plataforma for _, plataforma, _, _ in lote})
+    partes = [
+        f"Analise os {len(lote)} conteúdos de páginas de bibliotecas de anúncios abaixo e determine, "
+        f"para cada item, se existem anúncios ATIVOS para o alvo indicado.\n"
+    ]
+    for plataforma in plataformas:
+        nome, _ = _NOMES_PLATAFORMA[plataforma]
+        partes.append(f"Critérios para itens da {nome}: {CRITERIOS_ANALISE[plataforma]}\n")
+    for numero, (_, plataforma, consulta, conteudo) in enumerate(lote, start=1):
+        nome, tipo_alvo = _NOMES_PLATAFORMA[plataforma]
+        partes.append(
+            f"\n[ITEM {numero}] {nome} — {tipo_alvo} \'{consulta}\'\n"
+            f"--- INÍCIO ITEM {numero} ---\n{conteudo}\n--- FIM ITEM {numero} ---\n"
+        )
+    return "".join(partes)
+
+
+def _interpretar_resposta(texto, total):
+    """Lê as linhas 'N: Sim/Não' da resposta; devolve {numero: bool} apenas para itens válidos."""
+    respostas = {}
+    for numero, resposta in _RESPOSTA_ITEM.findall(texto):
+        numero = int(numero)
+        if 1 <= numero <= total and numero not in respostas:
+            respostas[numero] = resposta.lower() == "sim"
+    return respostas
+
+
+def _criar_crew_lote():
+    from crewai import Agent, Task, Crew
+
+    agent = Agent(
+        role="Analista de Anúncios",
+        goal="Interpretar conteúdos de páginas de bibliotecas de anúncios e verificar se há anúncios ativos para cada alvo.",
+        backstory="Um especialista em marketing digital que analisa textos de páginas de bibliotecas de anúncios.",
+        tools=[],
+        verbose=False
+    )
+    task = Task(
+        description=_TAREFA_LOTE,
+        expected_output="{total} linhas no formato 'N: Sim' ou 'N: Não'.",
+        agent=agent
+    )
+    return Crew(agents=[agent], tasks=[task], verbose=False)
+
+
+def _analisar_lote(lote):
+    """Executa uma chamada ao modelo para o lote; devolve {numero: bool} com os itens interpretados.
+
+    Erros da chamada são levantados; só a resposta ilegível resulta em itens ausentes.
+    """
+    # Mesmo limite de concorrência e backoff em 429 das análises individuais
+    result = get_analyzer().executar_crew(
+        _CREW_LOTE, _criar_crew_lote, {"itens": _itens_lote(lote), "total": len(lote)},
+    )
+    return _interpretar_resposta(str(result), len(lote))
+
+
+def analisar_anuncios_em_lote(itens, classificar=True):
+    """Analisa vários itens (plataforma, consulta, conteudo) com o mínimo de chamadas ao modelo.
+
+    Devolve uma lista de booleanos (há anúncios ativos?) na mesma ordem dos itens.
+    Conteúdos inválidos resultam em False, como em analyze_ads_with_ai. Com
+    `classificar=False` os itens já passaram pelo fast path (ex: src/bulk.py)
+    e vão todos para o LLM. Uma falha na chamada ao modelo é levantada (o lote
+    inteiro vira erro para quem chamou) em vez de virar "Não".
+    """
+    resultados = [False] * len(itens)
+    pendentes = []
+    for indice, (plataforma, consulta, conteudo) in enumerate(itens):
+        if not conteudo or "Erro ao extrair" in conteudo:
+            continue
+        if not classificar:
+            pendentes.append((indice, plataforma, consulta, conteudo))
+            continue
+        decisao = classificar_rapido(plataforma, conteudo)
+        fast_path_stats.registrar_decisao(plataforma, decisao)
+        if decisao != UNCERTAIN:
+            resultados[indice] = decisao == ACTIVE
+        else:
+            pendentes.append((indice, plataforma, consulta, conteudo))
+
+    if not pendentes:
+        return resultados
+    if not OPENAI_API_KEY:
+        logger.error("Chave API OpenAI não configurada. Análise de IA em lote abortada.")
+        return resultados
+
+    lotes = _montar_lotes(pendentes)
+    logger.info(f"Análise em lote: {len(itens)} itens, {len(pendentes)} para o LLM em {len(lotes)} chamada(s).")
+    for lote in lotes:
+        # Um item sozinho usa o prompt individual, sem formato de lote
+        respostas = _analisar_lote(lote) if len(lote) > 1 else {}
+        for numero, (indice, plataforma, consulta, _) in enumerate(lote, start=1):
+            if numero in respostas:
+                resultados[indice] = respostas[numero]
+                continue
+            if len(lote) > 1:
+                logger.warning(f"Resposta do lote sem item {numero} ({consulta}, {plataforma}). Reanalisando individualmente.")
+            _, _, conteudo_original = itens[indice]
+            # O item já passou pelo fast path; erros da chamada são levantados como os do lote
+            resultados[indice] = get_analyzer().analisar(plataforma, conteudo_original, consulta, levantar=True)
+    return resultados
@@ -0,0 +1,308 @@
+# -*- coding: utf-8 -*-
+"""Pool de navegadores Crawl4AI de longa duração.
+
+Um único event loop em segundo plano mantém N instâncias de AsyncWebCrawler
+aquecidas. As funções síncronas de extração apenas submetem jobs ao pool, que
+cuida de checkout/devolução, verificação de saúde, reciclagem após K páginas
+(ou quando a memória cresce demais) e do encerramento ordenado.
+"""
+import asyncio
+import atexit
+import concurrent.futures
+import logging
+import os
+import threading
+import time
+
+from src.metrics import medir_etapa
+
+logger = logging.getLogger(__name__)
+
+BROWSER_POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", "2"))
+BROWSER_MAX_PAGES = int(os.getenv("BROWSER_MAX_PAGES", "50"))  # Recicla o navegador após K páginas
+BROWSER_MAX_RSS_MB = float(os.getenv("BROWSER_MAX_RSS_MB", "1500"))  # 0 desativa a reciclagem por memória
+BROWSER_SHUTDOWN_TIMEOUT = float(os.getenv("BROWSER_SHUTDOWN_TIMEOUT", "30"))
+# Tipos de recurso que as abas não baixam (vazio desativa): a análise só usa o texto da página
+BROWSER_BLOCKED_RESOURCES = frozenset(
+    tipo.strip() for tipo in os.getenv("BROWSER_BLOCKED_RESOURCES", "image,font,media").split(",") if tipo.strip()
+)
+
+
+def _rss_processos_mb():
+    """Soma o RSS (MB) deste processo e de todos os descendentes (Chromium incluído).
+
+    Lê /proc diretamente; retorna None em sistemas sem procfs.
+    """
+    if not os.path.isdir("/proc"):
+        return None
+    filhos = {}
+    rss_kb = {}
+    for entrada in os.listdir("/proc"):
+        if not entrada.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entrada}/status") as f:
+                ppid, rss = None, 0
+                for linha in f:
+                    if linha.startswith("PPid:"):
+                        ppid = int(linha.split()[1])
+                    elif linha.startswith("VmRSS:"):
+                        rss = int(linha.split()[1])
+        except (OSError, ValueError):
+            continue
+        pid = int(entrada)
+        rss_kb[pid] = rss
+        if ppid is not None:
+            filhos.setdefault(ppid, []).append(pid)
+
+    total, pendentes = 0, [os.getpid()]
+    while pendentes:
+        pid = pendentes.pop()
+        total += rss_kb.get(pid, 0)
+        pendentes.extend(filhos.get(pid, []))
+    return total / 1024
+
+
+def _navegador_conectado(crawler):
+    """Verificação de saúde: o navegador por trás do crawler ainda está conectado?"""
+    try:
+        browser = crawler.crawler_strategy.browser_manager.browser
+    except AttributeError:
+        return True  # Versão do Crawl4AI sem esses atributos: assume saudável
+    return browser is None or browser.is_connected()
+
+
+async def _bloquear_recursos(page, context=None, **kwargs):
+    """Hook on_page_context_created: aborta os BROWSER_BLOCKED_RESOURCES no contexto da aba.
+
+    A rota é registrada uma única vez por contexto (as abas de um crawler
+    compartilham o mesmo contexto).
+    """
+    if context is None or getattr(context, "_v4_recursos_bloqueados", False):
+        return page
+
+    async def rotear(route):
+        if route.request.resource_type in BROWSER_BLOCKED_RESOURCES:
+            await route.abort()
+        else:
+            await route.continue_()
+
+    await context.route("**/*", rotear)
+    context._v4_recursos_bloqueados = True
+    return page
+
+
+def bloquear_recursos(crawler):
+    """Instala no crawler o bloqueio de imagens, fontes e mídia (BROWSER_BLOCKED_RESOURCES)."""
+    if BROWSER_BLOCKED_RESOURCES:
+        crawler.crawler_strategy.set_hook("on_page_context_created", _bloquear_recursos)
+    return crawler
+
+
+class _PooledCrawler:
+    """Um AsyncWebCrawler do pool com seu contador de páginas."""
+
+    def __init__(self, browser_config):
+        self.browser_config = browser_config
+        self.crawler = None
+        self.pages = 0
+        self.healthy = True
+
+    async def start(self):
+        from crawl4ai import AsyncWebCrawler  # Importado só quando o pool abre o primeiro navegador
+
+        self.crawler = bloquear_recursos(AsyncWebCrawler(config=self.browser_config))
+        with medir_etapa("browser_launch"):
+            await self.crawler.start()
+        self.pages = 0
+        self.healthy = True
+
+    async def close(self):
+        if self.crawler is None:
+            return
+        try:
+            await self.crawler.close()
+        except Exception as e:
+            logger.warning(f"Erro ao fechar navegador do pool: {str(e)}")
+        finally:
+            self.crawler = None
+
+
+class BrowserPool:
+    """Pool de crawlers aquecidos rodando em um event loop próprio."""
+
+    def __init__(self, browser_config, size=BROWSER_POOL_SIZE, max_pages=BROWSER_MAX_PAGES,
+                 max_rss_mb=BROWSER_MAX_RSS_MB):
+        self.browser_config = browser_config
+        self.size = max(1, size)
+        self.max_pages = max_pages
+        self.max_rss_mb = max_rss_mb
+        self.pid = os.getpid()
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="browser-pool", daemon=True)
+        self._idle = None
+        self._crawlers = []
+        self._in_flight = 0
+        self._closing = False
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._init_queue(), self._loop).result()
+
+    async def _init_queue(self):
+        self._idle = asyncio.Queue()
+        self._drained = asyncio.Event()
+        self._drained.set()
+
+    # --- Checkout / devolução ---
+
+    async def _checkout(self):
+        if self._idle.empty() and len(self._crawlers) < self.size:
+            pooled = _PooledCrawler(self.browser_config)
+            self._crawlers.append(pooled)
+            try:
+                await pooled.start()
+            except Exception:
+                self._crawlers.remove(pooled)
+                raise
+            logger.info(f"Navegador iniciado no pool ({len(self._crawlers)}/{self.size}).")
+            return pooled
+
+        pooled = await self._idle.get()
+        if not pooled.healthy or not _navegador_conectado(pooled.crawler):
+            logger.warning("Navegador do pool não está saudável. Reiniciando.")
+            try:
+                await self._recycle(pooled)
+            except Exception:
+                self._crawlers.remove(pooled)
+                raise
+        return pooled
+
+    async def _checkin(self, pooled):
+        pooled.pages += 1
+        motivo = None
+        if not pooled.healthy:
+            motivo = "falha na execução"
+        elif self.max_pages and pooled.pages >= self.max_pages:
+            motivo = f"{pooled.pages} páginas processadas"
+        elif self.max_rss_mb:
+            rss = _rss_processos_mb()
+            if rss is not None and rss > self.max_rss_mb:
+                motivo = f"memória em {rss:.0f} MB"
+
+        if motivo and not self._closing:
+            logger.info(f"Reciclando navegador do pool ({motivo}).")
+            try:
+                await self._recycle(pooled)
+            except Exception as e:
+                logger.error(f"Falha ao reciclar navegador do pool: {str(e)}")
+                self._crawlers.remove(pooled)
+                return
+        self._idle.put_nowait(pooled)
+
+    async def _recycle(self, pooled):
+        await pooled.close()
+        await pooled.start()
+
+    async def _run(self, job, cancel_event=None):
+        if self._closing:
+            raise RuntimeError("Pool de navegadores em encerramento.")
+        self._in_flight += 1
+        self._drained.clear()
+        try:
+            pooled = await self._checkout()
+            try:
+                return await job(pooled.crawler)
+            except asyncio.CancelledError:
+                # Cancelamento pedido por quem chamou (ex: o perdedor de um hedge) só
+                # fecha a aba; já o cancelamento por timeout pode indicar um navegador
+                # travado e recicla o navegador na devolução.
+                if cancel_event is None or not cancel_event.is_set():
+                    pooled.healthy = False
+                raise
+            except BaseException:
+                # Demais exceções podem deixar a página em estado inconsistente
+                pooled.healthy = False
+                raise
+            finally:
+                await self._checkin(pooled)
+        finally:
+            self._in_flight -= 1
+            if self._in_flight == 0:
+                self._drained.set()
+
+    def submit(self, job, timeout=None, cancel_event=None):
+        """Executa `job(crawler)` (uma corotina) em um crawler do pool e devolve o resultado.
+
+        Bloqueia a thread chamadora até o fim, até `timeout` segundos ou até
+        `cancel_event` (threading.Event) ser acionado; nos dois últimos casos a
+        corotina é cancelada e a aba liberada.
+        """
+        future = asyncio.run_coroutine_threadsafe(self._run(job, cancel_event), self._loop)
+        try:
+            if cancel_event is None:
+                return future.result(timeout=timeout)
+            limite = None if timeout is None else time.monotonic() + timeout
+            while True:
+                if cancel_event.is_set():
+                    raise concurrent.futures.CancelledError("Extração cancelada.")
+                espera = 0.5 if limite is None else min(0.5, limite - time.monotonic())
+                if espera <= 0:
+                    raise concurrent.futures.TimeoutError()
+                try:
+                    return future.result(timeout=espera)
+                except concurrent.futures.TimeoutError:
+                    continue
+        except BaseException:
+            future.cancel()
+            raise
+
+    # --- Encerramento ---
+
+    async def _drain(self, timeout):
+        self._closing = True
+        try:
+            await asyncio.wait_for(self._drained.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Encerrando pool com {self._in_flight} extração(ões) ainda em andamento.")
+        for pooled in self._crawlers:
+            await pooled.close()
+        self._crawlers.clear()
+
+    def shutdown(self, timeout=BROWSER_SHUTDOWN_TIMEOUT):
+        """Para de aceitar jobs, espera os que estão em andamento e fecha os navegadores."""
+        if not self._thread.is_alive():
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._drain(timeout), self._loop).result(timeout=timeout + 10)
+        except Exception as e:
+            logger.error(f"Erro ao encerrar pool de navegadores: {str(e)}")
+        finally:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+            logger.info("Pool de navegadores encerrado.")
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_browser_pool(browser_config):
+    """Devolve o pool do processo atual, criando-o na primeira chamada.
+
+    Após um fork (workers do gunicorn) a thread do pool não existe no filho,
+    então um novo pool é criado por processo.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool.pid != os.getpid():
+            _pool = BrowserPool(browser_config)
+            atexit.register(_pool.shutdown)
+        return _pool
+
+
+def shutdown_browser_pool():
+    """Encerra o pool do processo atual, se existir."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None and _pool.pid == os.getpid():
+            _pool.shutdown()
+        _pool = None
@@ -0,0 +1,287 @@
+# -*- coding: utf-8 -*-
+"""Qualificação de leads em lote (endpoint /api/qualify/bulk e linha de comando).
+
+Lê leads em CSV ou JSONL (instagram_username, domain, cnpj, valorInicial,
+valorAtual, checklist), agenda as verificações com limite de concorrência por
+fonte e emite cada lead pontuado como uma linha NDJSON assim que fica pronto.
+A pontuação usa calculate_score e determine_qualification, como no fluxo
+interativo.
+
+As páginas de anúncios que o fast path não decide não vão uma a uma para o
+LLM: ficam acumuladas e seguem em blocos de BULK_ANALYSIS_CHUNK para
+analisar_anuncios_em_lote (uma chamada ao modelo por bloco). Um bloco
+incompleto é enviado quando não há mais extração de anúncios em andamento.
+
+Uso:
+    python -m src.bulk leads.csv -o resultados.ndjson
+    python -m src.bulk leads.jsonl --format jsonl --force-refresh
+"""
+import argparse
+import contextvars
+import csv
+import json
+import logging
+import os
+import sys
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from src.batch_analysis import BATCH_MAX_ITEMS, analisar_anuncios_em_lote
+from src.crawl_scheduler import PRIORITY_BULK, crawl_context
+from src.scoring import CRITERIA_POINTS, calculate_score, determine_qualification
+from src.verifications import (
+    PLATAFORMAS_ANUNCIOS,
+    concluir_anuncios,
+    montar_resultados,
+    preparar_anuncios,
+    verificar_facebook_ads,
+    verificar_google_ads,
+    verificar_qsa,
+)
+
+logger = logging.getLogger(__name__)
+
+# Quantas verificações de cada fonte podem rodar ao mesmo tempo no lote
+BULK_SOURCE_CONCURRENCY = {
+    "facebook": int(os.getenv("BULK_FACEBOOK_CONCURRENCY", "2")),
+    "google": int(os.getenv("BULK_GOOGLE_CONCURRENCY", "2")),
+    "qsa": int(os.getenv("BULK_QSA_CONCURRENCY", "1")),
+}
+# Leads lidos e ainda não emitidos (limita a memória em arquivos grandes)
+BULK_MAX_PENDING_LEADS = int(os.getenv("BULK_MAX_PENDING_LEADS", "50"))
+# Páginas indecisas enviadas juntas para a análise de IA em lote
+BULK_ANALYSIS_CHUNK = int(os.getenv("BULK_ANALYSIS_CHUNK", str(BATCH_MAX_ITEMS)))
+BULK_ANALYSIS_CONCURRENCY = int(os.getenv("BULK_ANALYSIS_CONCURRENCY", "1"))
+
+_ANALISE = "analise"  # "Fonte" dos futures da análise em lote
+
+_VERIFICACOES = {
+    "facebook": ("instagram_username", verificar_facebook_ads),
+    "google": ("domain", verificar_google_ads),
+    "qsa": ("cnpj", verificar_qsa),
+}
+
+_VALORES_VERDADEIROS = ("1", "true", "sim", "yes", "x")
+
+
+def _ler_checklist(registro):
+    """Monta o checklist a partir da coluna `checklist` e/ou de colunas com os nomes dos critérios.
+
+    A coluna `checklist` pode ser um objeto JSON ou uma lista de critérios separados por ';' ou ','.
+    """
+    checklist = {}
+    bruto = registro.get("checklist")
+    if isinstance(bruto, dict):
+        checklist.update(bruto)
+    elif isinstance(bruto, str) and bruto.strip():
+        bruto = bruto.strip()
+        if bruto.startswith("{"):
+            checklist.update(json.loads(bruto))
+        else:
+            for chave in bruto.replace(",", ";").split(";"):
+                if chave.strip():
+                    checklist[chave.strip()] = True
+    for chave in CRITERIA_POINTS:
+        valor = registro.get(chave)
+        if isinstance(valor, str):
+            valor = valor.strip().lower() in _VALORES_VERDADEIROS
+        if valor:
+            checklist[chave] = True
+    return checklist
+
+
+def _normalizar_lead(registro):
+    """Converte um registro CSV/JSONL no formato usado pela qualificação. Levanta ValueError se inválido."""
+    return {
+        "instagram_username": (registro.get("instagram_username") or "").strip(),
+        "domain": (registro.get("domain") or "").strip(),
+        "cnpj": (registro.get("cnpj") or "").strip(),
+        "valor_inicial": float(registro.get("valorInicial") or 0),
+        "valor_atual": float(registro.get("valorAtual") or 0),
+        "checklist": _ler_checklist(registro),
+    }
+
+
+def ler_leads(linhas, formato="csv"):
+    """Itera sobre (numero_da_linha, registro) de um arquivo CSV (com cabeçalho) ou JSONL."""
+    if formato == "jsonl":
+        for numero, linha in enumerate(linhas, start=1):
+            if not linha.strip():
+                continue
+            try:
+                yield numero, json.loads(linha)
+            except json.JSONDecodeError:
+                yield numero, None  # Vira um resultado com `error` em qualificar_leads
+    else:
+        for numero, registro in enumerate(csv.DictReader(linhas), start=2):
+            yield numero, registro
+
+
+def _pontuar(lead, resultados):
+    verification_results = montar_resultados(lead["instagram_username"], lead["domain"], lead["cnpj"], resultados)
+    score = calculate_score(lead["checklist"], verification_results)
+    return {
+        "score": score,
+        "qualification": determine_qualification(score, lead["valor_inicial"], lead["valor_atual"]),
+        "verifications": verification_results,
+    }
+
+
+def _executar_em_lote(cancelamento, verificacao, alvo, force_refresh):
+    """Roda a verificação com prioridade de lote: crawls interativos passam na frente."""
+    with crawl_context(prioridade=PRIORITY_BULK, cancelamento=cancelamento):
+        return verificacao(alvo, force_refresh)
+
+
+def _preparar_em_lote(cancelamento, plataforma, alvo, force_refresh):
+    """Extrai a página de anúncios com prioridade de lote; devolve (resultado, conteudo) de preparar_anuncios."""
+    with crawl_context(prioridade=PRIORITY_BULK, cancelamento=cancelamento):
+        return preparar_anuncios(plataforma, alvo, force_refresh)
+
+
+def _analisar_bloco(bloco):
+    """Uma chamada de analisar_anuncios_em_lote para o bloco (estado, plataforma, alvo, conteudo)."""
+    tem_anuncios = analisar_anuncios_em_lote(
+        [(plataforma, alvo, conteudo) for _, plataforma, alvo, conteudo in bloco], classificar=False,
+    )
+    return [concluir_anuncios(plataforma, alvo, ativo) for (_, plataforma, alvo, _), ativo in zip(bloco, tem_anuncios)]
+
+
+def _erro(fonte, e):
+    return {"status": "error", "error": f"{fonte}: {str(e)}", "data": None}
+
+
+def qualificar_leads(registros, force_refresh=False, concorrencia=None, max_pendentes=BULK_MAX_PENDING_LEADS):
+    """Qualifica os leads de `registros` ((linha, registro)) e gera os resultados à medida que ficam prontos.
+
+    Cada resultado tem a linha de origem e os campos de /api/qualify
+    (score, qualification, verifications), ou `error` se o registro for inválido.
+    """
+    concorrencia = dict(BULK_SOURCE_CONCURRENCY, **(concorrencia or {}))
+    executores = {
+        fonte: ThreadPoolExecutor(max_workers=max(1, concorrencia[fonte]), thread_name_prefix=f"bulk-{fonte}")
+        for fonte in _VERIFICACOES
+    }
+    executores[_ANALISE] = ThreadPoolExecutor(
+        max_workers=max(1, BULK_ANALYSIS_CONCURRENCY), thread_name_prefix="bulk-analise",
+    )
+    cancelamento = threading.Event()  # Acionado se o consumidor parar de ler (ex: cliente desconectou)
+    em_andamento = {}  # future -> (estado do lead, fonte) ou (bloco, _ANALISE)
+    aguardando_analise = []  # (estado do lead, plataforma, alvo, conteudo) sem decisão do fast path
+    leads_pendentes = 0
+    registros = iter(registros)
+    esgotado = False
+
+    try:
+        while True:
+            while not esgotado and leads_pendentes < max_pendentes:
+                try:
+                    linha, registro = next(registros)
+                except StopIteration:
+                    esgotado = True
+                    break
+                try:
+                    lead = _normalizar_lead(registro)
+                except (ValueError, TypeError, AttributeError) as e:
+                    yield {"line": linha, "error": f"Registro inválido: {str(e)}"}
+                    continue
+
+                estado = {"line": linha, "lead": lead, "faltam": 0, "resultados": {}}
+                for fonte, (campo, verificacao) in _VERIFICACOES.items():
+                    if lead[campo]:
+                        if fonte in PLATAFORMAS_ANUNCIOS:
+                            tarefa, args = _preparar_em_lote, (fonte, lead[campo], force_refresh)
+                        else:
+                            tarefa, args = _executar_em_lote, (verificacao, lead[campo], force_refresh)
+                        future = executores[fonte].submit(
+                            contextvars.copy_context().run, tarefa, cancelamento, *args,
+                        )
+                        em_andamento[future] = (estado, fonte)
+                        estado["faltam"] += 1
+                if estado["faltam"] == 0:
+                    yield {"line": linha, **_pontuar(lead, {})}
+                else:
+                    leads_pendentes += 1
+
+            # Um bloco sai cheio ou, sem extrações de anúncios em andamento, com o que houver
+            extraindo = any(fonte in PLATAFORMAS_ANUNCIOS for _, fonte in em_andamento.values())
+            while aguardando_analise and (len(aguardando_analise) >= BULK_ANALYSIS_CHUNK or not extraindo):
+                bloco = aguardando_analise[:BULK_ANALYSIS_CHUNK]
+                del aguardando_analise[:BULK_ANALYSIS_CHUNK]
+                future = executores[_ANALISE].submit(contextvars.copy_context().run, _analisar_bloco, bloco)
+                em_andamento[future] = (bloco, _ANALISE)
+
+            if not em_andamento:
+                break
+
+            concluidos, _ = wait(em_andamento, return_when=FIRST_COMPLETED)
+            prontos = []  # (estado do lead, fonte, resultado)
+            for future in concluidos:
+                estado, fonte = em_andamento.pop(future)
+                if fonte == _ANALISE:
+                    try:
+                        resultados = future.result()
+                    except Exception as e:
+                        logger.error(f"Erro na análise em lote de {len(estado)} páginas: {str(e)}")
+                        resultados = [_erro(plataforma, e) for _, plataforma, _, _ in estado]
+                    prontos.extend(
+                        (estado_lead, plataforma, resultado)
+                        for (estado_lead, plataforma, _, _), resultado in zip(estado, resultados)
+                    )
+                    continue
+                try:
+                    resultado = future.result()
+                except Exception as e:
+                    logger.error(f"Erro na verificação {fonte} do lead da linha {estado['line']}: {str(e)}")
+                    resultado = _erro(fonte, e)
+                else:
+                    if fonte in PLATAFORMAS_ANUNCIOS:
+                        resultado, conteudo = resultado
+                        if resultado is None:
+                            campo, _ = _VERIFICACOES[fonte]
+                            aguardando_analise.append((estado, fonte, estado["lead"][campo], conteudo))
+                            continue
+                prontos.append((estado, fonte, resultado))
+
+            for estado, fonte, resultado in prontos:
+                estado["resultados"][fonte] = resultado
+                estado["faltam"] -= 1
+                if estado["faltam"] == 0:
+                    leads_pendentes -= 1
+                    yield {"line": estado["line"], **_pontuar(estado["lead"], estado["resultados"])}
+    finally:
+        cancelamento.set()
+        for executor in executores.values():
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+def qualificar_leads_ndjson(registros, force_refresh=False):
+    """Mesmo que qualificar_leads, mas gerando linhas NDJSON prontas para streaming."""
+    for resultado in qualificar_leads(registros, force_refresh=force_refresh):
+        yield json.dumps(resultado, ensure_ascii=False) + "\n"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Qualifica leads em lote a partir de um arquivo CSV ou JSONL.")
+    parser.add_argument("arquivo", help="Arquivo de leads (CSV com cabeçalho ou JSONL); '-' para stdin")
+    parser.add_argument("-o", "--output", help="Arquivo NDJSON de saída (padrão: stdout)")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="Formato de entrada (padrão: pela extensão)")
+    parser.add_argument("--force-refresh", action="store_true", help="Ignora o cache de resultados")
+    args = parser.parse_args(argv)
+
+    formato = args.format or ("jsonl" if args.arquivo.endswith((".jsonl", ".ndjson")) else "csv")
+    entrada = sys.stdin if args.arquivo == "-" else open(args.arquivo, newline="", encoding="utf-8-sig")
+    saida = sys.stdout if not args.output else open(args.output, "w", encoding="utf-8")
+    try:
+        for linha in qualificar_leads_ndjson(ler_leads(entrada, formato), force_refresh=args.force_refresh):
+            saida.write(linha)
+            saida.flush()
+    finally:
+        if entrada is not sys.stdin:
+            entrada.close()
+        if saida is not sys.stdout:
+            saida.close()
+
+
+if __name__ == "__main__":
+    main()
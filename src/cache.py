@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+"""Cache de resultados de verificação (Facebook Ads, Google Ads e QSA).
+
+As entradas são indexadas pela fonte e pelo alvo normalizado (usuário, domínio
+ou CNPJ só com dígitos) e expiram conforme o TTL de cada fonte. A camada em
+memória usa LRU; se VERIFICATION_CACHE_DB apontar para um arquivo SQLite, ele
+também é consultado/gravado para compartilhar o cache entre workers do gunicorn.
+Com a pré-busca ligada o SQLite é usado por padrão (ver caminho_compartilhado).
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+
+def caminho_compartilhado(variavel, arquivo):
+    """Arquivo SQLite para compartilhar estado entre os workers, configurado em `variavel`.
+
+    Sem a variável, usa src/database/`arquivo` enquanto a pré-busca estiver
+    ligada (PREFETCH_ENABLED): o pedido real costuma cair em outro worker do
+    gunicorn e só aproveita a pré-busca se o cache e o single-flight forem
+    compartilhados. Com a variável vazia o estado fica só no processo.
+    """
+    padrao = None
+    if os.getenv("PREFETCH_ENABLED", "1").lower() in ("1", "true", "yes"):
+        padrao = os.path.join(os.path.dirname(__file__), "database", arquivo)
+    return os.getenv(variavel, padrao) or None
+
+# TTL em segundos por fonte: status de anúncios muda diariamente, QSA raramente
+CACHE_TTLS = {
+    "facebook": int(os.getenv("CACHE_TTL_FACEBOOK", str(6 * 3600))),
+    "google": int(os.getenv("CACHE_TTL_GOOGLE", str(6 * 3600))),
+    "qsa": int(os.getenv("CACHE_TTL_QSA", str(7 * 24 * 3600))),
+}
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "2048"))
+VERIFICATION_CACHE_DB = caminho_compartilhado("VERIFICATION_CACHE_DB", "cache.db")  # Ex: /var/lib/lead_checker/cache.db
+
+
+def normalizar_alvo(fonte, alvo):
+    """Normaliza o alvo de uma verificação para uso como chave.
+
+    - qsa: apenas os dígitos do CNPJ (como em consultar_qsa)
+    - google: domínio em minúsculas, sem esquema, "www.", porta ou caminho
+    - facebook: usuário em minúsculas, sem "@" e sem URL do Instagram
+    """
+    alvo = (alvo or "").strip()
+    if fonte == "qsa":
+        return "".join(filter(str.isdigit, alvo))
+    if fonte == "google":
+        dominio = alvo.lower()
+        if "://" not in dominio:
+            dominio = "//" + dominio
+        dominio = (urlsplit(dominio).hostname or "").rstrip(".")
+        return dominio[4:] if dominio.startswith("www.") else dominio
+    if fonte == "facebook":
+        usuario = alvo.lower().rstrip("/")
+        if "instagram.com/" in usuario:
+            usuario = usuario.split("instagram.com/", 1)[1].split("/", 1)[0]
+        return usuario.lstrip("@")
+    return alvo.lower()
+
+
+class _SQLiteBackend:
+    """Armazenamento compartilhado entre processos (uma conexão por thread)."""
+
+    def __init__(self, path, relogio=time.time):
+        self.path = path
+        self.relogio = relogio
+        self._local = threading.local()
+        diretorio = os.path.dirname(path)
+        if diretorio:
+            os.makedirs(diretorio, exist_ok=True)
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS verification_cache ("
+            " fonte TEXT NOT NULL, chave TEXT NOT NULL, valor TEXT NOT NULL,"
+            " expira_em REAL NOT NULL, PRIMARY KEY (fonte, chave))"
+        )
+        conn.commit()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, fonte, chave):
+        row = self._conn().execute(
+            "SELECT valor, expira_em FROM verification_cache WHERE fonte = ? AND chave = ?",
+            (fonte, chave),
+        ).fetchone()
+        if row is None or row[1] <= self.relogio():
+            return None
+        return json.loads(row[0]), row[1]
+
+    def set(self, fonte, chave, valor, expira_em):
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO verification_cache (fonte, chave, valor, expira_em) VALUES (?, ?, ?, ?)",
+            (fonte, chave, json.dumps(valor, ensure_ascii=False), expira_em),
+        )
+        conn.commit()
+
+    def delete(self, fonte, chave):
+        conn = self._conn()
+        conn.execute("DELETE FROM verification_cache WHERE fonte = ? AND chave = ?", (fonte, chave))
+        conn.commit()
+
+    def purge_expired(self):
+        conn = self._conn()
+        conn.execute("DELETE FROM verification_cache WHERE expira_em <= ?", (self.relogio(),))
+        conn.commit()
+
+
+class VerificationCache:
+    """Cache LRU com TTL por fonte e backend SQLite opcional.
+
+    As expirações são instantes de `relogio` (epoch, comparável entre processos).
+    """
+
+    def __init__(self, ttls=None, max_entries=CACHE_MAX_ENTRIES, db_path=VERIFICATION_CACHE_DB, relogio=time.time):
+        self.ttls = dict(CACHE_TTLS if ttls is None else ttls)
+        self.max_entries = max_entries
+        self.relogio = relogio
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._backend = None
+        if db_path:
+            try:
+                self._backend = _SQLiteBackend(db_path, relogio)
+                self._backend.purge_expired()
+            except sqlite3.Error as e:
+                logger.error(f"Não foi possível abrir o cache SQLite em {db_path}: {str(e)}. Usando apenas memória.")
+
+    def _lembrar(self, key, valor, expira_em):
+        self._entries[key] = (expira_em, valor)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, fonte, alvo):
+        """Devolve o valor em cache para (fonte, alvo) ou None se ausente/expirado."""
+        key = (fonte, normalizar_alvo(fonte, alvo))
+        with self._lock:
+            entrada = self._entries.get(key)
+            if entrada is not None:
+                if entrada[0] > self.relogio():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entrada[1]
+                del self._entries[key]
+
+        if self._backend is not None:
+            try:
+                encontrado = self._backend.get(*key)
+            except sqlite3.Error as e:
+                logger.warning(f"Erro ao ler cache SQLite: {str(e)}")
+                encontrado = None
+            if encontrado is not None:
+                valor, expira_em = encontrado
+                with self._lock:
+                    self._lembrar(key, valor, expira_em)
+                    self.hits += 1
+                return valor
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def peek(self, fonte, alvo):
+        """Como get, mas sem contar acerto/falha nem alterar a ordem do LRU."""
+        key = (fonte, normalizar_alvo(fonte, alvo))
+        with self._lock:
+            entrada = self._entries.get(key)
+            if entrada is not None and entrada[0] > self.relogio():
+                return entrada[1]
+        if self._backend is not None:
+            try:
+                encontrado = self._backend.get(*key)
+            except sqlite3.Error as e:
+                logger.warning(f"Erro ao ler cache SQLite: {str(e)}")
+                encontrado = None
+            if encontrado is not None:
+                return encontrado[0]
+        return None
+
+    def set(self, fonte, alvo, valor):
+        """Armazena `valor` (serializável em JSON) com o TTL da fonte."""
+        ttl = self.ttls.get(fonte, 0)
+        if ttl <= 0:
+            return
+        key = (fonte, normalizar_alvo(fonte, alvo))
+        expira_em = self.relogio() + ttl
+        with self._lock:
+            self._lembrar(key, valor, expira_em)
+        if self._backend is not None:
+            try:
+                self._backend.set(*key, valor, expira_em)
+            except sqlite3.Error as e:
+                logger.warning(f"Erro ao gravar cache SQLite: {str(e)}")
+
+    def invalidate(self, fonte, alvo):
+        """Remove a entrada de (fonte, alvo) da memória e do backend."""
+        key = (fonte, normalizar_alvo(fonte, alvo))
+        with self._lock:
+            self._entries.pop(key, None)
+        if self._backend is not None:
+            try:
+                self._backend.delete(*key)
+            except sqlite3.Error as e:
+                logger.warning(f"Erro ao invalidar cache SQLite: {str(e)}")
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / total) if total else 0.0,
+            }
+
+
+verification_cache = VerificationCache()
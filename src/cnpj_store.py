@@ -0,0 +1,296 @@
+# -*- coding: utf-8 -*-
+"""Base local de CNPJ/QSA a partir dos dados abertos da Receita Federal.
+
+O carregador importa os arquivos públicos (Empresas, Estabelecimentos, Socios e
+Qualificacoes; CSV com ';' em latin-1, compactados em .zip ou não) em blocos
+para um SQLite indexado. consultar_qsa lê primeiro desta base e só usa a API da
+ReceitaWS para CNPJs ausentes ou quando a base está desatualizada.
+
+A importação é feita em uma cópia (`<db>.importando`) que substitui a base com
+os.replace ao final: quem consulta nunca vê tabelas pela metade (ex: sócios
+apagados e ainda não reinseridos). Durante a importação o disco precisa de
+espaço para as duas versões.
+
+Uso:
+    python -m src.cnpj_store --db cnpj.db \\
+        --empresas Empresas*.zip --estabelecimentos Estabelecimentos*.zip \\
+        --socios Socios*.zip --qualificacoes Qualificacoes.zip
+"""
+import argparse
+import csv
+import io
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zipfile
+from contextlib import closing, contextmanager
+
+logger = logging.getLogger(__name__)
+
+CNPJ_STORE_PATH = os.getenv("CNPJ_STORE_PATH")  # Ex: /var/lib/lead_checker/cnpj.db
+CNPJ_STORE_MAX_AGE_DAYS = float(os.getenv("CNPJ_STORE_MAX_AGE_DAYS", "45"))
+IMPORT_CHUNK_SIZE = 50000
+_RELEITURA_METADATA = 60  # Segundos entre releituras da data de importação (reimportação sem reiniciar)
+
+# Códigos de situação cadastral dos dados abertos -> texto usado pela ReceitaWS
+SITUACOES = {"01": "NULA", "1": "NULA", "02": "ATIVA", "2": "ATIVA", "03": "SUSPENSA", "3": "SUSPENSA",
+             "04": "INAPTA", "4": "INAPTA", "08": "BAIXADA", "8": "BAIXADA"}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS empresas (cnpj_basico TEXT PRIMARY KEY, razao_social TEXT);
+CREATE TABLE IF NOT EXISTS estabelecimentos (cnpj TEXT PRIMARY KEY, cnpj_basico TEXT, situacao_cadastral TEXT);
+CREATE TABLE IF NOT EXISTS socios (cnpj_basico TEXT, nome TEXT, qualificacao TEXT);
+CREATE TABLE IF NOT EXISTS qualificacoes (codigo TEXT PRIMARY KEY, descricao TEXT);
+CREATE TABLE IF NOT EXISTS metadata (chave TEXT PRIMARY KEY, valor TEXT);
+"""
+_INDICES = """
+CREATE INDEX IF NOT EXISTS idx_socios_cnpj_basico ON socios (cnpj_basico);
+"""
+
+# Colunas usadas de cada arquivo (posições no layout da Receita) e o INSERT correspondente
+_ARQUIVOS = {
+    "empresas": ((0, 1), "INSERT OR REPLACE INTO empresas VALUES (?, ?)"),
+    "estabelecimentos": ((0, 1, 2, 5), "INSERT OR REPLACE INTO estabelecimentos VALUES (?, ?, ?)"),
+    "socios": ((0, 2, 4), "INSERT INTO socios VALUES (?, ?, ?)"),
+    "qualificacoes": ((0, 1), "INSERT OR REPLACE INTO qualificacoes VALUES (?, ?)"),
+}
+
+
+# --- Importação ---
+
+@contextmanager
+def _abrir_csv(caminho):
+    """Abre um CSV da Receita (ou o primeiro arquivo de um .zip) como texto latin-1."""
+    if zipfile.is_zipfile(caminho):
+        with zipfile.ZipFile(caminho) as arquivo_zip:
+            with io.TextIOWrapper(arquivo_zip.open(arquivo_zip.namelist()[0]), encoding="latin-1", newline="") as texto:
+                yield texto
+    else:
+        with open(caminho, "r", encoding="latin-1", newline="") as texto:
+            yield texto
+
+
+def _linhas(tipo, caminho):
+    colunas, _ = _ARQUIVOS[tipo]
+    with _abrir_csv(caminho) as texto:
+        for registro in csv.reader(texto, delimiter=";", quotechar='"'):
+            if len(registro) <= max(colunas):
+                continue
+            valores = [registro[i].strip() for i in colunas]
+            if tipo == "estabelecimentos":
+                basico, ordem, dv, situacao = valores
+                yield (basico + ordem + dv, basico, situacao)
+            else:
+                yield tuple(valores)
+
+
+def _remover_base(caminho):
+    for arquivo in (caminho, f"{caminho}-journal", f"{caminho}-wal", f"{caminho}-shm"):
+        if os.path.exists(arquivo):
+            os.remove(arquivo)
+
+
+def importar_arquivos(db_path, arquivos_por_tipo, chunk_size=IMPORT_CHUNK_SIZE):
+    """Importa os arquivos da Receita em blocos de `chunk_size` linhas.
+
+    `arquivos_por_tipo` mapeia "empresas", "estabelecimentos", "socios" e
+    "qualificacoes" para listas de caminhos. Sócios das empresas reimportadas
+    são substituídos. A base atual (se houver) é copiada para `<db>.importando`,
+    a importação roda na cópia e a cópia substitui a base só no final.
+    """
+    temporario = f"{db_path}.importando"
+    _remover_base(temporario)  # Sobra de uma importação interrompida
+    if os.path.exists(db_path):
+        with closing(sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)) as origem, \
+                closing(sqlite3.connect(temporario)) as destino:
+            origem.backup(destino)
+    try:
+        _importar(temporario, arquivos_por_tipo, chunk_size)
+        os.replace(temporario, db_path)
+    except BaseException:
+        _remover_base(temporario)
+        raise
+    # Bases antigas ficavam em WAL; a nova usa journal em arquivo e não lê estes
+    for sobra in (f"{db_path}-wal", f"{db_path}-shm"):
+        if os.path.exists(sobra):
+            os.remove(sobra)
+    logger.info(f"Base local de CNPJ atualizada em {db_path}.")
+
+
+def _importar(db_path, arquivos_por_tipo, chunk_size):
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=DELETE")  # Um único arquivo, para o os.replace
+    conn.executescript(_SCHEMA)
+    conn.execute("PRAGMA synchronous=OFF")
+    try:
+        if arquivos_por_tipo.get("socios"):
+            # Sem chave natural: recarrega a tabela inteira para não duplicar sócios
+            conn.execute("DROP INDEX IF EXISTS idx_socios_cnpj_basico")
+            conn.execute("DELETE FROM socios")
+            conn.commit()
+
+        for tipo in ("qualificacoes", "empresas", "estabelecimentos", "socios"):
+            _, insert = _ARQUIVOS[tipo]
+            for caminho in arquivos_por_tipo.get(tipo) or []:
+                inicio, total, bloco = time.monotonic(), 0, []
+                for linha in _linhas(tipo, caminho):
+                    bloco.append(linha)
+                    if len(bloco) >= chunk_size:
+                        conn.executemany(insert, bloco)
+                        conn.commit()
+                        total += len(bloco)
+                        bloco = []
+                if bloco:
+                    conn.executemany(insert, bloco)
+                    conn.commit()
+                    total += len(bloco)
+                logger.info(f"{caminho}: {total} registros de {tipo} importados em {time.monotonic() - inicio:.1f}s.")
+
+        conn.executescript(_INDICES)
+        conn.execute("INSERT OR REPLACE INTO metadata VALUES ('importado_em', ?)", (str(time.time()),))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+# --- Consulta ---
+
+class CNPJStore:
+    """Leitura da base local (uma conexão somente leitura por thread).
+
+    Uma reimportação troca o arquivo inteiro (os.replace); a troca é percebida
+    junto com a releitura da data de importação e as conexões são reabertas.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._arquivo = self._identidade_arquivo()
+        self._geracao = 0
+        self._importado_em = self._ler_importado_em()
+        self._lido_em = time.monotonic()
+
+    def _identidade_arquivo(self):
+        try:
+            estado = os.stat(self.path)
+        except OSError:
+            return None
+        return estado.st_ino, estado.st_mtime_ns
+
+    def _conn(self):
+        local = self._local
+        if getattr(local, "geracao", None) != self._geracao:
+            if getattr(local, "conn", None) is not None:
+                local.conn.close()  # Conexão com o arquivo anterior à reimportação
+            local.conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+            local.geracao = self._geracao
+        return local.conn
+
+    def _ler_importado_em(self):
+        try:
+            row = self._conn().execute("SELECT valor FROM metadata WHERE chave = 'importado_em'").fetchone()
+        except sqlite3.Error:
+            return None
+        return float(row[0]) if row else None
+
+    @property
+    def importado_em(self):
+        """Data (epoch) da última importação, relida a cada _RELEITURA_METADATA segundos."""
+        if time.monotonic() - self._lido_em > _RELEITURA_METADATA:
+            arquivo = self._identidade_arquivo()
+            if arquivo != self._arquivo:
+                self._arquivo = arquivo
+                self._geracao += 1
+            self._importado_em = self._ler_importado_em()
+            self._lido_em = time.monotonic()
+        return self._importado_em
+
+    def idade_dias(self):
+        """Dias desde a última importação (None se a base nunca foi importada)."""
+        importado_em = self.importado_em
+        if importado_em is None:
+            return None
+        return (time.time() - importado_em) / 86400
+
+    def desatualizada(self, max_age_days=CNPJ_STORE_MAX_AGE_DAYS):
+        idade = self.idade_dias()
+        return idade is None or idade > max_age_days
+
+    def consultar(self, cnpj_limpo):
+        """Devolve o QSA no mesmo formato de consultar_qsa, ou None se o CNPJ não estiver na base.
+
+        O estabelecimento (CNPJ completo) precisa existir: só a raiz de 8 dígitos
+        não basta, senão uma filial inexistente herdaria o QSA da matriz.
+        """
+        conn = self._conn()
+        basico = cnpj_limpo[:8]
+        estabelecimento = conn.execute(
+            "SELECT situacao_cadastral FROM estabelecimentos WHERE cnpj = ?", (cnpj_limpo,)
+        ).fetchone()
+        if estabelecimento is None:
+            return None
+        empresa = conn.execute("SELECT razao_social FROM empresas WHERE cnpj_basico = ?", (basico,)).fetchone()
+        if empresa is None:
+            return None
+        socios = conn.execute(
+            "SELECT s.nome, s.qualificacao, q.descricao FROM socios s"
+            " LEFT JOIN qualificacoes q ON q.codigo = s.qualificacao WHERE s.cnpj_basico = ?",
+            (basico,),
+        ).fetchall()
+        return {
+            "success": True,
+            "qsa": [
+                {"nome": nome, "qual": f"{int(codigo)}-{descricao}" if descricao and codigo.isdigit() else codigo}
+                for nome, codigo, descricao in socios
+            ],
+            "razao_social": empresa[0] or "N/A",
+            "situacao": SITUACOES.get(estabelecimento[0], estabelecimento[0]),
+        }
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_cnpj_store():
+    """Devolve a base local configurada em CNPJ_STORE_PATH, ou None se não houver."""
+    global _store
+    if not CNPJ_STORE_PATH or not os.path.exists(CNPJ_STORE_PATH):
+        return None
+    with _store_lock:
+        if _store is None:
+            _store = CNPJStore(CNPJ_STORE_PATH)
+            idade = _store.idade_dias()
+            logger.info(f"Base local de CNPJ carregada de {CNPJ_STORE_PATH} (idade: {'desconhecida' if idade is None else f'{idade:.0f} dias'}).")
+        return _store
+
+
+def consultar_cnpj_local(cnpj_limpo):
+    """Consulta a base local; devolve None se ela não existir, estiver desatualizada ou não tiver o CNPJ."""
+    store = get_cnpj_store()
+    if store is None or store.desatualizada():
+        return None
+    try:
+        return store.consultar(cnpj_limpo)
+    except sqlite3.Error as e:
+        logger.error(f"Erro ao consultar base local de CNPJ: {str(e)}")
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Importa os dados abertos de CNPJ da Receita Federal para a base local.")
+    parser.add_argument("--db", default=CNPJ_STORE_PATH, required=not CNPJ_STORE_PATH,
+                        help="Arquivo SQLite de destino (padrão: CNPJ_STORE_PATH)")
+    for tipo in _ARQUIVOS:
+        parser.add_argument(f"--{tipo}", nargs="+", default=[], help=f"Arquivo(s) de {tipo.capitalize()} (.csv ou .zip)")
+    parser.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    importar_arquivos(args.db, {tipo: getattr(args, tipo) for tipo in _ARQUIVOS}, chunk_size=args.chunk_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""Redução do markdown extraído antes da análise.
+
+As páginas da Biblioteca de Anúncios do Facebook e do Centro de Transparência
+do Google trazem muita navegação, filtros e texto legal. Aqui o conteúdo é
+limpo (links viram texto, imagens e linhas de boilerplate saem) e, quando há
+marcadores de resultado, só a região ao redor deles é mantida: contagem de
+resultados, cabeçalho do anunciante e cartões de anúncio. Assim o corte em
+MAX_CONTENT_LENGTH não descarta justamente a área de resultados.
+"""
+import logging
+import re
+import threading
+
+from src.fast_path import PATTERNS
+
+logger = logging.getLogger(__name__)
+
+# Só linhas curtas (links de navegação, rótulos de filtro) são candidatas a boilerplate
+MAX_LINHA_BOILERPLATE = 80
+# Linhas mantidas antes/depois de cada marcador (cabeçalho do anunciante / corpo do cartão)
+CONTEXTO_ANTES = 3
+CONTEXTO_DEPOIS = 12
+
+_IMAGEM = re.compile(r"!\[[^\]]*\]\([^)]*\)")
+_LINK = re.compile(r"\[([^\]]*)\]\([^)]*\)")
+_URL_SOLTA = re.compile(r"https?://\S+")
+
+_BOILERPLATE_COMUM = [
+    r"pol[ií]tica de (privacidade|cookies)", r"privacy (policy|center)", r"\btermos\b", r"\bterms\b",
+    r"\bcookies?\b", r"©", r"\bidioma\b", r"\blanguage\b", r"central de ajuda", r"help center",
+    r"^\s*(entrar|login|log in|cadastre-se|sign up)\s*$",
+]
+_BOILERPLATE = {
+    "facebook": _BOILERPLATE_COMUM + [
+        r"^\s*(filtros?|filters?)\s*$", r"categoria de an[uú]ncio", r"ad category",
+        r"^\s*(todos os an[uú]ncios|all ads)\s*$", r"relat[oó]rio da biblioteca", r"ad library report",
+        r"^\s*(brasil|brazil)\s*$",
+    ],
+    "google": _BOILERPLATE_COMUM + [
+        r"qualquer hor[aá]rio", r"any time", r"onde aparecem", r"shown in", r"todas as plataformas",
+        r"all platforms", r"todos os formatos", r"all formats", r"^\s*(filtros?|filters?)\s*$",
+        r"sobre o centro de transpar[eê]ncia", r"about ads transparency",
+    ],
+}
+BOILERPLATE_PATTERNS = {
+    plataforma: [re.compile(p, re.IGNORECASE) for p in padroes]
+    for plataforma, padroes in _BOILERPLATE.items()
+}
+
+
+def _limpar_linha(linha):
+    linha = _IMAGEM.sub("", linha)
+    linha = _LINK.sub(r"\1", linha)
+    linha = _URL_SOLTA.sub("", linha)
+    return linha.strip(" \t|*#>-")
+
+
+def _eh_marcador(plataforma, linha, consulta):
+    tabela = PATTERNS.get(plataforma, {})
+    if any(p.search(linha) for padroes in tabela.values() for p in padroes):
+        return True
+    return bool(consulta) and consulta.lower() in linha.lower()
+
+
+def podar_conteudo(plataforma, conteudo, consulta=None):
+    """Devolve o conteúdo reduzido à região de resultados da plataforma."""
+    if not conteudo or "Erro ao extrair" in conteudo:
+        return conteudo
+    boilerplate = BOILERPLATE_PATTERNS.get(plataforma, [])
+
+    linhas, anterior = [], None
+    for bruta in conteudo.splitlines():
+        linha = _limpar_linha(bruta)
+        if len(linha) < 2 or linha == anterior:
+            continue
+        if len(linha) <= MAX_LINHA_BOILERPLATE and any(p.search(linha) for p in boilerplate):
+            continue
+        linhas.append(linha)
+        anterior = linha
+
+    marcadores = [i for i, linha in enumerate(linhas) if _eh_marcador(plataforma, linha, consulta)]
+    if marcadores:
+        manter = set()
+        for i in marcadores:
+            manter.update(range(max(0, i - CONTEXTO_ANTES), min(len(linhas), i + CONTEXTO_DEPOIS + 1)))
+        linhas = [linha for i, linha in enumerate(linhas) if i in manter]
+
+    podado = "\n".join(linhas)
+    if not podado:
+        return conteudo  # Nada sobrou: melhor deixar a decisão com a análise completa
+    pruning_stats.registrar(plataforma, len(conteudo.encode("utf-8")), len(podado.encode("utf-8")))
+    return podado
+
+
+class PruningStats:
+    """Bytes antes/depois da poda, por plataforma."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._dados = {}
+
+    def registrar(self, plataforma, antes, depois):
+        with self._lock:
+            paginas, total_antes, total_depois = self._dados.get(plataforma, (0, 0, 0))
+            self._dados[plataforma] = (paginas + 1, total_antes + antes, total_depois + depois)
+        logger.info(f"Conteúdo de {plataforma} reduzido de {antes} para {depois} bytes.")
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                plataforma: {
+                    "paginas": paginas,
+                    "bytes_antes": antes,
+                    "bytes_depois": depois,
+                    "reducao": (1 - depois / antes) if antes else 0.0,
+                }
+                for plataforma, (paginas, antes, depois) in self._dados.items()
+            }
+
+
+pruning_stats = PruningStats()
@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+"""Agendador de crawls com limite de concorrência, admissão por memória/CPU e prioridades.
+
+Cada extração pelo navegador passa por aqui antes de ocupar um Chromium:
+- limite de crawls simultâneos POR PROCESSO (CRAWL_MAX_CONCURRENCY, padrão igual
+  a BROWSER_POOL_SIZE). Cada worker do gunicorn tem o seu agendador e o seu pool
+  de navegadores, então a máquina toda roda até workers x CRAWL_MAX_CONCURRENCY
+  crawls; a admissão por memória/CPU abaixo é o que limita o conjunto;
+- admissão só com memória disponível e carga de CPU aceitáveis (sempre admite
+  se não há nenhum crawl rodando, para não travar a fila);
+- fila de prioridade: interativo antes de lote, lote antes de pré-busca;
+- prazo por job e cancelamento (ex: cliente desconectou);
+- promoção: um job na fila com evento de promoção acionado passa a ter
+  prioridade interativa (ex: pré-busca que o operador passou a esperar).
+
+Prioridade, prazo, cancelamento e promoção chegam pelo contexto (contextvars),
+definido por quem inicia a verificação com `crawl_context(...)`.
+"""
+import contextvars
+import heapq
+import itertools
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from src.browser_pool import BROWSER_POOL_SIZE
+from src.metrics import stage_duration
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 10
+PRIORITY_PREFETCH = 20
+
+# Por worker; acima do tamanho do pool, os crawls admitidos só esperariam por um navegador livre
+CRAWL_MAX_CONCURRENCY = int(os.getenv("CRAWL_MAX_CONCURRENCY", str(BROWSER_POOL_SIZE)))
+CRAWL_MIN_AVAILABLE_MB = float(os.getenv("CRAWL_MIN_AVAILABLE_MB", "600"))
+CRAWL_MAX_LOAD_PER_CPU = float(os.getenv("CRAWL_MAX_LOAD_PER_CPU", "1.5"))
+_INTERVALO_ADMISSAO = 1.0  # Segundos entre leituras de /proc/meminfo e loadavg
+
+_prioridade = contextvars.ContextVar("crawl_prioridade", default=PRIORITY_INTERACTIVE)
+_prazo = contextvars.ContextVar("crawl_prazo", default=None)  # time.monotonic() absoluto
+_cancelamento = contextvars.ContextVar("crawl_cancelamento", default=None)  # threading.Event
+_promocao = contextvars.ContextVar("crawl_promocao", default=None)  # threading.Event
+
+
+class CrawlCancelled(Exception):
+    """O crawl foi cancelado antes de terminar (ex: cliente desconectou)."""
+
+
+class CrawlDeadlineExceeded(Exception):
+    """O prazo do job acabou antes do crawl começar ou terminar."""
+
+
+@contextmanager
+def crawl_context(prioridade=None, prazo=None, cancelamento=None, promocao=None):
+    """Define prioridade, prazo (monotonic), evento de cancelamento e/ou de promoção para os crawls do bloco."""
+    tokens = []
+    if prioridade is not None:
+        tokens.append((_prioridade, _prioridade.set(prioridade)))
+    if prazo is not None:
+        atual = _prazo.get()
+        tokens.append((_prazo, _prazo.set(prazo if atual is None else min(atual, prazo))))
+    if cancelamento is not None:
+        tokens.append((_cancelamento, _cancelamento.set(cancelamento)))
+    if promocao is not None:
+        tokens.append((_promocao, _promocao.set(promocao)))
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
+
+
+def prazo_atual():
+    return _prazo.get()
+
+
+def prioridade_atual():
+    return _prioridade.get()
+
+
+def promocao_atual():
+    return _promocao.get()
+
+
+def tempo_restante():
+    """Segundos até o prazo do contexto atual, ou None sem prazo."""
+    prazo = _prazo.get()
+    return None if prazo is None else max(0.0, prazo - time.monotonic())
+
+
+def cancelamento_atual():
+    return _cancelamento.get()
+
+
+def _memoria_disponivel_mb():
+    try:
+        with open("/proc/meminfo") as f:
+            for linha in f:
+                if linha.startswith("MemAvailable:"):
+                    return int(linha.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def _carga_por_cpu():
+    try:
+        return os.getloadavg()[0] / (os.cpu_count() or 1)
+    except (AttributeError, OSError):
+        return None
+
+
+class CrawlScheduler:
+    """Fila de prioridade com limite de concorrência e controle de admissão."""
+
+    def __init__(self, max_concurrency=CRAWL_MAX_CONCURRENCY, min_available_mb=CRAWL_MIN_AVAILABLE_MB,
+                 max_load_per_cpu=CRAWL_MAX_LOAD_PER_CPU):
+        self.max_concurrency = max(1, max_concurrency)
+        self.min_available_mb = min_available_mb
+        self.max_load_per_cpu = max_load_per_cpu
+        self._cond = threading.Condition()
+        self._fila = []
+        self._seq = itertools.count()
+        self._rodando = 0
+        self._admissao = (0.0, True, None)  # (verificado_em, admite, motivo)
+        self._stats = {"executados": 0, "cancelados": 0, "prazo_excedido": 0, "adiados_por_recurso": 0,
+                       "espera_total": 0.0, "espera_max": 0.0}
+
+    def _recursos_ok(self):
+        verificado_em, admite, motivo = self._admissao
+        agora = time.monotonic()
+        if agora - verificado_em < _INTERVALO_ADMISSAO:
+            return admite, motivo
+        admite, motivo = True, None
+        memoria = _memoria_disponivel_mb()
+        carga = _carga_por_cpu()
+        if memoria is not None and memoria < self.min_available_mb:
+            admite, motivo = False, f"memória disponível em {memoria:.0f} MB"
+        elif carga is not None and carga > self.max_load_per_cpu:
+            admite, motivo = False, f"carga de CPU em {carga:.2f} por núcleo"
+        self._admissao = (agora, admite, motivo)
+        return admite, motivo
+
+    def _pode_iniciar(self, ticket):
+        if not self._fila or self._fila[0] is not ticket or self._rodando >= self.max_concurrency:
+            return False
+        if self._rodando == 0:
+            return True
+        admite, motivo = self._recursos_ok()
+        if not admite:
+            self._stats["adiados_por_recurso"] += 1
+            logger.info(f"Crawl adiado: {motivo}.")
+        return admite
+
+    def _remover(self, ticket):
+        self._fila.remove(ticket)
+        heapq.heapify(self._fila)
+        self._cond.notify_all()
+
+    def run(self, job):
+        """Espera a vez e executa `job(timeout_restante)`; devolve o retorno de `job`.
+
+        Usa a prioridade, o prazo, o cancelamento e a promoção do contexto atual.
+        """
+        prioridade, prazo, cancelamento = _prioridade.get(), _prazo.get(), _cancelamento.get()
+        promocao = _promocao.get()
+        ticket = [prioridade, next(self._seq)]
+        entrada = time.monotonic()
+        with self._cond:
+            heapq.heappush(self._fila, ticket)
+            while True:
+                if cancelamento is not None and cancelamento.is_set():
+                    self._stats["cancelados"] += 1
+                    self._remover(ticket)
+                    raise CrawlCancelled("Crawl cancelado antes de iniciar.")
+                if prazo is not None and time.monotonic() >= prazo:
+                    self._stats["prazo_excedido"] += 1
+                    self._remover(ticket)
+                    raise CrawlDeadlineExceeded("Prazo esgotado na fila de crawls.")
+                if promocao is not None and promocao.is_set() and ticket[0] > PRIORITY_INTERACTIVE:
+                    ticket[0] = prioridade = PRIORITY_INTERACTIVE
+                    heapq.heapify(self._fila)
+                if self._pode_iniciar(ticket):
+                    break
+                self._cond.wait(timeout=0.25)
+            heapq.heappop(self._fila)
+            self._rodando += 1
+            espera = time.monotonic() - entrada
+            self._stats["executados"] += 1
+            self._stats["espera_total"] += espera
+            self._stats["espera_max"] = max(self._stats["espera_max"], espera)
+            self._cond.notify_all()
+        stage_duration.observe(espera, "crawl_queue")
+        if espera > 1:
+            logger.info(f"Crawl (prioridade {prioridade}) esperou {espera:.1f}s na fila.")
+
+        try:
+            restante = None if prazo is None else max(0.0, prazo - time.monotonic())
+            return job(restante)
+        finally:
+            with self._cond:
+                self._rodando -= 1
+                self._cond.notify_all()
+
+    def tem_vaga(self):
+        """Há vaga para um crawl começar já (fila vazia e abaixo do limite de concorrência)?"""
+        with self._cond:
+            return not self._fila and self._rodando < self.max_concurrency
+
+    def snapshot(self):
+        with self._cond:
+            executados = self._stats["executados"]
+            return {
+                "fila": len(self._fila),
+                "rodando": self._rodando,
+                "limite": self.max_concurrency,
+                "executados": executados,
+                "cancelados": self._stats["cancelados"],
+                "prazo_excedido": self._stats["prazo_excedido"],
+                "adiados_por_recurso": self._stats["adiados_por_recurso"],
+                "espera_media": (self._stats["espera_total"] / executados) if executados else 0.0,
+                "espera_max": self._stats["espera_max"],
+            }
+
+
+crawl_scheduler = CrawlScheduler()
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""Backend HTTP direto para extração das bibliotecas de anúncios.
+
+Em vez de renderizar a página no Chromium, consulta diretamente as requisições
+de dados que as próprias páginas usam e converte a resposta em um texto curto
+com os mesmos marcadores que a análise já reconhece ("N resultados",
+"Nenhum anúncio encontrado", nome do anunciante).
+
+Cada extrator devolve None quando não consegue uma resposta confiável; nesse
+caso o modo "auto" cai para o navegador. "Nenhum anúncio" só é devolvido
+quando a resposta mostra isso positivamente: HTTP 200 com JSON, sem envelope
+de erro e com a chave esperada presente como lista vazia. Qualquer formato
+desconhecido (mudança de esquema, erro, consentimento/captcha) vira None, para
+não virar um "inactive" no cache nem um falso evento na watchlist. EXTRACTOR_BACKEND escolhe o modo:
+"auto" (HTTP e, se preciso, navegador), "http" ou "browser".
+"""
+import json
+import logging
+import os
+
+import requests
+
+from src.http_client import get_session
+
+logger = logging.getLogger(__name__)
+
+EXTRACTOR_BACKEND = os.getenv("EXTRACTOR_BACKEND", "auto").lower()
+
+GOOGLE_ADS_RPC_URL = os.getenv(
+    "GOOGLE_ADS_RPC_URL",
+    "https://adstransparency.google.com/anji/_/rpc/SearchService/SearchCreatives?authuser=",
+)
+GOOGLE_ADS_REGION = int(os.getenv("GOOGLE_ADS_REGION", "2076"))  # Código de região do Brasil
+
+# A API oficial da Biblioteca de Anúncios exige token de acesso; sem ele, o Facebook usa o navegador
+FACEBOOK_AD_LIBRARY_TOKEN = os.getenv("FACEBOOK_AD_LIBRARY_TOKEN")
+FACEBOOK_AD_LIBRARY_API_URL = os.getenv("FACEBOOK_AD_LIBRARY_API_URL", "https://graph.facebook.com/v19.0/ads_archive")
+
+
+def _json_confiavel(response, plataforma, alvo):
+    """Corpo JSON (dict) de uma resposta 200 com Content-Type JSON e sem `error`; senão None."""
+    if response.status_code != 200:
+        logger.warning(f"Backend HTTP do {plataforma} respondeu {response.status_code} para {alvo}.")
+        return None
+    tipo = response.headers.get("Content-Type", "").split(";")[0].strip().lower()
+    if not (tipo == "application/json" or tipo.endswith("+json")):
+        logger.warning(f"Backend HTTP do {plataforma} respondeu {tipo or 'sem Content-Type'} para {alvo}.")
+        return None
+    try:
+        dados = response.json()
+    except ValueError:
+        return None
+    if not isinstance(dados, dict) or "error" in dados:
+        erro = dados.get("error") if isinstance(dados, dict) else type(dados).__name__
+        logger.warning(f"Backend HTTP do {plataforma} sem dados para {alvo}: {erro}")
+        return None
+    return dados
+
+
+def _lista_de_objetos(dados, chave):
+    """dados[chave] se for uma lista só de objetos (vazia inclusive); None se ausente ou em outro formato."""
+    itens = dados.get(chave)
+    if not isinstance(itens, list) or not all(isinstance(item, dict) for item in itens):
+        return None
+    return itens
+
+
+def extrair_google_http(domain):
+    """Consulta o RPC de busca de criativos do Centro de Transparência para o domínio."""
+    payload = {"2": 40, "3": {"12": {"1": domain, "2": True}, "10": GOOGLE_ADS_REGION}, "7": {"1": 1}}
+    try:
+        response = get_session().post(
+            GOOGLE_ADS_RPC_URL,
+            data={"f.req": json.dumps(payload, separators=(",", ":"))},
+            headers={"Content-Type": "application/x-www-form-urlencoded"},
+        )
+    except requests.exceptions.RequestException as e:
+        logger.warning(f"Backend HTTP do Google indisponível para {domain}: {str(e)}")
+        return None
+    dados = _json_confiavel(response, "Google", domain)
+    if dados is None:
+        return None
+    criativos = _lista_de_objetos(dados, "1")
+    if criativos is None:
+        logger.warning(f"Backend HTTP do Google em formato desconhecido para {domain}: chaves {sorted(dados)[:10]}")
+        return None
+    if not criativos:
+        return f"Nenhum anúncio encontrado para o domínio {domain}."
+    anunciantes = sorted({c.get("12") for c in criativos if isinstance(c.get("12"), str)})
+    linhas = [f"{len(criativos)} anúncios encontrados para o domínio {domain}."]
+    linhas += [f"Anunciante: {nome}" for nome in anunciantes]
+    return "\n".join(linhas)
+
+
+def extrair_facebook_http(instagram_username):
+    """Consulta a API da Biblioteca de Anúncios (Graph API) por anúncios ativos no Brasil."""
+    if not FACEBOOK_AD_LIBRARY_TOKEN:
+        return None
+    params = {
+        "search_terms": instagram_username,
+        "ad_reached_countries": '["BR"]',
+        "ad_active_status": "ACTIVE",
+        "ad_type": "ALL",
+        "fields": "page_name,ad_delivery_start_time",
+        "limit": 25,
+        "access_token": FACEBOOK_AD_LIBRARY_TOKEN,
+    }
+    try:
+        response = get_session().get(FACEBOOK_AD_LIBRARY_API_URL, params=params)
+    except requests.exceptions.RequestException as e:
+        logger.warning(f"Backend HTTP do Facebook indisponível para {instagram_username}: {str(e)}")
+        return None
+    dados = _json_confiavel(response, "Facebook", instagram_username)
+    if dados is None:
+        return None
+    anuncios = _lista_de_objetos(dados, "data")
+    if anuncios is None:
+        logger.warning(f"Backend HTTP do Facebook em formato desconhecido para {instagram_username}: chaves {sorted(dados)[:10]}")
+        return None
+    if not anuncios:
+        return f"0 resultados para {instagram_username}. Nenhum anúncio encontrado."
+    linhas = [f"{len(anuncios)} resultados para {instagram_username}."]
+    for anuncio in anuncios:
+        linhas.append(f"{anuncio.get('page_name', '?')} — Veiculação iniciada em {anuncio.get('ad_delivery_start_time', '?')}")
+    return "\n".join(linhas)
+
+
+HTTP_EXTRACTORS = {
+    "facebook": extrair_facebook_http,
+    "google": extrair_google_http,
+}
+
+
+def extrair_via_http(plataforma, alvo):
+    """Tenta o backend HTTP da plataforma; devolve o texto extraído ou None."""
+    extrator = HTTP_EXTRACTORS.get(plataforma)
+    if extrator is None:
+        return None
+    conteudo = extrator(alvo)
+    if conteudo is not None:
+        logger.info(f"Extração de {plataforma} para {alvo} concluída via HTTP direto.")
+    return conteudo
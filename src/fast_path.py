@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""Pré-classificador determinístico das páginas de anúncios.
+
+Antes de chamar o agente de IA, o conteúdo extraído é comparado com uma tabela
+de marcadores por plataforma (os mesmos indicadores listados no prompt). Se só
+aparecerem marcadores de um lado, a página é decidida na hora; se não houver
+marcadores, ou se houver marcadores conflitantes, a decisão fica com o LLM.
+"""
+import logging
+import os
+import random
+import re
+import threading
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+ACTIVE = "active"
+INACTIVE = "inactive"
+UNCERTAIN = "uncertain"
+
+FAST_PATH_ENABLED = os.getenv("FAST_PATH_ENABLED", "1").lower() not in ("0", "false", "no")
+# Fração das decisões rápidas que também é enviada ao LLM para medir concordância
+FAST_PATH_SHADOW_RATE = float(os.getenv("FAST_PATH_SHADOW_RATE", "0.05"))
+
+# Contagem positiva que não faz parte de outro número (ex: não casa o "0" de "10")
+_CONTAGEM_POSITIVA = r"(?<![\d.,])~?\s*[1-9][\d.,]*\s*"
+_CONTAGEM_ZERO = r"(?<![\d.,])~?\s*0\s*"
+
+_PADROES = {
+    "facebook": {
+        INACTIVE: [
+            r"nenhum an[uú]ncio (foi )?encontrado",
+            _CONTAGEM_ZERO + r"resultados?\b",
+            _CONTAGEM_ZERO + r"results?\b",
+            r"no ads (match|found)",
+            r"n[aã]o encontramos (nenhum )?(an[uú]ncio|resultado)",
+        ],
+        ACTIVE: [
+            _CONTAGEM_POSITIVA + r"resultados?\b",
+            _CONTAGEM_POSITIVA + r"results?\b",
+            r"veicula[cç][aã]o iniciada em",
+            r"started running on",
+            r"identifica[cç][aã]o da biblioteca",
+            r"library id",
+        ],
+    },
+    "google": {
+        INACTIVE: [
+            r"nenhum an[uú]ncio (foi )?encontrado",
+            r"n[aã]o veiculou an[uú]ncios",
+            r"no ads found",
+            r"(hasn't|has not) run any ads",
+        ],
+        ACTIVE: [
+            r"\bverificad[oa]\b",
+            r"\bverified\b",
+            r"see all ads",
+            r"ver todos os an[uú]ncios",
+            _CONTAGEM_POSITIVA + r"an[uú]ncios?\b",
+        ],
+    },
+}
+
+# Tabela compilada uma única vez na importação
+PATTERNS = {
+    plataforma: {
+        decisao: [re.compile(p, re.IGNORECASE) for p in padroes]
+        for decisao, padroes in por_decisao.items()
+    }
+    for plataforma, por_decisao in _PADROES.items()
+}
+
+
+def classificar_rapido(plataforma, conteudo):
+    """Classifica o conteúdo em ACTIVE, INACTIVE ou UNCERTAIN sem chamar o LLM."""
+    tabela = PATTERNS.get(plataforma)
+    if not FAST_PATH_ENABLED or not tabela or not conteudo:
+        return UNCERTAIN
+    ativo = any(p.search(conteudo) for p in tabela[ACTIVE])
+    inativo = any(p.search(conteudo) for p in tabela[INACTIVE])
+    if ativo == inativo:
+        return UNCERTAIN
+    return ACTIVE if ativo else INACTIVE
+
+
+class FastPathStats:
+    """Contadores das decisões rápidas e da concordância com o LLM (amostragem)."""
+
+    def __init__(self, shadow_rate=FAST_PATH_SHADOW_RATE, max_divergencias=50):
+        self.shadow_rate = shadow_rate
+        self._lock = threading.Lock()
+        self._decisoes = {}
+        self._comparacoes = {}
+        self.divergencias = deque(maxlen=max_divergencias)
+
+    def registrar_decisao(self, plataforma, decisao):
+        with self._lock:
+            chave = (plataforma, decisao)
+            self._decisoes[chave] = self._decisoes.get(chave, 0) + 1
+
+    def deve_comparar(self):
+        """Sorteia se esta decisão rápida também deve ser conferida pelo LLM."""
+        return self.shadow_rate > 0 and random.random() < self.shadow_rate
+
+    def registrar_comparacao(self, plataforma, consulta, decisao, llm_ativo):
+        concorda = (decisao == ACTIVE) == llm_ativo
+        with self._lock:
+            acertos, total = self._comparacoes.get(plataforma, (0, 0))
+            self._comparacoes[plataforma] = (acertos + int(concorda), total + 1)
+            if not concorda:
+                self.divergencias.append({
+                    "plataforma": plataforma,
+                    "consulta": consulta,
+                    "fast_path": decisao,
+                    "llm": ACTIVE if llm_ativo else INACTIVE,
+                })
+        if not concorda:
+            logger.warning(f"Fast path divergiu do LLM para {consulta} ({plataforma}): {decisao} vs {'active' if llm_ativo else 'inactive'}")
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "decisoes": {f"{p}:{d}": n for (p, d), n in self._decisoes.items()},
+                "concordancia": {
+                    p: {"comparacoes": total, "concordancias": acertos,
+                        "taxa": (acertos / total) if total else None}
+                    for p, (acertos, total) in self._comparacoes.items()
+                },
+                "divergencias_recentes": list(self.divergencias),
+            }
+
+
+fast_path_stats = FastPathStats()
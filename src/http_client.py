@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""Cliente HTTP compartilhado para chamadas a serviços externos.
+
+Uma única requests.Session por processo, com pool de conexões keep-alive,
+timeouts separados de conexão/leitura, novas tentativas com backoff e jitter
+(apenas para falhas de conexão e 5xx) e histogramas de latência por host.
+"""
+import logging
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+HTTP_POOL_CONNECTIONS = int(os.getenv("HTTP_POOL_CONNECTIONS", "10"))  # Hosts distintos mantidos no pool
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "20"))  # Conexões keep-alive por host
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "20"))
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "2"))
+HTTP_BACKOFF_FACTOR = float(os.getenv("HTTP_BACKOFF_FACTOR", "0.5"))
+HTTP_BACKOFF_JITTER = float(os.getenv("HTTP_BACKOFF_JITTER", "0.5"))
+
+# Limites superiores (s) dos buckets dos histogramas de latência
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, float("inf"))
+
+
+class LatencyHistogram:
+    """Histograma cumulativo de latências por host."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._hosts = {}
+
+    def observe(self, host, segundos):
+        with self._lock:
+            dados = self._hosts.setdefault(host, {"count": 0, "sum": 0.0, "buckets": [0] * len(self.buckets)})
+            dados["count"] += 1
+            dados["sum"] += segundos
+            for i, limite in enumerate(self.buckets):
+                if segundos <= limite:
+                    dados["buckets"][i] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                host: {
+                    "count": dados["count"],
+                    "sum": dados["sum"],
+                    "buckets": dict(zip(self.buckets, dados["buckets"])),
+                }
+                for host, dados in self._hosts.items()
+            }
+
+
+upstream_latency = LatencyHistogram()
+
+
+def _retry_policy():
+    """Novas tentativas só para falhas de conexão e 5xx; 429 fica com o limitador de taxa."""
+    opcoes = dict(
+        total=None,
+        connect=HTTP_MAX_RETRIES,
+        read=0,  # Timeouts de leitura voltam ao chamador, que conhece o seu prazo
+        status=HTTP_MAX_RETRIES,
+        other=0,
+        status_forcelist=(500, 502, 503, 504),
+        backoff_factor=HTTP_BACKOFF_FACTOR,
+        raise_on_status=False,
+        respect_retry_after_header=False,
+    )
+    try:
+        return Retry(backoff_jitter=HTTP_BACKOFF_JITTER, **opcoes)
+    except TypeError:
+        return Retry(**opcoes)  # urllib3 < 2 não tem jitter
+
+
+class UpstreamSession(requests.Session):
+    """Session com timeouts padrão e registro de latência por host."""
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT))
+        host = urlsplit(url).hostname or "desconhecido"
+        inicio = time.perf_counter()
+        try:
+            return super().request(method, url, **kwargs)
+        finally:
+            upstream_latency.observe(host, time.perf_counter() - inicio)
+
+
+def _criar_sessao():
+    sessao = UpstreamSession()
+    adapter = HTTPAdapter(
+        pool_connections=HTTP_POOL_CONNECTIONS,
+        pool_maxsize=HTTP_POOL_MAXSIZE,
+        max_retries=_retry_policy(),
+    )
+    sessao.mount("https://", adapter)
+    sessao.mount("http://", adapter)
+    return sessao
+
+
+_sessao = None
+_sessao_pid = None
+_sessao_lock = threading.Lock()
+
+
+def get_session():
+    """Devolve a Session compartilhada do processo (recriada após fork)."""
+    global _sessao, _sessao_pid
+    with _sessao_lock:
+        if _sessao is None or _sessao_pid != os.getpid():
+            _sessao = _criar_sessao()
+            _sessao_pid = os.getpid()
+        return _sessao
@@ -0,0 +1,341 @@
+# -*- coding: utf-8 -*-
+"""Subsistema de jobs em segundo plano para qualificações demoradas.
+
+Um POST cria o job e devolve o id na hora; o trabalho roda em um executor
+próprio do worker que recebeu o POST. O status, os resultados parciais por
+verificação e a lista de eventos que alimenta o stream SSE ficam em SQLite
+(JOBS_DB), compartilhado pelos workers do gunicorn: GET, /events e DELETE
+funcionam em qualquer worker, e o worker que roda o job acompanha os pedidos
+de cancelamento pela tabela.
+
+Um job pode ser cancelado a pedido (DELETE) ou por abandono: ninguém mais o
+acompanha (o último stream SSE fechou e não houve consulta de status dentro de
+JOB_ABANDON_GRACE). Nos dois casos os crawls pendentes saem da fila do
+agendador e o job termina com status "cancelled" e o motivo em `cancel_reason`.
+"""
+import contextvars
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+
+from src.crawl_scheduler import crawl_context
+
+logger = logging.getLogger(__name__)
+
+JOB_MAX_WORKERS = int(os.getenv("JOB_MAX_WORKERS", "4"))
+JOB_TTL = int(os.getenv("JOB_TTL", "3600"))  # Jobs finalizados ficam disponíveis por 1h
+SSE_KEEPALIVE = 15  # Segundos entre comentários de keepalive no stream
+JOB_ABANDON_GRACE = float(os.getenv("JOB_ABANDON_GRACE", "10"))  # Tolerância para o cliente voltar (ex: fallback p/ polling)
+JOBS_DB = os.getenv("JOBS_DB", os.path.join(os.path.dirname(__file__), "database", "jobs.db"))
+_INTERVALO_CONSULTA = 0.25  # Segundos entre leituras da tabela (stream e pedidos de cancelamento)
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "error"
+CANCELLED = "cancelled"
+_FINALIZADOS = (DONE, FAILED, CANCELLED)
+
+# Motivo do cancelamento -> mensagem final do job
+CANCEL_REQUESTED = "requested"
+CANCEL_ABANDONED = "abandoned"
+_MENSAGENS_CANCELAMENTO = {
+    CANCEL_REQUESTED: "Job cancelado a pedido do cliente.",
+    CANCEL_ABANDONED: "Job cancelado: nenhum cliente acompanhando.",
+}
+
+
+class _JobStore:
+    """Estado e eventos dos jobs em SQLite (uma conexão por operação, como em src/single_flight.py)."""
+
+    def __init__(self, path):
+        self.path = path
+        diretorio = os.path.dirname(path)
+        if diretorio:
+            os.makedirs(diretorio, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id TEXT PRIMARY KEY, status TEXT NOT NULL, created_at REAL NOT NULL, finished_at REAL,"
+                " checks TEXT NOT NULL, result TEXT, error TEXT, cancel_reason TEXT,"
+                " last_seen REAL NOT NULL, watchers INTEGER NOT NULL DEFAULT 0, abandon_at REAL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS job_events ("
+                " job_id TEXT NOT NULL, seq INTEGER NOT NULL, event TEXT NOT NULL, data TEXT NOT NULL,"
+                " PRIMARY KEY (job_id, seq))"
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10, isolation_level=None)
+
+    def criar(self, job_id, checks):
+        agora = time.time()
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, status, created_at, checks, last_seen) VALUES (?, ?, ?, ?, ?)",
+                (job_id, PENDING, agora, json.dumps(checks, ensure_ascii=False), agora),
+            )
+
+    def emitir(self, job_id, event, data, **campos):
+        """Grava o evento e atualiza os `campos` do job na mesma transação."""
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if campos:
+                    atribuicoes = ", ".join(f"{campo} = ?" for campo in campos)
+                    conn.execute(f"UPDATE jobs SET {atribuicoes} WHERE id = ?", (*campos.values(), job_id))
+                conn.execute(
+                    "INSERT INTO job_events (job_id, seq, event, data)"
+                    " SELECT ?, COALESCE(MAX(seq), 0) + 1, ?, ? FROM job_events WHERE job_id = ?",
+                    (job_id, event, json.dumps(data, ensure_ascii=False), job_id),
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def carregar(self, job_id):
+        with closing(self._connect()) as conn:
+            conn.row_factory = sqlite3.Row
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row is not None else None
+
+    def eventos(self, job_id, depois):
+        with closing(self._connect()) as conn:
+            return conn.execute(
+                "SELECT seq, event, data FROM job_events WHERE job_id = ? AND seq > ? ORDER BY seq",
+                (job_id, depois),
+            ).fetchall()
+
+    def tocar(self, job_id):
+        with closing(self._connect()) as conn:
+            conn.execute("UPDATE jobs SET last_seen = ? WHERE id = ?", (time.time(), job_id))
+
+    def observar(self, job_id, delta):
+        """Conta os streams abertos; quando o último fecha, o job pode ser abandonado após JOB_ABANDON_GRACE."""
+        agora = time.time()
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE jobs SET watchers = MAX(watchers + ?, 0), last_seen = ?,"
+                " abandon_at = CASE WHEN watchers + ? <= 0 THEN ? ELSE NULL END WHERE id = ?",
+                (delta, agora, delta, agora + JOB_ABANDON_GRACE, job_id),
+            )
+
+    def pedir_cancelamento(self, job_id, motivo):
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE jobs SET cancel_reason = ? WHERE id = ? AND cancel_reason IS NULL AND status IN (?, ?)",
+                (motivo, job_id, PENDING, RUNNING),
+            )
+
+    def cancelamentos(self, ids):
+        """Marca os jobs abandonados entre `ids` e devolve {id: motivo} dos que têm cancelamento pedido."""
+        agora = time.time()
+        marcadores = ", ".join("?" * len(ids))
+        with closing(self._connect()) as conn:
+            conn.execute(
+                f"UPDATE jobs SET cancel_reason = ? WHERE id IN ({marcadores}) AND cancel_reason IS NULL"
+                " AND watchers = 0 AND abandon_at <= ? AND last_seen <= ?",
+                (CANCEL_ABANDONED, *ids, agora, agora - JOB_ABANDON_GRACE),
+            )
+            return dict(conn.execute(
+                f"SELECT id, cancel_reason FROM jobs WHERE id IN ({marcadores}) AND cancel_reason IS NOT NULL",
+                ids,
+            ).fetchall())
+
+    def purgar(self, limite):
+        with closing(self._connect()) as conn:
+            conn.execute("DELETE FROM job_events WHERE job_id IN (SELECT id FROM jobs WHERE finished_at < ?)",
+                         (limite,))
+            conn.execute("DELETE FROM jobs WHERE finished_at < ?", (limite,))
+
+
+class Job:
+    """Estado de um job lido da tabela: status, verificações parciais, resultado final e eventos."""
+
+    def __init__(self, row, store):
+        self.id = row["id"]
+        self.status = row["status"]
+        self.checks = json.loads(row["checks"])
+        self.result = json.loads(row["result"]) if row["result"] is not None else None
+        self.error = row["error"]
+        self.cancel_reason = row["cancel_reason"]
+        self._store = store
+
+    @property
+    def finished(self):
+        return self.status in _FINALIZADOS
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "checks": self.checks,
+            "result": self.result,
+            "error": self.error,
+            "cancel_reason": self.cancel_reason,
+        }
+
+    def stream(self):
+        """Gera os eventos do job no formato SSE, do início até a conclusão (em qualquer worker)."""
+        enviados = 0
+        ultimo_envio = time.monotonic()
+        self._store.observar(self.id, +1)
+        try:
+            while True:
+                # O evento final é gravado junto com o status: lido o status, o evento já está na tabela
+                estado = self._store.carregar(self.id)
+                novos = self._store.eventos(self.id, enviados)
+                for seq, event, data in novos:
+                    enviados = seq
+                    yield f"event: {event}\ndata: {data}\n\n"
+                if estado is None or estado["status"] in _FINALIZADOS:
+                    return
+                if novos:
+                    ultimo_envio = time.monotonic()
+                elif time.monotonic() - ultimo_envio >= SSE_KEEPALIVE:
+                    ultimo_envio = time.monotonic()
+                    yield ": keepalive\n\n"
+                time.sleep(_INTERVALO_CONSULTA)
+        finally:
+            # O gerador é fechado quando o cliente desconecta
+            self._store.observar(self.id, -1)
+
+
+class _Execucao:
+    """O job em execução neste worker: é o que `work(job)` recebe."""
+
+    def __init__(self, job_id, checks, store):
+        self.id = job_id
+        self.checks = {fonte: {"status": "pending"} for fonte in checks}
+        self.cancel_event = threading.Event()
+        self.cancel_reason = None
+        self._store = store
+
+    def start(self):
+        self._store.emitir(self.id, "status", {"status": RUNNING}, status=RUNNING)
+
+    def update_check(self, fonte, resultado):
+        """Registra o resultado parcial de uma verificação (ex: QSA pronto, Google pendente)."""
+        self.checks[fonte] = resultado
+        self._store.emitir(self.id, "check", {"source": fonte, **resultado},
+                           checks=json.dumps(self.checks, ensure_ascii=False))
+
+    def finish(self, result):
+        self._store.emitir(self.id, "done", result, status=DONE, finished_at=time.time(),
+                           result=json.dumps(result, ensure_ascii=False), cancel_reason=None)
+
+    def fail(self, error):
+        self._store.emitir(self.id, "error", {"error": error}, status=FAILED, finished_at=time.time(), error=error)
+
+    def finish_cancelled(self):
+        error = _MENSAGENS_CANCELAMENTO[self.cancel_reason]
+        self._store.emitir(self.id, "cancelled", {"error": error, "reason": self.cancel_reason},
+                           status=CANCELLED, finished_at=time.time(), error=error, cancel_reason=self.cancel_reason)
+
+    def cancel(self, motivo):
+        if not self.cancel_event.is_set():
+            self.cancel_reason = motivo
+            self.cancel_event.set()
+            logger.info(f"Job {self.id} cancelado ({motivo}).")
+
+
+class JobManager:
+    """Cria e executa jobs; o estado fica em JOBS_DB, visível para todos os workers."""
+
+    def __init__(self, max_workers=JOB_MAX_WORKERS, ttl=JOB_TTL, db_path=JOBS_DB):
+        self.ttl = ttl
+        self.max_workers = max_workers
+        self._store = _JobStore(db_path)
+        self._lock = threading.Lock()
+        self._execucoes = {}  # Jobs rodando neste worker
+        self._executor = None
+        self._pid = None
+
+    def _executor_do_processo(self):
+        """Executor e monitor de cancelamentos do worker (recriados após o fork do gunicorn)."""
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._execucoes = {}
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="job")
+                threading.Thread(target=self._monitorar, args=(self._pid,), name="job-monitor", daemon=True).start()
+            return self._executor
+
+    def _monitorar(self, pid):
+        """Repassa aos jobs deste worker os cancelamentos pedidos em qualquer worker (DELETE ou abandono)."""
+        while self._pid == pid:
+            time.sleep(_INTERVALO_CONSULTA)
+            with self._lock:
+                execucoes = dict(self._execucoes)
+            if not execucoes:
+                continue
+            try:
+                for job_id, motivo in self._store.cancelamentos(list(execucoes)).items():
+                    execucoes[job_id].cancel(motivo)
+            except sqlite3.Error as e:
+                logger.warning(f"Erro ao consultar cancelamentos de jobs: {str(e)}")
+
+    def submit(self, work, checks):
+        """Agenda `work(job)` em segundo plano; o retorno de `work` vira o resultado do job."""
+        executor = self._executor_do_processo()
+        job_id = uuid.uuid4().hex
+        self._store.purgar(time.time() - self.ttl)
+        self._store.criar(job_id, {fonte: {"status": "pending"} for fonte in checks})
+        execucao = _Execucao(job_id, checks, self._store)
+        with self._lock:
+            self._execucoes[job_id] = execucao
+        # O job herda o contexto de quem o criou (ex: trace id da requisição)
+        executor.submit(contextvars.copy_context().run, self._run, execucao, work)
+        logger.info(f"Job {job_id} criado ({', '.join(checks) or 'sem verificações'}).")
+        return Job(self._store.carregar(job_id), self._store)
+
+    def _run(self, execucao, work):
+        try:
+            motivo = self._store.carregar(execucao.id)["cancel_reason"]
+            if motivo is not None:  # Cancelado ainda na fila do executor
+                execucao.cancel(motivo)
+                execucao.finish_cancelled()
+                return
+            execucao.start()
+            with crawl_context(cancelamento=execucao.cancel_event):
+                resultado = work(execucao)
+            if execucao.cancel_event.is_set():
+                execucao.finish_cancelled()
+                return
+            execucao.finish(resultado)
+            logger.info(f"Job {execucao.id} concluído.")
+        except Exception as e:
+            logger.error(f"Erro no job {execucao.id}: {str(e)}", exc_info=True)
+            execucao.fail(str(e))
+        finally:
+            with self._lock:
+                self._execucoes.pop(execucao.id, None)
+
+    def get(self, job_id):
+        row = self._store.carregar(job_id)
+        if row is None:
+            return None
+        self._store.tocar(job_id)
+        return Job(row, self._store)
+
+    def cancel(self, job_id):
+        """Pede o cancelamento; o worker que roda o job o interrompe (na hora, se for este)."""
+        self._store.pedir_cancelamento(job_id, CANCEL_REQUESTED)
+        job = self.get(job_id)
+        with self._lock:
+            execucao = self._execucoes.get(job_id) if self._pid == os.getpid() else None
+        if execucao is not None and job is not None and job.cancel_reason is not None:
+            execucao.cancel(job.cancel_reason)  # O motivo gravado primeiro (ex: abandono) vale
+        return job
+
+
+job_manager = JobManager()
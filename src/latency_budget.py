@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""Orçamento de latência por operação e tentativas com hedge.
+
+Cada operação (crawl:facebook, crawl:google, crawl_many...) guarda as durações
+das últimas LATENCY_WINDOW execuções bem-sucedidas. O orçamento é o p95 dessa
+janela vezes LATENCY_BUDGET_FACTOR, limitado a [LATENCY_BUDGET_MIN,
+LATENCY_BUDGET_MAX]; sem amostras suficientes não há orçamento.
+
+`com_hedge` executa a operação e, se ela passar do orçamento, dispara uma
+segunda tentativa em paralelo; vale a primeira resposta aceitável e a outra é
+cancelada. O hedge só é disparado se o prazo restante comportar mais uma
+execução típica, se houver vaga (ex: navegador livre) e dentro do limite de
+hedges simultâneos do processo.
+"""
+import contextvars
+import logging
+import math
+import os
+import queue
+import threading
+import time
+from collections import deque
+
+from src.crawl_scheduler import cancelamento_atual, crawl_context, tempo_restante
+from src.metrics import hedged_attempts
+
+logger = logging.getLogger(__name__)
+
+LATENCY_WINDOW = int(os.getenv("LATENCY_WINDOW", "200"))  # Amostras por operação
+LATENCY_MIN_SAMPLES = int(os.getenv("LATENCY_MIN_SAMPLES", "20"))  # Abaixo disso não há orçamento
+LATENCY_BUDGET_FACTOR = float(os.getenv("LATENCY_BUDGET_FACTOR", "1.0"))
+LATENCY_BUDGET_MIN = float(os.getenv("LATENCY_BUDGET_MIN", "2"))
+LATENCY_BUDGET_MAX = float(os.getenv("LATENCY_BUDGET_MAX", "60"))
+HEDGE_ENABLED = os.getenv("HEDGE_ENABLED", "1").lower() in ("1", "true", "yes")
+HEDGE_MAX_IN_FLIGHT = int(os.getenv("HEDGE_MAX_IN_FLIGHT", "2"))  # Hedges simultâneos por processo
+
+_ESPERA = 0.25  # Intervalo (s) entre verificações de cancelamento enquanto espera as tentativas
+
+
+def _percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, math.ceil(p * len(ordenados)) - 1)]
+
+
+class LatencyBudgets:
+    """Janelas de latência por operação e o orçamento derivado do p95."""
+
+    def __init__(self, janela=LATENCY_WINDOW, min_amostras=LATENCY_MIN_SAMPLES):
+        self.janela = janela
+        self.min_amostras = min_amostras
+        self._lock = threading.Lock()
+        self._amostras = {}
+
+    def observar(self, operacao, segundos):
+        with self._lock:
+            self._amostras.setdefault(operacao, deque(maxlen=self.janela)).append(segundos)
+
+    def p95(self, operacao):
+        with self._lock:
+            amostras = list(self._amostras.get(operacao, ()))
+        if len(amostras) < self.min_amostras:
+            return None
+        return _percentil(amostras, 0.95)
+
+    def orcamento(self, operacao):
+        """Segundos que a operação costuma levar (p95 ajustado), ou None sem histórico suficiente."""
+        p95 = self.p95(operacao)
+        if p95 is None:
+            return None
+        return min(LATENCY_BUDGET_MAX, max(LATENCY_BUDGET_MIN, p95 * LATENCY_BUDGET_FACTOR))
+
+    def snapshot(self):
+        with self._lock:
+            operacoes = {operacao: list(amostras) for operacao, amostras in self._amostras.items()}
+        return {
+            operacao: {
+                "amostras": len(amostras),
+                "p50": _percentil(amostras, 0.5),
+                "p95": _percentil(amostras, 0.95),
+                "orcamento": self.orcamento(operacao),
+            }
+            for operacao, amostras in operacoes.items() if amostras
+        }
+
+
+latency_budgets = LatencyBudgets()
+
+_hedges_em_andamento = 0
+_hedges_lock = threading.Lock()
+
+
+def _reservar_hedge():
+    global _hedges_em_andamento
+    with _hedges_lock:
+        if _hedges_em_andamento >= HEDGE_MAX_IN_FLIGHT:
+            return False
+        _hedges_em_andamento += 1
+        return True
+
+
+def _liberar_hedge():
+    global _hedges_em_andamento
+    with _hedges_lock:
+        _hedges_em_andamento -= 1
+
+
+def com_hedge(operacao, tentativa, aceitavel=lambda resultado: True, pode_disparar=None, hedge=None):
+    """Executa `tentativa()` com uma segunda tentativa em paralelo se a primeira passar do orçamento.
+
+    A segunda tentativa chama `hedge()`, se informado (ex: para passar de novo
+    pela cota da plataforma), ou `tentativa()`.
+    Cada tentativa roda em uma thread com uma cópia do contexto atual e o seu
+    próprio evento de cancelamento (acionado quando a outra vence ou quando o
+    cancelamento de quem chamou é acionado). Devolve o primeiro resultado
+    `aceitavel`; se nenhum for, o da última tentativa a terminar (ou levanta a
+    sua exceção). `pode_disparar()`, se informado, precisa autorizar o hedge.
+    """
+    pai = cancelamento_atual()
+    respostas = queue.Queue()
+    tentativas = []
+
+    def disparar(papel):
+        cancelamento = threading.Event()
+        contexto = contextvars.copy_context()
+        funcao = hedge if papel == "hedge" and hedge is not None else tentativa
+
+        def rodar():
+            inicio = time.monotonic()
+            try:
+                with crawl_context(cancelamento=cancelamento):
+                    respostas.put((papel, True, funcao(), time.monotonic() - inicio))
+            except BaseException as e:
+                respostas.put((papel, False, e, time.monotonic() - inicio))
+            finally:
+                if papel == "hedge":
+                    _liberar_hedge()
+
+        tentativas.append(cancelamento)
+        threading.Thread(target=contexto.run, args=(rodar,), name=f"hedge-{operacao}", daemon=True).start()
+
+    orcamento = latency_budgets.orcamento(operacao) if HEDGE_ENABLED else None
+    if orcamento is None:
+        # Sem orçamento não há hedge: executa na própria thread e só alimenta a janela
+        inicio = time.monotonic()
+        resultado = tentativa()
+        if aceitavel(resultado):
+            latency_budgets.observar(operacao, time.monotonic() - inicio)
+        return resultado
+
+    hedge_em = time.monotonic() + orcamento
+    disparar("primary")
+    pendentes = 1
+    try:
+        while True:
+            espera = _ESPERA if hedge_em is None else max(0.0, min(_ESPERA, hedge_em - time.monotonic()))
+            try:
+                papel, ok, valor, duracao = respostas.get(timeout=espera)
+            except queue.Empty:
+                if pai is not None and pai.is_set():
+                    hedge_em = None
+                    for cancelamento in tentativas:
+                        cancelamento.set()
+                if hedge_em is not None and time.monotonic() >= hedge_em:
+                    hedge_em = None
+                    restante = tempo_restante()
+                    if ((restante is None or restante >= orcamento)
+                            and (pode_disparar is None or pode_disparar()) and _reservar_hedge()):
+                        logger.info(f"{operacao} passou do orçamento de {orcamento:.1f}s; disparando segunda tentativa.")
+                        hedged_attempts.inc(operacao, "fired")
+                        disparar("hedge")
+                        pendentes += 1
+                continue
+
+            pendentes -= 1
+            if ok and aceitavel(valor):
+                latency_budgets.observar(operacao, duracao)
+                if papel == "hedge":
+                    hedged_attempts.inc(operacao, "won")
+                return valor
+            if pendentes == 0:
+                # Sem tentativa em andamento (inclusive se a primeira falhou antes do
+                # orçamento): novas tentativas ficam com quem chamou
+                if ok:
+                    return valor
+                raise valor
+    finally:
+        for cancelamento in tentativas:
+            cancelamento.set()
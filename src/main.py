@@ -1,133 +1,141 @@
 
+import io
+import select
+import socket
 import sys
 import os
+import threading
+import time
+from contextlib import contextmanager
 # Ensure src directory is in path - DO NOT CHANGE
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, Response, g, request, jsonify, render_template
 import logging
 
 # Import verification functions (Corrected Imports for v5)
 # O patch já deve ter sido executado antes desta linha
 from src.verifications import (
     run_verification_tasks, 
-    extract_facebook_ads, 
-    extract_google_ads, 
-    analyze_ads_with_ai,      # Use the generic AI function
-    consultar_qsa
+    verificar_facebook_ads,
+    verificar_google_ads,
+    verificar_qsa
 )
+from src.bulk import ler_leads, qualificar_leads_ndjson
+from src.crawl_scheduler import cancelamento_atual, crawl_context
+from src.jobs import job_manager
+from src.models.user import db
+from src.persistence import init_db, registrar_qualificacao, verificar_com_revalidacao
+from src.prefetch import PREFETCH_FIELDS, prefetcher
+from src.routes.lead import lead_bp
+from src.routes.watchlist import watchlist_bp
+from src.metrics import (
+    http_request_duration, http_requests, instalar_trace_no_log, medir_etapa, novo_trace_id, render_prometheus
+)
+from src.responses import RESPONSE_PROFILES, OrjsonProvider, aplicar_perfil, comprimir, registrar_payload
+from src.scoring import CRITERIA_POINTS, calculate_score, determine_qualification
+from src.watchlist import watchlist_scheduler
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
+instalar_trace_no_log()
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__, template_folder="templates", static_folder="static")
-
-# --- Scoring Logic (No changes needed) ---
-
-# Define points for each criterion
-CRITERIA_POINTS = {
-    # ... (points remain the same)
-    "faturamento_ate_100k": -100,
-    "faturamento_100_200k": -100,
-    "faturamento_200_400k": 0,
-    "faturamento_401k_1M": 30,
-    "faturamento_1M_4M": 30,
-    "interesse_assessoria": 30,
-    "interesse_estruturacao": 10,
-    "interesse_alavancagem": 0,
-    "perfil_nome_completo": 30,
-    "perfil_linkedin": 30,
-    "perfil_cargo_estrategico": 30,
-    "perfil_cargo_tatico": 20,
-    "perfil_cargo_operacional": 0,
-    "contato_email_corp": 10,
-    "contato_email_pessoal": 0,
-    "digital_site_funcional": 30,
-    "digital_site_fora_ar": -20,
-    "digital_produto_sinergia": 20,
-    "social_insta_site": 5,
-    "social_insta_google": 10,
-    "social_insta_5k": 20,
-    "social_sem_presenca": -20,
-    "validacao_cnpj_localizado": 10,
-    "validacao_pessoa_qsa": 30,
-    "validacao_nome_generico": -30,
-    "urgencia_imediata": 20,
-    "urgencia_3_meses": 10,
-    "urgencia_nao_informada": 0,
-    "investimento_google_meta": 30,
-    "investimento_google": 20,
-    "investimento_meta": 20,
-    "manual_verificado_maps": 20,
-    "manual_redirecionado_assessoria": 15
-}
-
-def calculate_score(checklist_data, verification_results):
-    """Calculates the total score based on checklist and verification results."""
-    total = 0
-    logger.info(f"Calculating score with checklist: {checklist_data}")
-    
-    for key, value in checklist_data.items():
-        if key in CRITERIA_POINTS and value: 
-            total += CRITERIA_POINTS.get(key, 0)
-
-    logger.info(f"Score after checklist: {total}")
-
-    if verification_results.get("qsa_status") == "found":
-        total += CRITERIA_POINTS["validacao_cnpj_localizado"]
-        qsa_data = verification_results.get("qsa_data", {})
-        if qsa_data and qsa_data.get("qsa") and len(qsa_data["qsa"]) > 0:
-            total += CRITERIA_POINTS["validacao_pessoa_qsa"]
-            
-    google_active = verification_results.get("google_ads_status") == "active"
-    fb_active = verification_results.get("facebook_ads_status") == "active"
-
-    if google_active and fb_active:
-        total += CRITERIA_POINTS["investimento_google_meta"]
-    elif google_active:
-        total += CRITERIA_POINTS["investimento_google"]
-    elif fb_active:
-        total += CRITERIA_POINTS["investimento_meta"]
-        
-    logger.info(f"Final score after verifications: {total}")
-    return total
-
-def determine_qualification(score, valor_inicial, valor_atual):
-    """Determines the lead qualification based on score and auction values."""
-    qualification = {
-        "status": "descartar",
-        "message": "🔴 Descartar Lead",
-        "teto": 0,
-        "show_teto": False,
-        "alert": None
-    }
-    teto = 0
-
-    if score >= 130:
-        teto = valor_inicial * 1.8
-        qualification["status"] = "comprar"
-        qualification["message"] = f"🟢 COMPRE JÁ liberado (Teto Sugerido: R$ {teto:.2f})"
-        qualification["show_teto"] = True
-    elif score >= 100:
-        teto = valor_inicial * 1.3
-        qualification["status"] = "acompanhar_alto"
-        qualification["message"] = f"🟡 Acompanhar (Teto Sugerido: R$ {teto:.2f})"
-        qualification["show_teto"] = True
-    elif score >= 80:
-        teto = valor_inicial
-        qualification["status"] = "acompanhar_baixo"
-        qualification["message"] = f"⚠️ Acompanhar (Teto Sugerido: R$ {teto:.2f})"
-        qualification["show_teto"] = True
-
-    qualification["teto"] = teto
-
-    valor_atual_num = float(valor_atual) if valor_atual else 0
-    if valor_atual_num > teto and score >= 80:
-        qualification["alert"] = f"❗ Valor atual (R$ {valor_atual_num:.2f}) ultrapassou teto sugerido (R$ {teto:.2f}). Reavaliar risco!"
-
-    logger.info(f"Qualification result: {qualification}")
-    return qualification
+# jsonify/request.json go through orjson when it is installed (src/responses.py)
+app.json = OrjsonProvider(app)
+
+# --- Database ---
+# Leads, verification runs and scores; writes are batched off the request path (src/persistence.py)
+DATABASE_DIR = os.path.join(os.path.dirname(__file__), "database")
+os.makedirs(DATABASE_DIR, exist_ok=True)
+app.config["SQLALCHEMY_DATABASE_URI"] = os.getenv("DATABASE_URL", f"sqlite:///{os.path.join(DATABASE_DIR, 'app.db')}")
+app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+if app.config["SQLALCHEMY_DATABASE_URI"].startswith("sqlite"):
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {"connect_args": {"timeout": 30}}
+db.init_app(app)
+init_db(app)
+
+app.register_blueprint(lead_bp, url_prefix="/api")
+app.register_blueprint(watchlist_bp, url_prefix="/api")
+
+# Watched targets are re-verified by a per-process thread, started on the first request
+# (after gunicorn forks the worker) instead of at import time
+watchlist_scheduler.app = app
+
+# --- Request Instrumentation ---
+
+@app.before_request
+def start_request_trace():
+    """Adopts the caller's X-Request-ID (or creates one) as the trace id for logs and worker threads."""
+    g.trace_id = novo_trace_id(request.headers.get("X-Request-ID"))
+    g.request_started = time.perf_counter()
+
+@app.before_request
+def start_background_workers():
+    """Starts the watchlist scheduler in this worker process (no-op once it is running)."""
+    watchlist_scheduler.garantir()
+
+@app.after_request
+def record_request_metrics(response):
+    endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+    http_requests.inc(endpoint, response.status_code)
+    http_request_duration.observe(time.perf_counter() - g.request_started, endpoint)
+    response.headers["X-Request-ID"] = g.trace_id
+    return response
+
+@app.after_request
+def compress_response(response):
+    """Gzips large JSON responses for clients that accept it (streams are left alone)."""
+    return comprimir(response, request.accept_encodings["gzip"] > 0)
+
+@app.route("/metrics")
+def metrics():
+    """Prometheus text exposition of stage timings, outcomes, cache and upstream stats."""
+    return Response(render_prometheus(), mimetype="text/plain; version=0.0.4")
+
+# --- Client Disconnect ---
+
+# How often (s) a synchronous request checks whether its client is still connected
+DISCONNECT_POLL_INTERVAL = float(os.getenv("DISCONNECT_POLL_INTERVAL", "0.5"))
+
+def _client_disconnected(sock):
+    """The client closed (or reset) the connection: the socket is readable and a peek returns EOF."""
+    try:
+        readable, _, _ = select.select([sock], [], [], 0)
+        return bool(readable) and sock.recv(1, socket.MSG_PEEK) == b""
+    except (OSError, ValueError):
+        return True
+
+@contextmanager
+def cancel_on_disconnect():
+    """Runs the block with a crawl cancel event that fires if the client disconnects.
+
+    Like a cancelled job, the verifications stop at their next checkpoint (browser
+    pool, crawl queue, single-flight wait) instead of running for nobody. Needs the
+    client socket in the WSGI environ (gunicorn or the Werkzeug dev server);
+    otherwise the block runs without cancellation.
+    """
+    sock = request.environ.get("gunicorn.socket") or request.environ.get("werkzeug.socket")
+    if sock is None:
+        yield None
+        return
+    cancel_event, finished = threading.Event(), threading.Event()
+    path = request.path
+
+    def watch():
+        while not finished.wait(DISCONNECT_POLL_INTERVAL):
+            if _client_disconnected(sock):
+                logger.info(f"Client disconnected from {path}; cancelling its verifications.")
+                cancel_event.set()
+                return
+
+    threading.Thread(target=watch, name="disconnect-watch", daemon=True).start()
+    try:
+        with crawl_context(cancelamento=cancel_event):
+            yield cancel_event
+    finally:
+        finished.set()
 
 # --- Flask Routes ---
 
@@ -138,6 +146,29 @@ def home():
 
 # --- Individual Verification Endpoints (Corrected for v5) ---
 
+def _force_refresh_requested(data):
+    """Reads the optional force-refresh flag (JSON body or ?force_refresh=1) that bypasses the result cache."""
+    flag = data.get("force_refresh", request.args.get("force_refresh", False))
+    if isinstance(flag, str):
+        return flag.strip().lower() in ("1", "true", "yes", "sim")
+    return bool(flag)
+
+def _ads_status_response(resultado):
+    """Maps an ads verification result to the status/message pair the frontend renders."""
+    status = resultado["status"]
+    if status == "active":
+        message = "Ativo"
+    elif status == "inactive":
+        message = "Inativo"
+    else:
+        status = "error"
+        message = resultado.get("error") or "Erro na verificação"
+    response_data = {"status": status, "message": message, "cached": resultado.get("cached", False)}
+    if resultado.get("stale"):
+        # Last known result served while a fresh check runs in the background
+        response_data.update(stale=True, checked_at=resultado.get("checked_at"))
+    return response_data
+
 @app.route("/api/verify/instagram", methods=["POST"])
 def verify_instagram_ads_route():
     data = request.json
@@ -146,33 +177,14 @@ def verify_instagram_ads_route():
         return jsonify({"error": "Instagram username is required"}), 400
     
     logger.info(f"Individual verification request for Instagram: {username}")
-    fb_content = extract_facebook_ads(username)
-    
-    # Use the generic AI function for Facebook
-    ai_status = analyze_ads_with_ai("facebook", fb_content, username)
-    
-    # Determine final status and message based on AI result
-    status = "error"
-    message = "Erro na verificação"
-    
-    if ai_status == "active":
-        status = "active"
-        message = "Ativo"
-    elif ai_status == "inactive":
-        status = "inactive"
-        message = "Inativo"
-    elif ai_status == "error_content":
-        message = fb_content if "Erro ao extrair" in fb_content else "Conteúdo inválido ou vazio para análise."
-    elif ai_status == "error_ai_key":
-        message = "Erro: Chave da API OpenAI não configurada."
-    elif ai_status == "error_ai_response":
-        message = "Erro: Resposta inesperada da análise de IA."
-    elif ai_status == "error_ai_exception":
-        message = "Erro: Falha durante a execução da análise de IA."
-    # Default to error if status is unexpected
-
-    logger.info(f"Individual verification result for Instagram {username}: {status}")
-    return jsonify({"status": status, "message": message})
+    prefetcher.reivindicar("facebook", username)
+    with cancel_on_disconnect():
+        resultado = verificar_com_revalidacao("facebook", username, verificar_facebook_ads,
+                                              force_refresh=_force_refresh_requested(data))
+    response_data = _ads_status_response(resultado)
+
+    logger.info(f"Individual verification result for Instagram {username}: {response_data['status']}")
+    return jsonify(response_data)
 
 @app.route("/api/verify/google", methods=["POST"])
 def verify_google_ads_route():
@@ -182,33 +194,14 @@ def verify_google_ads_route():
         return jsonify({"error": "Domain is required"}), 400
 
     logger.info(f"Individual verification request for Google: {domain}")
-    google_content = extract_google_ads(domain)
-    
-    # Use the generic AI function for Google
-    ai_status = analyze_ads_with_ai("google", google_content, domain)
-    
-    # Determine final status and message based on AI result
-    status = "error"
-    message = "Erro na verificação"
-    
-    if ai_status == "active":
-        status = "active"
-        message = "Ativo"
-    elif ai_status == "inactive":
-        status = "inactive"
-        message = "Inativo"
-    elif ai_status == "error_content":
-        message = google_content if "Erro ao extrair" in google_content else "Conteúdo inválido ou vazio para análise."
-    elif ai_status == "error_ai_key":
-        message = "Erro: Chave da API OpenAI não configurada."
-    elif ai_status == "error_ai_response":
-        message = "Erro: Resposta inesperada da análise de IA."
-    elif ai_status == "error_ai_exception":
-        message = "Erro: Falha durante a execução da análise de IA."
-    # Default to error if status is unexpected
-
-    logger.info(f"Individual verification result for Google {domain}: {status}")
-    return jsonify({"status": status, "message": message})
+    prefetcher.reivindicar("google", domain)
+    with cancel_on_disconnect():
+        resultado = verificar_com_revalidacao("google", domain, verificar_google_ads,
+                                              force_refresh=_force_refresh_requested(data))
+    response_data = _ads_status_response(resultado)
+
+    logger.info(f"Individual verification result for Google {domain}: {response_data['status']}")
+    return jsonify(response_data)
 
 @app.route("/api/verify/qsa", methods=["POST"])
 def verify_qsa_route():
@@ -218,7 +211,10 @@ def verify_qsa_route():
         return jsonify({"error": "CNPJ is required"}), 400
 
     logger.info(f"Individual verification request for QSA: {cnpj}")
-    qsa_result = consultar_qsa(cnpj)
+    prefetcher.reivindicar("qsa", cnpj)
+    with cancel_on_disconnect():
+        resultado = verificar_com_revalidacao("qsa", cnpj, verificar_qsa, force_refresh=_force_refresh_requested(data))
+    qsa_result = resultado["data"]
     status = "error"
     message = qsa_result.get("error", "Erro desconhecido")
     qsa_data_simplified = None
@@ -237,9 +233,106 @@ def verify_qsa_route():
         message = "Não encontrado ou inválido"
 
     logger.info(f"Individual verification result for QSA {cnpj}: {status}")
-    return jsonify({"status": status, "message": message, "data": qsa_data_simplified})
+    response_data = {"status": status, "message": message, "data": qsa_data_simplified,
+                     "cached": resultado.get("cached", False)}
+    if resultado.get("stale"):
+        response_data.update(stale=True, checked_at=resultado.get("checked_at"))
+    if "retry_after" in qsa_result:
+        response_data["retry_after"] = qsa_result["retry_after"]  # Estimated wait for the ReceitaWS quota
+    return jsonify(response_data)
+
+# --- Prefetch ---
+
+@app.route("/api/prefetch", methods=["POST"])
+def prefetch_route():
+    """Starts low-priority background checks for the fields the operator has already filled in.
+
+    Fields that are missing or not yet valid are ignored; the later /api/verify/* or
+    /api/qualify call reuses the cached or in-flight result.
+    """
+    data = request.get_json(silent=True) or {}
+    situacoes = {}
+    for campo, (fonte, verificar) in PREFETCH_FIELDS.items():
+        alvo = str(data.get(campo) or "").strip()
+        if alvo:
+            situacoes[fonte] = prefetcher.iniciar(fonte, alvo, verificar)
+    return jsonify({"prefetch": situacoes}), 202
+
+# --- Main Qualification Endpoint ---
+
+# Overall time budget (s) for /api/qualify: checks still running at this point come back as "timeout"
+# and the lead is scored with what finished. 0 disables it (each source keeps only its own limit).
+QUALIFY_SLA = float(os.getenv("QUALIFY_SLA", "100"))
+# Default response profile for /api/qualify (minimal/standard/full, see src/responses.aplicar_perfil)
+QUALIFY_RESPONSE_PROFILE = os.getenv("QUALIFY_RESPONSE_PROFILE", "full")
+
+def _parse_qualify_request(data):
+    """Extracts and normalizes the lead fields used by the qualification endpoints.
+
+    Raises ValueError when the auction values are not numeric.
+    """
+    return {
+        "instagram_username": data.get("instagram_username", "").strip(),
+        "domain": data.get("domain", "").strip(),
+        "cnpj": data.get("cnpj", "").strip(),
+        "valor_inicial": float(data.get("valorInicial", 0)),
+        "valor_atual": float(data.get("valorAtual", 0)),
+        "checklist": data.get("checklist", {}),
+        "force_refresh": _force_refresh_requested(data),
+    }
 
-# --- Main Qualification Endpoint (No changes needed here, uses run_verification_tasks) ---
+def _response_profile(data):
+    """Reads the response profile (JSON body or ?profile=); raises ValueError for unknown profiles."""
+    perfil = str(data.get("profile") or request.args.get("profile") or QUALIFY_RESPONSE_PROFILE).strip().lower()
+    if perfil not in RESPONSE_PROFILES:
+        raise ValueError(f"profile deve ser um de: {', '.join(RESPONSE_PROFILES)}")
+    return perfil
+
+def _qualify(lead, on_progress=None, sla=None):
+    """Runs all verifications for a parsed lead, then scores and qualifies it.
+
+    With `sla` (seconds), sources that have not finished by then are reported with status "timeout".
+    The lead, each source's result and the score are queued for persistence.
+    """
+    por_fonte = {}
+
+    for campo, (fonte, _) in PREFETCH_FIELDS.items():
+        prefetcher.reivindicar(fonte, lead[campo])
+
+    def progress(fonte, resultado):
+        por_fonte[fonte] = resultado
+        if on_progress is not None:
+            on_progress(fonte, resultado)
+
+    # run_verification_tasks internally uses the generic analyze_ads_with_ai
+    verification_results = run_verification_tasks(
+        lead["instagram_username"], lead["domain"], lead["cnpj"],
+        force_refresh=lead["force_refresh"], on_progress=progress, sla=sla
+    )
+    registrar_payload(
+        logger,
+        "Verification results for scoring: " + ", ".join(
+            f"{campo}={verification_results[campo]}" for campo in ("facebook_ads_status", "google_ads_status", "qsa_status")
+        ),
+        verification_results,
+    )
+
+    with medir_etapa("scoring"):
+        score = calculate_score(lead["checklist"], verification_results)
+        qualification = determine_qualification(score, lead["valor_inicial"], lead["valor_atual"])
+
+    result = {
+        "score": score,
+        "qualification": qualification,
+        "verifications": verification_results
+    }
+    cancel_event = cancelamento_atual()
+    if cancel_event is not None and cancel_event.is_set():
+        # Client gone or job cancelled: the partial results are not worth keeping
+        logger.info("Qualification cancelled; partial results are not persisted.")
+    else:
+        registrar_qualificacao(lead, result, por_fonte)
+    return result
 
 @app.route("/api/qualify", methods=["POST"])
 def qualify_lead():
@@ -249,29 +342,13 @@ def qualify_lead():
         if not data:
             return jsonify({"error": "Invalid JSON data"}), 400
 
-        logger.info(f"Received full qualification request: {data}")
-
-        instagram_username = data.get("instagram_username", "").strip()
-        domain = data.get("domain", "").strip()
-        cnpj = data.get("cnpj", "").strip()
-        valor_inicial = float(data.get("valorInicial", 0))
-        valor_atual = float(data.get("valorAtual", 0))
-        checklist_data = data.get("checklist", {})
-
-        # run_verification_tasks internally uses the generic analyze_ads_with_ai
-        verification_results = run_verification_tasks(instagram_username, domain, cnpj)
-        logger.info(f"Full verification results for scoring: {verification_results}")
-
-        score = calculate_score(checklist_data, verification_results)
-        qualification = determine_qualification(score, valor_inicial, valor_atual)
+        lead = _parse_qualify_request(data)
+        perfil = _response_profile(data)
+        registrar_payload(logger, f"Received full qualification request ({perfil} profile)", data)
 
-        response_data = {
-            "score": score,
-            "qualification": qualification,
-            "verifications": verification_results
-        }
-
-        return jsonify(response_data), 200
+        with cancel_on_disconnect():
+            response_data = _qualify(lead, sla=QUALIFY_SLA or None)
+        return jsonify(aplicar_perfil(response_data, perfil)), 200
 
     except ValueError as ve:
         logger.error(f"Value error in /api/qualify: {str(ve)}", exc_info=True)
@@ -280,6 +357,90 @@ def qualify_lead():
         logger.error(f"Error in /api/qualify: {str(e)}", exc_info=True)
         return jsonify({"error": "Internal server error occurred."}), 500
 
+# --- Asynchronous Qualification Jobs ---
+
+@app.route("/api/qualify/jobs", methods=["POST"])
+def create_qualify_job():
+    """Starts a qualification in the background and returns its job id immediately."""
+    data = request.json
+    if not data:
+        return jsonify({"error": "Invalid JSON data"}), 400
+    try:
+        lead = _parse_qualify_request(data)
+        perfil = _response_profile(data)
+    except ValueError as ve:
+        return jsonify({"error": f"Erro nos valores fornecidos: {str(ve)}"}), 400
+
+    registrar_payload(logger, f"Received qualification job request ({perfil} profile)", data)
+    checks = [fonte for fonte, campo in (("facebook", "instagram_username"), ("google", "domain"), ("qsa", "cnpj"))
+              if lead[campo]]
+    job = job_manager.submit(lambda job: aplicar_perfil(
+        _qualify(lead, on_progress=job.update_check, sla=QUALIFY_SLA or None), perfil), checks)
+    return jsonify({
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": f"/api/qualify/jobs/{job.id}",
+        "events_url": f"/api/qualify/jobs/{job.id}/events",
+    }), 202
+
+@app.route("/api/qualify/jobs/<job_id>", methods=["GET"])
+def get_qualify_job(job_id):
+    """Returns the job status, the partial result of each check and, once done, the qualification."""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job.to_dict())
+
+@app.route("/api/qualify/jobs/<job_id>", methods=["DELETE"])
+def cancel_qualify_job(job_id):
+    """Cancels a running job; crawls still waiting in the scheduler queue are dropped.
+
+    The job ends with status "cancelled" and cancel_reason "requested".
+    """
+    job = job_manager.cancel(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job.to_dict()), 202
+
+@app.route("/api/qualify/jobs/<job_id>/events", methods=["GET"])
+def stream_qualify_job(job_id):
+    """Server-sent events stream: one `check` event per finished verification, then `done`, `error` or `cancelled`."""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return Response(job.stream(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+# --- Bulk Qualification ---
+
+@app.route("/api/qualify/bulk", methods=["POST"])
+def qualify_bulk():
+    """Qualifies many leads from a CSV or JSONL upload and streams each scored lead as NDJSON.
+
+    Accepts the file as the raw body (Content-Type text/csv or application/x-ndjson)
+    or as a multipart upload in the `file` field.
+    """
+    upload = request.files.get("file")
+    if upload is not None:
+        body = upload.read().decode("utf-8-sig")
+        filename = upload.filename or ""
+    else:
+        body = request.get_data(as_text=True)
+        filename = ""
+    if not body.strip():
+        return jsonify({"error": "No leads provided"}), 400
+
+    formato = request.args.get("format")
+    if formato not in ("csv", "jsonl"):
+        is_jsonl = "json" in (request.mimetype or "") or filename.endswith((".jsonl", ".ndjson"))
+        formato = "jsonl" if is_jsonl else "csv"
+
+    force_refresh = request.args.get("force_refresh", "").lower() in ("1", "true", "yes", "sim")
+    logger.info(f"Bulk qualification request ({formato}, {len(body)} bytes)")
+    registros = ler_leads(io.StringIO(body, newline=""), formato)
+    return Response(qualificar_leads_ndjson(registros, force_refresh=force_refresh),
+                    mimetype="application/x-ndjson")
+
 # --- Main Execution ---
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 5001))
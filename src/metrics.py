@@ -0,0 +1,297 @@
+# -*- coding: utf-8 -*-
+"""Instrumentação: contadores, histogramas, tempos por etapa e trace id por requisição.
+
+As métricas ficam em memória (por processo) e são expostas no formato texto do
+Prometheus por `render_prometheus()` (rota /metrics). Além das métricas
+registradas aqui, a exposição inclui os contadores que os outros módulos já
+mantêm: cache de resultados, fast path, poda de conteúdo, latência dos
+serviços externos e fila de crawls.
+
+O trace id vem do cabeçalho X-Request-ID (ou é gerado) e fica em um
+contextvar; `TraceIdFilter` o acrescenta a cada linha de log.
+"""
+import contextvars
+import logging
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+PREFIXO = "v4_verifier"
+# Limites superiores (s) dos buckets; os mesmos de src/http_client.LATENCY_BUCKETS
+DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, float("inf"))
+
+_trace_id = contextvars.ContextVar("trace_id", default=None)
+
+
+# --- Trace id ---
+
+def novo_trace_id(valor=None):
+    """Define o trace id do contexto atual (o recebido ou um novo) e o devolve."""
+    valor = (valor or "").strip()[:128] or uuid.uuid4().hex
+    _trace_id.set(valor)
+    return valor
+
+
+def trace_id_atual():
+    return _trace_id.get()
+
+
+class TraceIdFilter(logging.Filter):
+    """Acrescenta `record.trace_id` ("-" fora de uma requisição)."""
+
+    def filter(self, record):
+        record.trace_id = _trace_id.get() or "-"
+        return True
+
+
+def instalar_trace_no_log(formato="%(levelname)s:%(name)s:[%(trace_id)s] %(message)s"):
+    """Inclui o trace id em todas as linhas dos handlers do logger raiz."""
+    for handler in logging.getLogger().handlers:
+        if not any(isinstance(f, TraceIdFilter) for f in handler.filters):
+            handler.addFilter(TraceIdFilter())
+            handler.setFormatter(logging.Formatter(formato))
+
+
+# --- Métricas ---
+
+def _rotulos(nomes, valores):
+    if not nomes:
+        return ""
+    pares = ",".join(f'{n}="{str(v)}"' for n, v in zip(nomes, valores))
+    return "{" + pares + "}"
+
+
+class Counter:
+    """Contador monotônico com rótulos."""
+
+    def __init__(self, nome, descricao, rotulos=()):
+        self.nome = nome
+        self.descricao = descricao
+        self.rotulos = tuple(rotulos)
+        self._lock = threading.Lock()
+        self._valores = {}
+
+    def inc(self, *valores, quantidade=1):
+        with self._lock:
+            self._valores[valores] = self._valores.get(valores, 0) + quantidade
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._valores)
+
+    def render(self):
+        linhas = [f"# HELP {self.nome} {self.descricao}", f"# TYPE {self.nome} counter"]
+        for valores, total in sorted(self.snapshot().items()):
+            linhas.append(f"{self.nome}{_rotulos(self.rotulos, valores)} {total}")
+        return linhas
+
+
+class Histogram:
+    """Histograma cumulativo com rótulos (buckets em segundos)."""
+
+    def __init__(self, nome, descricao, rotulos=(), buckets=DURATION_BUCKETS):
+        self.nome = nome
+        self.descricao = descricao
+        self.rotulos = tuple(rotulos)
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe(self, segundos, *valores):
+        with self._lock:
+            serie = self._series.setdefault(valores, {"count": 0, "sum": 0.0, "buckets": [0] * len(self.buckets)})
+            serie["count"] += 1
+            serie["sum"] += segundos
+            for i, limite in enumerate(self.buckets):
+                if segundos <= limite:
+                    serie["buckets"][i] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                valores: {"count": s["count"], "sum": s["sum"], "buckets": dict(zip(self.buckets, s["buckets"]))}
+                for valores, s in self._series.items()
+            }
+
+    def render(self):
+        return _render_histograma(self.nome, self.descricao, self.rotulos, self.snapshot())
+
+
+def _render_histograma(nome, descricao, rotulos, series):
+    linhas = [f"# HELP {nome} {descricao}", f"# TYPE {nome} histogram"]
+    for valores, serie in sorted(series.items()):
+        for limite, quantidade in serie["buckets"].items():
+            le = "+Inf" if limite == float("inf") else f"{limite:g}"
+            linhas.append(f"{nome}_bucket{_rotulos(rotulos + ('le',), valores + (le,))} {quantidade}")
+        linhas.append(f"{nome}_sum{_rotulos(rotulos, valores)} {serie['sum']:.6f}")
+        linhas.append(f"{nome}_count{_rotulos(rotulos, valores)} {serie['count']}")
+    return linhas
+
+
+def _render_gauge(nome, descricao, amostras, tipo="gauge"):
+    """`amostras`: lista de (rótulos dict, valor)."""
+    linhas = [f"# HELP {nome} {descricao}", f"# TYPE {nome} {tipo}"]
+    for rotulos, valor in amostras:
+        linhas.append(f"{nome}{_rotulos(tuple(rotulos), tuple(rotulos.values()))} {valor}")
+    return linhas
+
+
+stage_duration = Histogram(
+    f"{PREFIXO}_stage_duration_seconds",
+    "Duração de cada etapa (browser_launch, crawl, extract_http, ai_kickoff, qsa_http, scoring...).",
+    rotulos=("stage",),
+)
+verification_outcomes = Counter(
+    f"{PREFIXO}_verification_outcomes_total",
+    "Resultados das verificações por fonte (active, inactive, found, error_*).",
+    rotulos=("source", "outcome"),
+)
+cache_lookups = Counter(
+    f"{PREFIXO}_cache_lookups_total",
+    "Consultas ao cache de resultados por fonte (hit/miss).",
+    rotulos=("source", "result"),
+)
+http_requests = Counter(
+    f"{PREFIXO}_http_requests_total",
+    "Requisições atendidas por endpoint e código de status.",
+    rotulos=("endpoint", "status"),
+)
+http_request_duration = Histogram(
+    f"{PREFIXO}_http_request_duration_seconds",
+    "Duração das requisições por endpoint.",
+    rotulos=("endpoint",),
+)
+
+llm_calls = Counter(
+    f"{PREFIXO}_llm_calls_total",
+    "Chamadas ao LLM por modo (crew/direct) e resultado (ok, rate_limited, error).",
+    rotulos=("mode", "outcome"),
+)
+llm_tokens = Counter(
+    f"{PREFIXO}_llm_tokens_total",
+    "Tokens consumidos nas chamadas ao LLM (prompt/completion).",
+    rotulos=("mode", "kind"),
+)
+llm_call_duration = Histogram(
+    f"{PREFIXO}_llm_call_duration_seconds",
+    "Latência das chamadas ao LLM bem-sucedidas.",
+    rotulos=("mode",),
+)
+watchlist_checks = Counter(
+    f"{PREFIXO}_watchlist_checks_total",
+    "Reverificações da watchlist (unchanged: hash igual, sem IA; analyzed; changed; error).",
+    rotulos=("source", "result"),
+)
+hedged_attempts = Counter(
+    f"{PREFIXO}_hedged_attempts_total",
+    "Segundas tentativas disparadas por passar do orçamento de latência (fired) e as que venceram (won).",
+    rotulos=("operation", "result"),
+)
+
+prefetches = Counter(
+    f"{PREFIXO}_prefetches_total",
+    "Pedidos de pré-busca por fonte (started, in_flight, done, cached, invalid, busy) e pré-buscas reivindicadas (claimed).",
+    rotulos=("source", "result"),
+)
+
+METRICAS = [stage_duration, verification_outcomes, cache_lookups, http_requests, http_request_duration,
+            llm_calls, llm_tokens, llm_call_duration, watchlist_checks, hedged_attempts, prefetches]
+
+
+@contextmanager
+def medir_etapa(etapa):
+    """Mede a duração do bloco em stage_duration_seconds{stage=etapa}."""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        duracao = time.perf_counter() - inicio
+        stage_duration.observe(duracao, etapa)
+        logger.debug(f"Etapa {etapa} levou {duracao:.3f}s")
+
+
+# --- Exposição ---
+
+def _metricas_externas():
+    """Converte as estatísticas mantidas pelos outros módulos para o formato Prometheus."""
+    from src.cache import verification_cache
+    from src.content_pruning import pruning_stats
+    from src.crawl_scheduler import crawl_scheduler
+    from src.fast_path import fast_path_stats
+    from src.http_client import upstream_latency
+    from src.latency_budget import latency_budgets
+    from src.prefetch import prefetcher
+    from src.single_flight import single_flight
+
+    linhas = []
+    cache = verification_cache.stats()
+    linhas += _render_gauge(f"{PREFIXO}_cache_entries", "Entradas no cache de resultados em memória.",
+                            [({}, cache["entries"])])
+    linhas += _render_gauge(f"{PREFIXO}_cache_hit_ratio", "Taxa de acerto do cache de resultados.",
+                            [({}, f"{cache['hit_rate']:.6f}")])
+
+    decisoes = fast_path_stats.snapshot()["decisoes"]
+    linhas += _render_gauge(
+        f"{PREFIXO}_fast_path_decisions_total", "Decisões do pré-classificador por plataforma.",
+        [(dict(zip(("platform", "decision"), chave.split(":", 1))), n) for chave, n in sorted(decisoes.items())],
+        tipo="counter",
+    )
+
+    poda = pruning_stats.snapshot()
+    linhas += _render_gauge(
+        f"{PREFIXO}_pruning_bytes_total", "Bytes de markdown antes/depois da poda.",
+        [({"platform": p, "stage": etapa}, dados[f"bytes_{etapa}"])
+         for p, dados in sorted(poda.items()) for etapa in ("antes", "depois")],
+        tipo="counter",
+    )
+
+    linhas += _render_histograma(
+        f"{PREFIXO}_upstream_request_duration_seconds", "Latência das chamadas HTTP externas por host.",
+        ("host",), {(host, ): serie for host, serie in upstream_latency.snapshot().items()},
+    )
+
+    fila = crawl_scheduler.snapshot()
+    linhas += _render_gauge(f"{PREFIXO}_crawl_queue_depth", "Crawls esperando na fila.", [({}, fila["fila"])])
+    linhas += _render_gauge(f"{PREFIXO}_crawl_running", "Crawls ocupando o navegador.", [({}, fila["rodando"])])
+    linhas += _render_gauge(f"{PREFIXO}_crawl_queue_wait_max_seconds", "Maior espera na fila de crawls.",
+                            [({}, f"{fila['espera_max']:.6f}")])
+
+    orcamentos = latency_budgets.snapshot()
+    linhas += _render_gauge(
+        f"{PREFIXO}_latency_p95_seconds", "p95 das últimas execuções bem-sucedidas por operação.",
+        [({"operation": operacao}, f"{dados['p95']:.6f}") for operacao, dados in sorted(orcamentos.items())],
+    )
+    linhas += _render_gauge(
+        f"{PREFIXO}_latency_budget_seconds", "Orçamento de latência (a partir do qual há hedge) por operação.",
+        [({"operation": operacao}, f"{dados['orcamento']:.6f}")
+         for operacao, dados in sorted(orcamentos.items()) if dados["orcamento"] is not None],
+    )
+
+    linhas += _render_gauge(f"{PREFIXO}_prefetch_pending", "Pré-buscas na fila ou rodando.",
+                            [({}, prefetcher.stats()["pendentes"])])
+
+    voos = single_flight.stats()
+    linhas += _render_gauge(f"{PREFIXO}_single_flight_in_progress", "Verificações em execução única no momento.",
+                            [({}, voos["em_andamento"])])
+    linhas += _render_gauge(
+        f"{PREFIXO}_single_flight_calls_total", "Chamadas que executaram ou aproveitaram uma execução em andamento.",
+        [({"role": "leader"}, voos["execucoes"]), ({"role": "shared"}, voos["compartilhadas"]),
+         ({"role": "retried"}, voos["retomadas"])],
+        tipo="counter",
+    )
+    return linhas
+
+
+def render_prometheus():
+    """Texto no formato de exposição do Prometheus (text/plain; version=0.0.4)."""
+    linhas = []
+    for metrica in METRICAS:
+        linhas += metrica.render()
+    try:
+        linhas += _metricas_externas()
+    except Exception as e:
+        logger.error(f"Erro ao coletar métricas dos módulos: {str(e)}")
+    return "\n".join(linhas) + "\n"
@@ -0,0 +1,162 @@
+from datetime import datetime
+
+from src.models.user import db
+
+
+class Lead(db.Model):
+    __tablename__ = 'leads'
+
+    id = db.Column(db.Integer, primary_key=True)
+    instagram_username = db.Column(db.String(255), index=True)
+    domain = db.Column(db.String(255), index=True)
+    cnpj = db.Column(db.String(14), index=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    verification_runs = db.relationship('VerificationRun', backref='lead', lazy='dynamic')
+    scores = db.relationship('Score', backref='lead', lazy='dynamic')
+
+    def __repr__(self):
+        return f'<Lead {self.id} {self.instagram_username or "-"}/{self.domain or "-"}/{self.cnpj or "-"}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'instagram_username': self.instagram_username,
+            'domain': self.domain,
+            'cnpj': self.cnpj,
+            'created_at': self.created_at.isoformat(),
+            'updated_at': self.updated_at.isoformat()
+        }
+
+
+class VerificationRun(db.Model):
+    __tablename__ = 'verification_runs'
+    __table_args__ = (
+        # Last known result for a (source, target) pair
+        db.Index('ix_verification_runs_source_target_created', 'source', 'target', 'created_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    lead_id = db.Column(db.Integer, db.ForeignKey('leads.id'), index=True)
+    source = db.Column(db.String(20), nullable=False)
+    target = db.Column(db.String(255), nullable=False)
+    status = db.Column(db.String(20), nullable=False)
+    error = db.Column(db.Text)
+    data = db.Column(db.JSON)
+    cached = db.Column(db.Boolean, nullable=False, default=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<VerificationRun {self.source}:{self.target} {self.status}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'lead_id': self.lead_id,
+            'source': self.source,
+            'target': self.target,
+            'status': self.status,
+            'error': self.error,
+            'data': self.data,
+            'cached': self.cached,
+            'created_at': self.created_at.isoformat()
+        }
+
+
+class Score(db.Model):
+    __tablename__ = 'scores'
+
+    id = db.Column(db.Integer, primary_key=True)
+    lead_id = db.Column(db.Integer, db.ForeignKey('leads.id'), nullable=False, index=True)
+    score = db.Column(db.Integer, nullable=False)
+    status = db.Column(db.String(30), nullable=False)
+    teto = db.Column(db.Float)
+    valor_inicial = db.Column(db.Float)
+    valor_atual = db.Column(db.Float)
+    checklist = db.Column(db.JSON)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+    def __repr__(self):
+        return f'<Score {self.lead_id} {self.score} {self.status}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'lead_id': self.lead_id,
+            'score': self.score,
+            'status': self.status,
+            'teto': self.teto,
+            'valor_inicial': self.valor_inicial,
+            'valor_atual': self.valor_atual,
+            'checklist': self.checklist,
+            'created_at': self.created_at.isoformat()
+        }
+
+
+class WatchTarget(db.Model):
+    __tablename__ = 'watch_targets'
+    __table_args__ = (
+        db.UniqueConstraint('source', 'target', name='uq_watch_targets_source_target'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    lead_id = db.Column(db.Integer, db.ForeignKey('leads.id'), index=True)
+    source = db.Column(db.String(20), nullable=False)
+    target = db.Column(db.String(255), nullable=False)
+    interval_seconds = db.Column(db.Integer, nullable=False)
+    active = db.Column(db.Boolean, nullable=False, default=True)
+    last_status = db.Column(db.String(20))
+    last_error = db.Column(db.Text)
+    content_hash = db.Column(db.String(64))
+    last_checked_at = db.Column(db.DateTime)
+    last_changed_at = db.Column(db.DateTime)
+    next_check_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    changes = db.relationship('StatusChange', backref='watch_target', lazy='dynamic')
+
+    def __repr__(self):
+        return f'<WatchTarget {self.source}:{self.target} {self.last_status or "-"}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'lead_id': self.lead_id,
+            'source': self.source,
+            'target': self.target,
+            'interval_seconds': self.interval_seconds,
+            'active': self.active,
+            'last_status': self.last_status,
+            'last_error': self.last_error,
+            'last_checked_at': self.last_checked_at.isoformat() if self.last_checked_at else None,
+            'last_changed_at': self.last_changed_at.isoformat() if self.last_changed_at else None,
+            'next_check_at': self.next_check_at.isoformat(),
+            'created_at': self.created_at.isoformat()
+        }
+
+
+class StatusChange(db.Model):
+    __tablename__ = 'status_changes'
+
+    id = db.Column(db.Integer, primary_key=True)
+    watch_target_id = db.Column(db.Integer, db.ForeignKey('watch_targets.id'), nullable=False, index=True)
+    source = db.Column(db.String(20), nullable=False)
+    target = db.Column(db.String(255), nullable=False)
+    old_status = db.Column(db.String(20))
+    new_status = db.Column(db.String(20), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+    def __repr__(self):
+        return f'<StatusChange {self.source}:{self.target} {self.old_status}->{self.new_status}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'watch_target_id': self.watch_target_id,
+            'source': self.source,
+            'target': self.target,
+            'old_status': self.old_status,
+            'new_status': self.new_status,
+            'created_at': self.created_at.isoformat()
+        }
@@ -0,0 +1,300 @@
+# -*- coding: utf-8 -*-
+"""Persistência dos leads, das verificações e das pontuações.
+
+As gravações saem do caminho da requisição: as rotas só enfileiram o que
+aconteceu e uma thread de escrita grava em lotes (até PERSIST_BATCH_SIZE itens
+ou a cada PERSIST_FLUSH_INTERVAL segundos), em uma única transação por lote.
+
+A leitura serve a consulta de leads e o stale-while-revalidate das rotas de
+verificação: se o cache não tem o alvo, o último resultado conclusivo gravado
+volta na hora e a verificação é refeita em segundo plano.
+"""
+import atexit
+import contextvars
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+from src.cache import CACHE_TTLS, normalizar_alvo, verification_cache
+from src.crawl_scheduler import crawl_context
+from src.models.lead import Lead, Score, VerificationRun
+from src.models.user import db
+
+logger = logging.getLogger(__name__)
+
+PERSIST_BATCH_SIZE = int(os.getenv("PERSIST_BATCH_SIZE", "100"))
+PERSIST_FLUSH_INTERVAL = float(os.getenv("PERSIST_FLUSH_INTERVAL", "1.0"))
+PERSIST_QUEUE_MAX = int(os.getenv("PERSIST_QUEUE_MAX", "10000"))
+# Idade máxima (s) de um resultado gravado para ainda ser servido enquanto revalida:
+# por padrão o dobro do TTL do cache da fonte (12h para anúncios, 14 dias para o QSA)
+SWR_MAX_AGES = {
+    fonte: int(os.getenv(f"SWR_MAX_AGE_{fonte.upper()}", str(2 * ttl)))
+    for fonte, ttl in CACHE_TTLS.items()
+}
+SWR_MAX_WORKERS = int(os.getenv("SWR_MAX_WORKERS", "2"))
+
+# Só resultados conclusivos servem como "último resultado conhecido"
+CONCLUSIVE_STATUSES = ("active", "inactive", "found")
+
+# Fonte -> campo do lead com o alvo
+LEAD_FIELDS = {"facebook": "instagram_username", "google": "domain", "qsa": "cnpj"}
+
+
+def init_db(app):
+    """Cria as tabelas e prepara o SQLite (WAL) para leituras concorrentes à thread de escrita."""
+    with app.app_context():
+        db.create_all()
+        if db.engine.dialect.name == "sqlite":
+            with db.engine.connect() as conn:
+                conn.execute(text("PRAGMA journal_mode=WAL"))
+        db.engine.dispose()  # Conexões não devem atravessar o fork dos workers
+    _writer.app = app
+
+
+# --- Escrita em lote ---
+
+class ResultWriter:
+    """Fila de gravações drenada por uma thread própria (recriada após fork)."""
+
+    def __init__(self, batch_size=PERSIST_BATCH_SIZE, flush_interval=PERSIST_FLUSH_INTERVAL,
+                 max_queue=PERSIST_QUEUE_MAX):
+        self.app = None
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self._fila = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self.gravados = 0
+        self.descartados = 0
+
+    def _garantir_thread(self):
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._fila = queue.Queue(maxsize=self.max_queue)
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._loop, name="persistencia", daemon=True)
+                self._thread.start()
+
+    def enqueue(self, item):
+        if self.app is None:
+            return  # Sem banco configurado (ex: CLI de lote)
+        self._garantir_thread()
+        try:
+            self._fila.put_nowait(item)
+        except queue.Full:
+            self.descartados += 1
+            logger.warning("Fila de persistência cheia; registro descartado.")
+
+    def _proximo_lote(self):
+        lote = [self._fila.get()]
+        limite = time.monotonic() + self.flush_interval
+        while len(lote) < self.batch_size:
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                break
+            try:
+                lote.append(self._fila.get(timeout=restante))
+            except queue.Empty:
+                break
+        return lote
+
+    def _loop(self):
+        while True:
+            lote = self._proximo_lote()
+            self._gravar(lote)
+            for _ in lote:
+                self._fila.task_done()
+
+    def _gravar(self, lote):
+        with self.app.app_context():
+            try:
+                leads = {}
+                for tipo, *dados in lote:
+                    if tipo == "verificacao":
+                        _gravar_verificacao(*dados)
+                    else:
+                        _gravar_qualificacao(leads, *dados)
+                db.session.commit()
+                self.gravados += len(lote)
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Erro ao gravar lote de {len(lote)} registro(s): {str(e)}")
+            finally:
+                db.session.remove()
+
+    def flush(self, timeout=10):
+        """Espera a fila esvaziar (usado no encerramento)."""
+        if self._fila is None or self._pid != os.getpid():
+            return
+        limite = time.monotonic() + timeout
+        while self._fila.unfinished_tasks and time.monotonic() < limite:
+            time.sleep(0.05)
+
+
+_writer = ResultWriter()
+atexit.register(_writer.flush)
+
+
+def _run(fonte, alvo, resultado, criado_em, lead_id=None):
+    return VerificationRun(
+        lead_id=lead_id,
+        source=fonte,
+        target=normalizar_alvo(fonte, alvo),
+        status=resultado["status"],
+        error=resultado.get("error"),
+        data=resultado.get("data"),
+        cached=bool(resultado.get("cached")),
+        created_at=criado_em,
+    )
+
+
+def _gravar_verificacao(fonte, alvo, resultado, criado_em):
+    db.session.add(_run(fonte, alvo, resultado, criado_em))
+
+
+def _chave_lead(lead):
+    return tuple(normalizar_alvo(fonte, lead.get(campo)) or None for fonte, campo in LEAD_FIELDS.items())
+
+
+def _gravar_qualificacao(leads, lead, resultado, por_fonte, criado_em):
+    chave = _chave_lead(lead)
+    registro = leads.get(chave)
+    if registro is None:
+        instagram_username, domain, cnpj = chave
+        registro = Lead.query.filter_by(instagram_username=instagram_username, domain=domain, cnpj=cnpj).first()
+        if registro is None:
+            registro = Lead(instagram_username=instagram_username, domain=domain, cnpj=cnpj, created_at=criado_em)
+            db.session.add(registro)
+            db.session.flush()
+        registro.updated_at = criado_em
+        leads[chave] = registro
+
+    for fonte, resultado_fonte in por_fonte.items():
+        db.session.add(_run(fonte, lead.get(LEAD_FIELDS[fonte]), resultado_fonte, criado_em, registro.id))
+    qualificacao = resultado["qualification"]
+    db.session.add(Score(
+        lead_id=registro.id,
+        score=resultado["score"],
+        status=qualificacao["status"],
+        teto=qualificacao["teto"],
+        valor_inicial=lead.get("valor_inicial"),
+        valor_atual=lead.get("valor_atual"),
+        checklist=lead.get("checklist"),
+        created_at=criado_em,
+    ))
+
+
+def registrar_verificacao(fonte, alvo, resultado):
+    """Enfileira o resultado de uma verificação avulsa (só os que não vieram do cache)."""
+    if not resultado.get("cached"):
+        _writer.enqueue(("verificacao", fonte, alvo, resultado, datetime.utcnow()))
+
+
+def registrar_qualificacao(lead, resultado, por_fonte):
+    """Enfileira o lead, os resultados por fonte e a pontuação de uma qualificação."""
+    _writer.enqueue(("qualificacao", lead, resultado, por_fonte, datetime.utcnow()))
+
+
+# --- Consulta ---
+
+def ultimo_resultado(fonte, alvo, max_idade=None):
+    """Último resultado conclusivo gravado para (fonte, alvo), no formato das verificações, ou None.
+
+    `max_idade` (s) tem como padrão SWR_MAX_AGES da fonte.
+    """
+    if max_idade is None:
+        max_idade = SWR_MAX_AGES[fonte]
+    run = (VerificationRun.query
+           .filter(VerificationRun.source == fonte,
+                   VerificationRun.target == normalizar_alvo(fonte, alvo),
+                   VerificationRun.status.in_(CONCLUSIVE_STATUSES),
+                   VerificationRun.created_at >= datetime.utcnow() - timedelta(seconds=max_idade))
+           .order_by(VerificationRun.created_at.desc())
+           .first())
+    if run is None:
+        return None
+    return {"status": run.status, "error": run.error, "data": run.data, "checked_at": run.created_at.isoformat()}
+
+
+def _lead_detalhado(lead):
+    dados = lead.to_dict()
+    ultima = lead.scores.order_by(Score.created_at.desc()).first()
+    dados["last_score"] = ultima.to_dict() if ultima else None
+    dados["last_verifications"] = {}
+    for fonte in LEAD_FIELDS:
+        run = lead.verification_runs.filter_by(source=fonte).order_by(VerificationRun.created_at.desc()).first()
+        if run is not None:
+            dados["last_verifications"][fonte] = run.to_dict()
+    return dados
+
+
+def buscar_leads(instagram_username=None, domain=None, cnpj=None, limite=20):
+    """Leads que casam com qualquer um dos alvos informados, com a última pontuação e verificações."""
+    filtros = []
+    for fonte, campo, valor in (("facebook", "instagram_username", instagram_username),
+                                ("google", "domain", domain), ("qsa", "cnpj", cnpj)):
+        if valor:
+            filtros.append(getattr(Lead, campo) == normalizar_alvo(fonte, valor))
+    if not filtros:
+        return []
+    leads = Lead.query.filter(db.or_(*filtros)).order_by(Lead.updated_at.desc()).limit(limite).all()
+    return [_lead_detalhado(lead) for lead in leads]
+
+
+def obter_lead(lead_id):
+    lead = db.session.get(Lead, lead_id)
+    return _lead_detalhado(lead) if lead else None
+
+
+# --- Stale-while-revalidate ---
+
+_revalidacao_executor = ThreadPoolExecutor(max_workers=SWR_MAX_WORKERS, thread_name_prefix="revalidacao")
+_revalidando = set()
+_revalidando_lock = threading.Lock()
+
+
+def _revalidar(fonte, alvo, verificar):
+    chave = (fonte, normalizar_alvo(fonte, alvo))
+    with _revalidando_lock:
+        if chave in _revalidando:
+            return
+        _revalidando.add(chave)
+
+    def executar():
+        try:
+            # A revalidação continua mesmo se quem a disparou desconectar
+            with crawl_context(cancelamento=threading.Event()):
+                registrar_verificacao(fonte, alvo, verificar(alvo))
+        except Exception as e:
+            logger.error(f"Erro ao revalidar {fonte} para {alvo}: {str(e)}")
+        finally:
+            with _revalidando_lock:
+                _revalidando.discard(chave)
+
+    _revalidacao_executor.submit(contextvars.copy_context().run, executar)
+
+
+def verificar_com_revalidacao(fonte, alvo, verificar, force_refresh=False):
+    """Resultado da verificação com stale-while-revalidate.
+
+    Com o cache vazio para o alvo e um resultado conclusivo gravado, devolve esse
+    resultado na hora (`stale=True`, `checked_at`) e refaz a verificação em
+    segundo plano; senão, verifica normalmente e grava o resultado.
+    """
+    if not force_refresh and _writer.app is not None and verification_cache.peek(fonte, alvo) is None:
+        anterior = ultimo_resultado(fonte, alvo)
+        if anterior is not None:
+            logger.info(f"Servindo último resultado de {fonte} para {alvo} ({anterior['checked_at']}) e revalidando.")
+            _revalidar(fonte, alvo, verificar)
+            return dict(anterior, cached=True, stale=True)
+    resultado = verificar(alvo, force_refresh=force_refresh)
+    registrar_verificacao(fonte, alvo, resultado)
+    return resultado
@@ -0,0 +1,306 @@
+# -*- coding: utf-8 -*-
+"""Pré-busca das verificações enquanto o operador preenche o formulário.
+
+Quando a tela informa um usuário do Instagram, domínio ou CNPJ válido, a
+verificação correspondente é iniciada em segundo plano com prioridade
+PRIORITY_PREFETCH (abaixo de interativo e de lote). O resultado conclusivo vai
+para o cache de resultados; se o operador pedir a verificação antes do fim, a
+chamada dele entra na mesma execução pelo single-flight, e `reivindicar`
+promove os crawls ainda na fila para a prioridade interativa.
+
+Cada alvo pré-buscado com resultado conclusivo fica registrado por
+PREFETCH_TTL segundos, para que digitar de novo o mesmo valor não dispare
+outra verificação. Pré-buscas que terminam em erro ou timeout saem do
+registro na hora: o pedido real executa a verificação sem esperar o TTL.
+
+O pedido real costuma cair em outro worker do gunicorn. Por isso o registro
+fica em SQLite (PREFETCH_DB), e `reivindicar` em qualquer worker marca a
+pré-busca para promoção; o worker que a executa repassa a marca ao scheduler.
+O resultado chega pelo cache e pelo single-flight compartilhados (ver
+src.cache.caminho_compartilhado).
+"""
+import contextvars
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+
+from src.cache import caminho_compartilhado, normalizar_alvo, verification_cache
+from src.crawl_scheduler import PRIORITY_PREFETCH, crawl_context
+from src.metrics import prefetches
+from src.verifications import (
+    CACHEABLE_STATUSES, VERIFICATION_TIMEOUTS, verificar_facebook_ads, verificar_google_ads, verificar_qsa,
+)
+
+logger = logging.getLogger(__name__)
+
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "1").lower() in ("1", "true", "yes")
+PREFETCH_TTL = float(os.getenv("PREFETCH_TTL", "300"))
+PREFETCH_MAX_WORKERS = int(os.getenv("PREFETCH_MAX_WORKERS", "2"))
+PREFETCH_MAX_PENDING = int(os.getenv("PREFETCH_MAX_PENDING", "10"))  # Pré-buscas na fila/rodando por processo
+PREFETCH_DB = caminho_compartilhado("PREFETCH_DB", "prefetch.db")
+_INTERVALO_CONSULTA = 0.25  # Segundos entre leituras dos pedidos de promoção
+
+# Campo do formulário -> (fonte, verificação)
+PREFETCH_FIELDS = {
+    "instagram_username": ("facebook", verificar_facebook_ads),
+    "domain": ("google", verificar_google_ads),
+    "cnpj": ("qsa", verificar_qsa),
+}
+
+_USUARIO_INSTAGRAM = re.compile(r"^[a-z0-9._]{1,30}$")
+_DOMINIO = re.compile(r"^(?=.{4,253}$)([a-z0-9](?:[a-z0-9-]{0,61}[a-z0-9])?\.)+[a-z]{2,63}$")
+
+
+def _cnpj_valido(digitos):
+    """14 dígitos, não todos iguais, com os dois dígitos verificadores corretos."""
+    if len(digitos) != 14 or len(set(digitos)) == 1:
+        return False
+    for tamanho in (12, 13):
+        pesos = list(range(tamanho - 7, 1, -1)) + list(range(9, 1, -1))
+        soma = sum(int(d) * p for d, p in zip(digitos[:tamanho], pesos))
+        resto = soma % 11
+        if int(digitos[tamanho]) != (0 if resto < 2 else 11 - resto):
+            return False
+    return True
+
+
+def alvo_valido(fonte, chave):
+    """A chave normalizada é um alvo completo (e não um valor ainda sendo digitado)?"""
+    if fonte == "qsa":
+        return _cnpj_valido(chave)
+    if fonte == "google":
+        return bool(_DOMINIO.match(chave))
+    return bool(_USUARIO_INSTAGRAM.match(chave))
+
+
+class _PreBusca:
+    def __init__(self):
+        self.promocao = threading.Event()
+        self.concluida = False
+        self.status = None
+        self.criada_em = time.monotonic()
+
+
+class _RegistroCompartilhado:
+    """Pré-buscas de todos os workers em SQLite (uma conexão por operação, como em src/single_flight.py)."""
+
+    def __init__(self, path, ttl):
+        self.path = path
+        self.ttl = ttl
+        diretorio = os.path.dirname(path)
+        if diretorio:
+            os.makedirs(diretorio, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS prefetch ("
+                " fonte TEXT NOT NULL, chave TEXT NOT NULL, criada_em REAL NOT NULL, concluida_em REAL,"
+                " promover INTEGER NOT NULL DEFAULT 0, PRIMARY KEY (fonte, chave))"
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10, isolation_level=None)
+
+    def reservar(self, fonte, chave):
+        """Registra a pré-busca se nenhum worker a tiver; devolve "started", "in_flight" ou "done"."""
+        agora = time.time()
+        with closing(self._connect()) as conn:
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                # Pré-buscas sem conclusão além do TTL são de um worker que morreu
+                conn.execute("DELETE FROM prefetch WHERE COALESCE(concluida_em, criada_em) < ?", (agora - self.ttl,))
+                row = conn.execute("SELECT concluida_em FROM prefetch WHERE fonte = ? AND chave = ?",
+                                   (fonte, chave)).fetchone()
+                if row is None:
+                    conn.execute("INSERT INTO prefetch (fonte, chave, criada_em) VALUES (?, ?, ?)", (fonte, chave, agora))
+                conn.execute("COMMIT")
+            except BaseException:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+        if row is None:
+            return "started"
+        return "in_flight" if row[0] is None else "done"
+
+    def concluir(self, fonte, chave):
+        with closing(self._connect()) as conn:
+            conn.execute("UPDATE prefetch SET concluida_em = ? WHERE fonte = ? AND chave = ?",
+                         (time.time(), fonte, chave))
+
+    def remover(self, fonte, chave):
+        with closing(self._connect()) as conn:
+            conn.execute("DELETE FROM prefetch WHERE fonte = ? AND chave = ?", (fonte, chave))
+
+    def promover(self, fonte, chave):
+        """Pede a promoção da pré-busca em andamento; devolve (existe, promovida agora)."""
+        with closing(self._connect()) as conn:
+            promovida = conn.execute(
+                "UPDATE prefetch SET promover = 1"
+                " WHERE fonte = ? AND chave = ? AND concluida_em IS NULL AND promover = 0",
+                (fonte, chave),
+            ).rowcount > 0
+            row = conn.execute("SELECT 1 FROM prefetch WHERE fonte = ? AND chave = ?", (fonte, chave)).fetchone()
+        return row is not None, promovida
+
+    def promovidas(self, chaves):
+        """Quais das (fonte, chave) informadas tiveram a promoção pedida."""
+        with closing(self._connect()) as conn:
+            rows = conn.execute("SELECT fonte, chave FROM prefetch WHERE promover = 1 AND concluida_em IS NULL").fetchall()
+        return set(rows) & set(chaves)
+
+
+class Prefetcher:
+    """Registro das pré-buscas e o executor que as roda no processo (recriado após fork)."""
+
+    def __init__(self, max_workers=PREFETCH_MAX_WORKERS, ttl=PREFETCH_TTL, max_pendentes=PREFETCH_MAX_PENDING,
+                 db_path=PREFETCH_DB):
+        self.max_workers = max_workers
+        self.ttl = ttl
+        self.max_pendentes = max_pendentes
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+        self._buscas = {}
+        self._compartilhado = None
+        if db_path:
+            try:
+                self._compartilhado = _RegistroCompartilhado(db_path, ttl)
+            except sqlite3.Error as e:
+                logger.error(f"Não foi possível abrir {db_path} para as pré-buscas: {str(e)}. Usando apenas o processo.")
+
+    def _executor_do_processo(self):
+        if self._executor is None or self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._buscas = {}
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="prefetch")
+            if self._compartilhado is not None:
+                threading.Thread(target=self._monitorar, args=(self._pid,), name="prefetch-monitor",
+                                 daemon=True).start()
+        return self._executor
+
+    def _monitorar(self, pid):
+        """Repassa às pré-buscas deste worker as promoções pedidas em qualquer worker."""
+        while self._pid == pid:
+            time.sleep(_INTERVALO_CONSULTA)
+            with self._lock:
+                pendentes = {chave: busca for chave, busca in self._buscas.items()
+                             if not busca.concluida and not busca.promocao.is_set()}
+            if not pendentes:
+                continue
+            try:
+                for chave in self._compartilhado.promovidas(pendentes):
+                    pendentes[chave].promocao.set()
+            except sqlite3.Error as e:
+                logger.warning(f"Erro ao consultar promoções de pré-buscas: {str(e)}")
+
+    def _limpar(self, agora):
+        for chave in [c for c, busca in self._buscas.items() if busca.concluida and agora - busca.criada_em > self.ttl]:
+            del self._buscas[chave]
+
+    def iniciar(self, fonte, alvo, verificar):
+        """Inicia a pré-busca de (fonte, alvo) se fizer sentido; devolve o que aconteceu.
+
+        started, in_flight, done (pré-buscado há menos de PREFETCH_TTL), cached,
+        invalid, busy (muitas pré-buscas pendentes) ou disabled.
+        """
+        chave = normalizar_alvo(fonte, alvo)
+        if not PREFETCH_ENABLED:
+            situacao = "disabled"
+        elif not alvo_valido(fonte, chave):
+            situacao = "invalid"
+        else:
+            situacao = self._registrar(fonte, chave, alvo, verificar)
+        prefetches.inc(fonte, situacao)
+        return situacao
+
+    def _registrar(self, fonte, chave, alvo, verificar):
+        with self._lock:
+            executor = self._executor_do_processo()
+            self._limpar(time.monotonic())
+            busca = self._buscas.get((fonte, chave))
+            if busca is not None:
+                return "done" if busca.concluida else "in_flight"
+            if verification_cache.peek(fonte, alvo) is not None:
+                return "cached"
+            if sum(not b.concluida for b in self._buscas.values()) >= self.max_pendentes:
+                return "busy"
+            if self._compartilhado is not None:
+                try:
+                    situacao = self._compartilhado.reservar(fonte, chave)
+                except sqlite3.Error as e:
+                    logger.warning(f"Erro no registro compartilhado de pré-buscas: {str(e)}")
+                    return "busy"
+                if situacao != "started":
+                    return situacao  # Pré-buscado por outro worker
+            busca = self._buscas[(fonte, chave)] = _PreBusca()
+        executor.submit(contextvars.copy_context().run, self._executar, fonte, chave, alvo, verificar, busca)
+        logger.info(f"Pré-busca de {fonte} para {chave} iniciada.")
+        return "started"
+
+    def _executar(self, fonte, chave, alvo, verificar, busca):
+        prazo = time.monotonic() + VERIFICATION_TIMEOUTS[fonte]
+        try:
+            with crawl_context(prioridade=PRIORITY_PREFETCH, prazo=prazo, promocao=busca.promocao):
+                busca.status = verificar(alvo)["status"]
+            logger.info(f"Pré-busca de {fonte} para {alvo} concluída: {busca.status}")
+        except Exception as e:
+            busca.status = "error"
+            logger.error(f"Erro na pré-busca de {fonte} para {alvo}: {str(e)}")
+        finally:
+            self._concluir(fonte, chave, busca)
+
+    def _concluir(self, fonte, chave, busca):
+        # Sem resultado conclusivo (erro, timeout) nada foi para o cache: a pré-busca
+        # sai do registro para o pedido real executar a verificação na hora
+        conclusiva = busca.status in CACHEABLE_STATUSES
+        with self._lock:
+            busca.concluida = True
+            busca.criada_em = time.monotonic()  # O TTL conta a partir do fim
+            if not conclusiva and self._buscas.get((fonte, chave)) is busca:
+                del self._buscas[(fonte, chave)]
+        if self._compartilhado is None:
+            return
+        try:
+            if conclusiva:
+                self._compartilhado.concluir(fonte, chave)
+            else:
+                self._compartilhado.remover(fonte, chave)
+        except sqlite3.Error as e:
+            logger.warning(f"Erro ao concluir pré-busca de {fonte} para {chave}: {str(e)}")
+
+    def reivindicar(self, fonte, alvo):
+        """Quem vai esperar (fonte, alvo) agora: promove a pré-busca em andamento, em qualquer worker."""
+        if not alvo:
+            return False
+        chave = normalizar_alvo(fonte, alvo)
+        with self._lock:
+            busca = self._buscas.get((fonte, chave)) if self._pid == os.getpid() else None
+        if busca is not None:
+            if not busca.concluida and not busca.promocao.is_set():
+                busca.promocao.set()
+                prefetches.inc(fonte, "claimed")
+            return True
+        if self._compartilhado is None:
+            return False
+        try:
+            existe, promovida = self._compartilhado.promover(fonte, chave)
+        except sqlite3.Error as e:
+            logger.warning(f"Erro ao promover pré-busca de {fonte} para {chave}: {str(e)}")
+            return False
+        if promovida:
+            prefetches.inc(fonte, "claimed")
+        return existe
+
+    def stats(self):
+        with self._lock:
+            buscas = list(self._buscas.values()) if self._pid == os.getpid() else []
+        pendentes = sum(not b.concluida for b in buscas)
+        return {"pendentes": pendentes, "concluidas": len(buscas) - pendentes}
+
+
+prefetcher = Prefetcher()
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""Limitadores de taxa (token bucket) por serviço externo.
+
+Cada upstream (ReceitaWS, Facebook, Google) tem um bucket com taxa por minuto
+e rajada máxima. As chamadas reservam uma vaga e esperam apenas o necessário
+para respeitar a cota; se a espera estimada passar do limite do chamador, a
+chamada não é feita e o chamador recebe o tempo estimado. Um 429 com
+Retry-After pausa o bucket inteiro, para que as demais chamadas não batam no
+limite de novo.
+
+Com RATE_LIMIT_DB apontando para um arquivo SQLite, o estado do bucket é
+compartilhado entre os workers do gunicorn.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+logger = logging.getLogger(__name__)
+
+# (requisições por minuto, rajada) por upstream
+RATE_LIMITS = {
+    "receitaws": (float(os.getenv("RECEITAWS_RATE_PER_MINUTE", "3")), int(os.getenv("RECEITAWS_BURST", "3"))),
+    "facebook": (float(os.getenv("FACEBOOK_RATE_PER_MINUTE", "20")), int(os.getenv("FACEBOOK_BURST", "4"))),
+    "google": (float(os.getenv("GOOGLE_RATE_PER_MINUTE", "20")), int(os.getenv("GOOGLE_BURST", "4"))),
+}
+RATE_LIMIT_DB = os.getenv("RATE_LIMIT_DB")  # Ex: /var/lib/lead_checker/rate_limits.db
+
+
+class RateLimitExceeded(Exception):
+    """A espera na fila do limitador passaria do máximo aceito pelo chamador."""
+
+    def __init__(self, name, retry_after):
+        super().__init__(f"Limite de requisições para {name} atingido. Nova tentativa possível em ~{retry_after:.0f}s.")
+        self.name = name
+        self.retry_after = retry_after
+
+
+def parse_retry_after(valor, padrao=60.0):
+    """Converte o cabeçalho Retry-After (segundos ou data HTTP) em segundos."""
+    if not valor:
+        return padrao
+    try:
+        return max(0.0, float(valor))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(valor).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return padrao
+
+
+class TokenBucket:
+    """Token bucket em memória (GCRA): o estado é o instante teórico da próxima vaga.
+
+    Reservar uma vaga avança esse instante em `intervalo`; a rajada permite que
+    até `burst` chamadas passem sem espera. `relogio` (epoch, compartilhado
+    entre processos) e `dormir` podem ser trocados nos testes.
+    """
+
+    def __init__(self, name, rate_per_minute, burst=1, relogio=time.time, dormir=time.sleep):
+        self.name = name
+        self.interval = 60.0 / rate_per_minute
+        self.tolerance = self.interval * (max(1, burst) - 1)
+        self.relogio = relogio
+        self.dormir = dormir
+        self._lock = threading.Lock()
+        self._tat = 0.0
+
+    # Subclasses trocam apenas a forma de ler/gravar o estado
+    def _update(self, func):
+        with self._lock:
+            self._tat, retorno = func(self._tat, self.relogio())
+            return retorno
+
+    def estimate_wait(self):
+        """Quantos segundos uma nova chamada esperaria agora (sem reservar vaga)."""
+        return self._update(lambda tat, agora: (tat, max(0.0, max(tat, agora) - self.tolerance - agora)))
+
+    def reserve(self, max_wait=None):
+        """Reserva a próxima vaga e devolve a espera necessária.
+
+        Se a espera passar de `max_wait`, nada é reservado e RateLimitExceeded é levantada.
+        """
+        def reservar(tat, agora):
+            tat = max(tat, agora)
+            espera = max(0.0, tat - self.tolerance - agora)
+            if max_wait is not None and espera > max_wait:
+                return tat, -espera
+            return tat + self.interval, espera
+
+        espera = self._update(reservar)
+        if espera < 0:
+            raise RateLimitExceeded(self.name, -espera)
+        return espera
+
+    def acquire(self, max_wait=None):
+        """Espera a vez na fila do bucket. Devolve quantos segundos esperou."""
+        espera = self.reserve(max_wait)
+        if espera > 0:
+            logger.info(f"Aguardando {espera:.1f}s pela cota de {self.name}.")
+            self.dormir(espera)
+        return espera
+
+    def penalize(self, segundos):
+        """Bloqueia o bucket por `segundos` (ex: Retry-After de um 429)."""
+        self._update(lambda tat, agora: (max(tat, agora + segundos + self.tolerance), None))
+        logger.warning(f"Cota de {self.name} pausada por {segundos:.0f}s (Retry-After).")
+
+
+class SQLiteTokenBucket(TokenBucket):
+    """Mesmo algoritmo, com o estado em SQLite para compartilhar a cota entre processos."""
+
+    def __init__(self, name, rate_per_minute, burst=1, path=RATE_LIMIT_DB, relogio=time.time, dormir=time.sleep):
+        super().__init__(name, rate_per_minute, burst, relogio=relogio, dormir=dormir)
+        self.path = path
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS rate_limits (name TEXT PRIMARY KEY, tat REAL NOT NULL)")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10, isolation_level=None)
+
+    def _update(self, func):
+        with self._lock:
+            conn = self._connect()
+            try:
+                conn.execute("BEGIN IMMEDIATE")  # Trava de escrita: leitura e gravação atômicas entre processos
+                row = conn.execute("SELECT tat FROM rate_limits WHERE name = ?", (self.name,)).fetchone()
+                tat, retorno = func(row[0] if row else 0.0, self.relogio())
+                conn.execute("INSERT OR REPLACE INTO rate_limits (name, tat) VALUES (?, ?)", (self.name, tat))
+                conn.execute("COMMIT")
+                return retorno
+            except BaseException:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+            finally:
+                conn.close()
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(name):
+    """Devolve o limitador do upstream `name`, criado conforme RATE_LIMITS/RATE_LIMIT_DB."""
+    with _limiters_lock:
+        limiter = _limiters.get(name)
+        if limiter is None:
+            rate, burst = RATE_LIMITS[name]
+            if RATE_LIMIT_DB:
+                try:
+                    limiter = SQLiteTokenBucket(name, rate, burst)
+                except sqlite3.Error as e:
+                    logger.error(f"Não foi possível usar {RATE_LIMIT_DB} para limitar {name}: {str(e)}. Usando limite em memória.")
+                    limiter = TokenBucket(name, rate, burst)
+            else:
+                limiter = TokenBucket(name, rate, burst)
+            _limiters[name] = limiter
+        return limiter
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""Serialização, compressão e recorte das respostas JSON da API.
+
+- OrjsonProvider: provider de JSON do Flask que usa o orjson quando instalado
+  (o `json` da biblioteca padrão continua como alternativa);
+- comprimir(): gzip para respostas JSON grandes quando o cliente aceita;
+- aplicar_perfil(): recorta o resultado de uma qualificação no perfil pedido
+  (minimal, standard ou full);
+- registrar_payload(): payloads grandes só vão para o log em DEBUG ou por
+  amostragem, e só são formatados nesse caso.
+"""
+import gzip
+import logging
+import os
+import random
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # Opcional: sem ele, o json da biblioteca padrão
+    orjson = None
+
+RESPONSE_GZIP_MIN_BYTES = int(os.getenv("RESPONSE_GZIP_MIN_BYTES", "1024"))  # 0 desativa a compressão
+RESPONSE_GZIP_LEVEL = int(os.getenv("RESPONSE_GZIP_LEVEL", "5"))
+LOG_PAYLOAD_SAMPLE_RATE = float(os.getenv("LOG_PAYLOAD_SAMPLE_RATE", "0.01"))  # Fração logada por completo em INFO
+LOG_PAYLOAD_MAX_CHARS = int(os.getenv("LOG_PAYLOAD_MAX_CHARS", "4000"))
+
+
+# --- Serialização ---
+
+class OrjsonProvider(DefaultJSONProvider):
+    """JSON do Flask via orjson; tipos que ele não conhece passam pelo `default` do Flask.
+
+    Datas continuam no formato HTTP do Flask e as chaves não são ordenadas
+    (sort_keys custa tempo e nenhum cliente depende da ordem).
+    """
+
+    sort_keys = False
+
+    def _opcoes(self):
+        opcoes = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        return opcoes | orjson.OPT_SORT_KEYS if self.sort_keys else opcoes
+
+    def _formatado(self):
+        return (self.compact is None and self._app.debug) or self.compact is False
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or set(kwargs) - {"separators"}:
+            return super().dumps(obj, **kwargs)
+        try:
+            return orjson.dumps(obj, default=self.default, option=self._opcoes()).decode("utf-8")
+        except TypeError:  # Ex: inteiros acima de 64 bits
+            return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if orjson is None or self._formatado():
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        try:
+            corpo = orjson.dumps(obj, default=self.default, option=self._opcoes() | orjson.OPT_APPEND_NEWLINE)
+        except TypeError:
+            return super().response(*args, **kwargs)
+        return self._app.response_class(corpo, mimetype=self.mimetype)
+
+
+# --- Compressão ---
+
+def comprimir(response, aceita_gzip):
+    """Comprime com gzip uma resposta JSON de pelo menos RESPONSE_GZIP_MIN_BYTES.
+
+    Respostas em streaming (SSE, NDJSON) e já codificadas ficam como estão.
+    """
+    if (not RESPONSE_GZIP_MIN_BYTES or response.is_streamed or response.direct_passthrough
+            or response.mimetype != "application/json" or "Content-Encoding" in response.headers):
+        return response
+    corpo = response.get_data()
+    if len(corpo) < RESPONSE_GZIP_MIN_BYTES:
+        return response
+    response.vary.add("Accept-Encoding")
+    if aceita_gzip:
+        response.set_data(gzip.compress(corpo, compresslevel=RESPONSE_GZIP_LEVEL))
+        response.headers["Content-Encoding"] = "gzip"
+    return response
+
+
+# --- Perfis de resposta da qualificação ---
+
+RESPONSE_PROFILES = ("minimal", "standard", "full")
+_CAMPOS_STATUS = ("facebook_ads_status", "google_ads_status", "qsa_status")
+
+
+def aplicar_perfil(resultado, perfil):
+    """Recorta o resultado de _qualify (score, qualification, verifications) no `perfil`.
+
+    - minimal: pontuação, status e teto da qualificação e o status de cada fonte;
+    - standard: o que a tela (static/script.js) exibe: mensagem e alerta da
+      qualificação, status das fontes, razão social/situação do QSA e erros;
+    - full: o resultado completo, com os dados brutos da ReceitaWS.
+    """
+    if perfil == "full":
+        return resultado
+    qualificacao = resultado["qualification"]
+    verificacoes = resultado["verifications"]
+    status = {campo: verificacoes.get(campo) for campo in _CAMPOS_STATUS}
+    if perfil == "minimal":
+        return {
+            "score": resultado["score"],
+            "qualification": {"status": qualificacao.get("status"), "teto": qualificacao.get("teto")},
+            "verifications": status,
+        }
+    qsa = verificacoes.get("qsa_data") or {}
+    return {
+        "score": resultado["score"],
+        "qualification": {chave: qualificacao.get(chave) for chave in ("status", "message", "teto", "alert")},
+        "verifications": dict(
+            status,
+            qsa_data={"razao_social": qsa.get("razao_social"), "situacao": qsa.get("situacao")}
+            if verificacoes.get("qsa_status") == "found" else None,
+            error_messages=verificacoes.get("error_messages", []),
+        ),
+    }
+
+
+# --- Log de payloads ---
+
+def registrar_payload(logger, mensagem, payload):
+    """Registra `mensagem` em INFO; o payload completo só em DEBUG ou em uma amostra (LOG_PAYLOAD_SAMPLE_RATE)."""
+    amostrado = random.random() < LOG_PAYLOAD_SAMPLE_RATE
+    if not amostrado and not logger.isEnabledFor(logging.DEBUG):
+        logger.info(mensagem)
+        return
+    texto = repr(payload)
+    if len(texto) > LOG_PAYLOAD_MAX_CHARS:
+        texto = f"{texto[:LOG_PAYLOAD_MAX_CHARS]}... ({len(texto)} caracteres)"
+    if amostrado:
+        logger.info(f"{mensagem}: {texto}")
+    else:
+        logger.info(mensagem)
+        logger.debug(f"{mensagem}: {texto}")
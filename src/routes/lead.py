@@ -0,0 +1,20 @@
+from flask import Blueprint, jsonify, request
+from src.persistence import buscar_leads, obter_lead
+
+lead_bp = Blueprint('lead', __name__)
+
+@lead_bp.route('/leads', methods=['GET'])
+def find_leads():
+    """Looks leads up by any of instagram_username, domain or cnpj (normalized like the cache keys)."""
+    filters = {field: request.args.get(field, '').strip() for field in ('instagram_username', 'domain', 'cnpj')}
+    if not any(filters.values()):
+        return jsonify({'error': 'Provide instagram_username, domain or cnpj'}), 400
+    limit = min(request.args.get('limit', 20, type=int), 100)
+    return jsonify(buscar_leads(limite=limit, **filters))
+
+@lead_bp.route('/leads/<int:lead_id>', methods=['GET'])
+def get_lead(lead_id):
+    lead = obter_lead(lead_id)
+    if lead is None:
+        return jsonify({'error': 'Lead not found'}), 404
+    return jsonify(lead)
@@ -0,0 +1,36 @@
+from flask import Blueprint, jsonify, request
+from src.watchlist import WATCH_FIELDS, adicionar_alvo, listar_alvos, listar_mudancas, remover_alvo
+
+watchlist_bp = Blueprint('watchlist', __name__)
+
+@watchlist_bp.route('/watchlist', methods=['GET'])
+def list_watch_targets():
+    include_inactive = request.args.get('include_inactive', '').lower() in ('1', 'true', 'yes')
+    return jsonify(listar_alvos(incluir_inativos=include_inactive))
+
+@watchlist_bp.route('/watchlist', methods=['POST'])
+def add_watch_targets():
+    """Starts watching the instagram_username and/or domain of a lead (optional interval_minutes, lead_id)."""
+    data = request.json or {}
+    targets = {source: str(data.get(field, '')).strip() for field, source in WATCH_FIELDS.items()}
+    if not any(targets.values()):
+        return jsonify({'error': 'Provide instagram_username or domain'}), 400
+    interval_minutes = data.get('interval_minutes')
+    interval = int(float(interval_minutes) * 60) if interval_minutes else None
+    added = [adicionar_alvo(source, target, interval, data.get('lead_id')).to_dict()
+             for source, target in targets.items() if target]
+    return jsonify(added), 201
+
+@watchlist_bp.route('/watchlist/<int:watch_id>', methods=['DELETE'])
+def remove_watch_target(watch_id):
+    target = remover_alvo(watch_id)
+    if target is None:
+        return jsonify({'error': 'Watch target not found'}), 404
+    return '', 204
+
+@watchlist_bp.route('/watchlist/events', methods=['GET'])
+def list_status_changes():
+    """Ad-status changes after `since` (an event id), oldest first."""
+    since = request.args.get('since', 0, type=int)
+    limit = min(request.args.get('limit', 100, type=int), 500)
+    return jsonify(listar_mudancas(desde_id=since, limite=limit))
@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+"""Lead scoring: criteria points, score calculation and qualification tiers.
+
+Shared by the interactive endpoints and bulk qualification so both produce
+identical scores.
+"""
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Define points for each criterion
+CRITERIA_POINTS = {
+    # ... (points remain the same)
+    "faturamento_ate_100k": -100,
+    "faturamento_100_200k": -100,
+    "faturamento_200_400k": 0,
+    "faturamento_401k_1M": 30,
+    "faturamento_1M_4M": 30,
+    "interesse_assessoria": 30,
+    "interesse_estruturacao": 10,
+    "interesse_alavancagem": 0,
+    "perfil_nome_completo": 30,
+    "perfil_linkedin": 30,
+    "perfil_cargo_estrategico": 30,
+    "perfil_cargo_tatico": 20,
+    "perfil_cargo_operacional": 0,
+    "contato_email_corp": 10,
+    "contato_email_pessoal": 0,
+    "digital_site_funcional": 30,
+    "digital_site_fora_ar": -20,
+    "digital_produto_sinergia": 20,
+    "social_insta_site": 5,
+    "social_insta_google": 10,
+    "social_insta_5k": 20,
+    "social_sem_presenca": -20,
+    "validacao_cnpj_localizado": 10,
+    "validacao_pessoa_qsa": 30,
+    "validacao_nome_generico": -30,
+    "urgencia_imediata": 20,
+    "urgencia_3_meses": 10,
+    "urgencia_nao_informada": 0,
+    "investimento_google_meta": 30,
+    "investimento_google": 20,
+    "investimento_meta": 20,
+    "manual_verificado_maps": 20,
+    "manual_redirecionado_assessoria": 15
+}
+
+def calculate_score(checklist_data, verification_results):
+    """Calculates the total score based on checklist and verification results."""
+    total = 0
+    logger.debug("Calculating score with checklist: %s", checklist_data)
+    
+    for key, value in checklist_data.items():
+        if key in CRITERIA_POINTS and value: 
+            total += CRITERIA_POINTS.get(key, 0)
+
+    logger.info(f"Score after checklist: {total}")
+
+    if verification_results.get("qsa_status") == "found":
+        total += CRITERIA_POINTS["validacao_cnpj_localizado"]
+        qsa_data = verification_results.get("qsa_data", {})
+        if qsa_data and qsa_data.get("qsa") and len(qsa_data["qsa"]) > 0:
+            total += CRITERIA_POINTS["validacao_pessoa_qsa"]
+            
+    google_active = verification_results.get("google_ads_status") == "active"
+    fb_active = verification_results.get("facebook_ads_status") == "active"
+
+    if google_active and fb_active:
+        total += CRITERIA_POINTS["investimento_google_meta"]
+    elif google_active:
+        total += CRITERIA_POINTS["investimento_google"]
+    elif fb_active:
+        total += CRITERIA_POINTS["investimento_meta"]
+        
+    logger.info(f"Final score after verifications: {total}")
+    return total
+
+def determine_qualification(score, valor_inicial, valor_atual):
+    """Determines the lead qualification based on score and auction values."""
+    qualification = {
+        "status": "descartar",
+        "message": "🔴 Descartar Lead",
+        "teto": 0,
+        "show_teto": False,
+        "alert": None
+    }
+    teto = 0
+
+    if score >= 130:
+        teto = valor_inicial * 1.8
+        qualification["status"] = "comprar"
+        qualification["message"] = f"🟢 COMPRE JÁ liberado (Teto Sugerido: R$ {teto:.2f})"
+        qualification["show_teto"] = True
+    elif score >= 100:
+        teto = valor_inicial * 1.3
+        qualification["status"] = "acompanhar_alto"
+        qualification["message"] = f"🟡 Acompanhar (Teto Sugerido: R$ {teto:.2f})"
+        qualification["show_teto"] = True
+    elif score >= 80:
+        teto = valor_inicial
+        qualification["status"] = "acompanhar_baixo"
+        qualification["message"] = f"⚠️ Acompanhar (Teto Sugerido: R$ {teto:.2f})"
+        qualification["show_teto"] = True
+
+    qualification["teto"] = teto
+
+    valor_atual_num = float(valor_atual) if valor_atual else 0
+    if valor_atual_num > teto and score >= 80:
+        qualification["alert"] = f"❗ Valor atual (R$ {valor_atual_num:.2f}) ultrapassou teto sugerido (R$ {teto:.2f}). Reavaliar risco!"
+
+    logger.info(f"Qualification status: {qualification['status']}")
+    logger.debug("Qualification result: %s", qualification)
+    return qualification
+
+# --- Batch Scoring (NumPy) ---
+#
+# Re-scoring many leads at once, e.g. the historical lead base after the point
+# table changes. Each lead becomes a row of a boolean feature matrix (checked
+# checklist criteria + verification-derived bonuses) and the score is a single
+# matrix-vector product with the point table compiled into a weight vector.
+# Results match calculate_score/determine_qualification exactly.
+
+# Verification-derived features and the criterion whose points they add. They are
+# separate columns because the scalar scoring adds them on top of the checklist
+# (a lead can get validacao_cnpj_localizado twice: checklist + QSA found).
+VERIFICATION_FEATURES = {
+    "qsa_found": "validacao_cnpj_localizado",
+    "qsa_socios": "validacao_pessoa_qsa",
+    "ads_google_meta": "investimento_google_meta",
+    "ads_google": "investimento_google",
+    "ads_meta": "investimento_meta",
+}
+
+# Qualification tiers: (minimum score, status, message prefix, teto multiplier), highest first
+QUALIFICATION_TIERS = (
+    (130, "comprar", "🟢 COMPRE JÁ liberado", 1.8),
+    (100, "acompanhar_alto", "🟡 Acompanhar", 1.3),
+    (80, "acompanhar_baixo", "⚠️ Acompanhar", 1.0),
+)
+
+
+def _numpy():
+    # Lazy import: numpy is only needed for batch re-scoring, not for the web app
+    import numpy as np
+    return np
+
+
+def _verification_flags(verification_results):
+    qsa_found = verification_results.get("qsa_status") == "found"
+    qsa_data = verification_results.get("qsa_data", {})
+    google_active = verification_results.get("google_ads_status") == "active"
+    fb_active = verification_results.get("facebook_ads_status") == "active"
+    return (
+        qsa_found,
+        bool(qsa_found and qsa_data and qsa_data.get("qsa") and len(qsa_data["qsa"]) > 0),
+        google_active and fb_active,
+        google_active and not fb_active,
+        fb_active and not google_active,
+    )
+
+
+def build_feature_matrix(leads, criteria=None):
+    """Builds the boolean feature matrix for `leads` (dicts with "checklist" and "verifications").
+
+    Columns are the checklist `criteria` (default: CRITERIA_POINTS keys, in order)
+    followed by VERIFICATION_FEATURES. Returns (column names, matrix).
+    """
+    np = _numpy()
+    criteria = list(CRITERIA_POINTS) if criteria is None else list(criteria)
+    index = {key: i for i, key in enumerate(criteria)}
+    leads = list(leads)
+    matrix = np.zeros((len(leads), len(criteria) + len(VERIFICATION_FEATURES)), dtype=bool)
+    for row, lead in enumerate(leads):
+        for key, value in (lead.get("checklist") or {}).items():
+            if value and key in index:
+                matrix[row, index[key]] = True
+        matrix[row, len(criteria):] = _verification_flags(lead.get("verifications") or {})
+    return criteria + list(VERIFICATION_FEATURES), matrix
+
+
+def compile_weights(columns, points=None):
+    """Compiles a point table into the weight vector for the matrix `columns`."""
+    np = _numpy()
+    points = CRITERIA_POINTS if points is None else points
+    weights = [points.get(VERIFICATION_FEATURES.get(column, column), 0) for column in columns]
+    return np.asarray(weights)
+
+
+def rescore(columns, matrix, points=None):
+    """Scores every row of `matrix` with `points` (default CRITERIA_POINTS); returns a list of scores."""
+    weights = compile_weights(columns, points)
+    return (matrix.astype(weights.dtype) @ weights).tolist()
+
+
+def qualify_batch(scores, valores_iniciais, valores_atuais):
+    """Vectorized determine_qualification: one qualification dict per score."""
+    np = _numpy()
+    score_arr = np.asarray(scores)
+    inicial = np.asarray([float(v) for v in valores_iniciais], dtype=float)
+    atual = np.asarray([float(v) if v else 0 for v in valores_atuais], dtype=float)
+
+    conditions = [score_arr >= minimum for minimum, _, _, _ in QUALIFICATION_TIERS]
+    tier = np.select(conditions, list(range(len(QUALIFICATION_TIERS))), default=-1)
+    multiplier = np.select(conditions, [m for _, _, _, m in QUALIFICATION_TIERS], default=0.0)
+    teto_arr = inicial * multiplier
+    alert_mask = (atual > teto_arr) & (tier >= 0)
+
+    qualifications = []
+    for i, valor_inicial in enumerate(valores_iniciais):
+        if tier[i] < 0:
+            qualification = {"status": "descartar", "message": "🔴 Descartar Lead", "teto": 0,
+                             "show_teto": False, "alert": None}
+        else:
+            _, status, prefix, multiplier_i = QUALIFICATION_TIERS[tier[i]]
+            # Same type as the scalar path: the 1.0 tier keeps valor_inicial as given
+            teto = valor_inicial if multiplier_i == 1.0 else teto_arr[i].item()
+            qualification = {"status": status, "message": f"{prefix} (Teto Sugerido: R$ {teto:.2f})",
+                             "teto": teto, "show_teto": True, "alert": None}
+        if alert_mask[i]:
+            qualification["alert"] = (f"❗ Valor atual (R$ {atual[i].item():.2f}) ultrapassou teto sugerido "
+                                      f"(R$ {qualification['teto']:.2f}). Reavaliar risco!")
+        qualifications.append(qualification)
+    return qualifications
+
+
+def score_batch(leads, points=None):
+    """Scores and qualifies many leads at once.
+
+    `leads` are dicts with "checklist", "verifications", "valor_inicial" and
+    "valor_atual" (as in bulk qualification). Returns one {"score", "qualification"}
+    per lead, in order.
+    """
+    leads = list(leads)
+    criteria = list(CRITERIA_POINTS if points is None else points)
+    columns, matrix = build_feature_matrix(leads, criteria)
+    scores = rescore(columns, matrix, points)
+    qualifications = qualify_batch(
+        scores, [lead.get("valor_inicial", 0) for lead in leads], [lead.get("valor_atual", 0) for lead in leads]
+    )
+    logger.info(f"Batch scored {len(leads)} leads.")
+    return [{"score": s, "qualification": q} for s, q in zip(scores, qualifications)]
+
+
+def what_if(leads, point_tables):
+    """Re-scores the same leads under alternative point tables ({name: points}).
+
+    The feature matrix is built once over every criterion in any table; returns
+    {name: [score, ...]}.
+    """
+    criteria = list(dict.fromkeys(key for points in point_tables.values() for key in points))
+    columns, matrix = build_feature_matrix(leads, criteria)
+    return {name: rescore(columns, matrix, points) for name, points in point_tables.items()}
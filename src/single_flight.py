@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+"""Execução única por (fonte, alvo normalizado) para verificações simultâneas.
+
+Quando duas chamadas pedem o mesmo domínio/usuário/CNPJ ao mesmo tempo (ex:
+botão de verificação individual + /api/qualify), só a primeira executa a
+extração ou a consulta; as demais esperam e recebem o mesmo resultado.
+
+A execução roda no contexto de crawl de quem chegou primeiro (prioridade,
+prazo e cancelamento), então:
+- quem espera respeita o próprio prazo e o próprio cancelamento;
+- se quem executava foi cancelado ou estourou o prazo, o resultado não é
+  repassado: quem espera assume a execução (ou entra na próxima);
+- uma chamada interativa que entra na espera promove os crawls da execução
+  em andamento para a prioridade interativa (ex: pré-busca na fila).
+
+Dentro do processo a coordenação é feita com threading.Event. Com
+SINGLE_FLIGHT_DB apontando para um arquivo SQLite (padrão com a pré-busca
+ligada, ver src.cache.caminho_compartilhado), os workers do gunicorn
+também se coordenam: quem chega primeiro registra a execução na tabela e os
+outros consultam a linha até o resultado ser gravado (ou até o prazo da
+execução vencer, se o worker que executava morreu).
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from src.cache import caminho_compartilhado, normalizar_alvo
+from src.crawl_scheduler import (
+    PRIORITY_INTERACTIVE, CrawlCancelled, CrawlDeadlineExceeded, cancelamento_atual, crawl_context,
+    prioridade_atual, promocao_atual, tempo_restante,
+)
+
+logger = logging.getLogger(__name__)
+
+SINGLE_FLIGHT_DB = caminho_compartilhado("SINGLE_FLIGHT_DB", "single_flight.db")  # Ex: /var/lib/lead_checker/single_flight.db
+# Tempo (s) após o qual uma execução de outro worker sem resultado é considerada abandonada
+SINGLE_FLIGHT_LEASE = float(os.getenv("SINGLE_FLIGHT_LEASE", "330"))
+# Por quanto tempo (s) o resultado gravado continua disponível para quem estava esperando
+SINGLE_FLIGHT_RESULT_TTL = float(os.getenv("SINGLE_FLIGHT_RESULT_TTL", "10"))
+_INTERVALO_CONSULTA = 0.25
+
+
+class _Chamada:
+    def __init__(self, promocao):
+        self.pronto = threading.Event()
+        self.promocao = promocao  # Acionado por quem espera com prioridade interativa
+        self.resultado = None
+        self.erro = None
+        self.interrompida = False  # Quem executava foi cancelado ou estourou o prazo
+
+
+def _contexto_interrompido():
+    """O contexto de crawl atual foi cancelado ou passou do prazo?"""
+    cancelamento = cancelamento_atual()
+    return (cancelamento is not None and cancelamento.is_set()) or tempo_restante() == 0
+
+
+def _checar_espera():
+    """Levanta CrawlCancelled/CrawlDeadlineExceeded se quem espera não pode mais esperar."""
+    cancelamento = cancelamento_atual()
+    if cancelamento is not None and cancelamento.is_set():
+        raise CrawlCancelled("Espera pela execução em andamento cancelada.")
+    if tempo_restante() == 0:
+        raise CrawlDeadlineExceeded("Prazo esgotado esperando a execução em andamento.")
+
+
+def _esperar(evento):
+    """Espera `evento` respeitando o prazo e o cancelamento do contexto de quem espera."""
+    while True:
+        _checar_espera()
+        restante = tempo_restante()
+        if evento.wait(_INTERVALO_CONSULTA if restante is None else min(_INTERVALO_CONSULTA, restante)):
+            return
+
+
+class _SQLiteFlights:
+    """Registro compartilhado das execuções em andamento entre processos."""
+
+    def __init__(self, path):
+        self.path = path
+        diretorio = os.path.dirname(path)
+        if diretorio:
+            os.makedirs(diretorio, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS single_flight ("
+                " fonte TEXT NOT NULL, chave TEXT NOT NULL, dono TEXT NOT NULL,"
+                " iniciado_em REAL NOT NULL, concluido_em REAL, resultado TEXT,"
+                " PRIMARY KEY (fonte, chave))"
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10, isolation_level=None)
+
+    def reservar(self, fonte, chave, dono):
+        """Tenta assumir a execução. Devolve ("dono", None), ("esperar", None) ou ("pronto", resultado)."""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT dono, iniciado_em, concluido_em, resultado FROM single_flight WHERE fonte = ? AND chave = ?",
+                (fonte, chave),
+            ).fetchone()
+            agora = time.time()
+            if row is not None:
+                _, iniciado_em, concluido_em, resultado = row
+                if concluido_em is None and agora - iniciado_em < SINGLE_FLIGHT_LEASE:
+                    conn.execute("COMMIT")
+                    return "esperar", None
+                if concluido_em is not None and agora - concluido_em < SINGLE_FLIGHT_RESULT_TTL:
+                    conn.execute("COMMIT")
+                    return "pronto", json.loads(resultado)
+            conn.execute(
+                "INSERT OR REPLACE INTO single_flight (fonte, chave, dono, iniciado_em, concluido_em, resultado)"
+                " VALUES (?, ?, ?, ?, NULL, NULL)",
+                (fonte, chave, dono, agora),
+            )
+            conn.execute("COMMIT")
+            return "dono", None
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def concluir(self, fonte, chave, dono, resultado):
+        with self._connect() as conn:
+            if resultado is None:
+                conn.execute("DELETE FROM single_flight WHERE fonte = ? AND chave = ? AND dono = ?",
+                             (fonte, chave, dono))
+            else:
+                conn.execute(
+                    "UPDATE single_flight SET concluido_em = ?, resultado = ? WHERE fonte = ? AND chave = ? AND dono = ?",
+                    (time.time(), json.dumps(resultado, ensure_ascii=False), fonte, chave, dono),
+                )
+            conn.execute("DELETE FROM single_flight WHERE concluido_em < ?", (time.time() - SINGLE_FLIGHT_RESULT_TTL,))
+
+
+class SingleFlight:
+    """Agrupa chamadas simultâneas para a mesma (fonte, alvo) em uma única execução."""
+
+    def __init__(self, db_path=SINGLE_FLIGHT_DB):
+        self._lock = threading.Lock()
+        self._chamadas = {}
+        self._compartilhado = None
+        self.execucoes = 0
+        self.compartilhadas = 0
+        self.retomadas = 0  # Execuções refeitas porque a anterior foi interrompida
+        self.aguardando = 0
+        if db_path:
+            try:
+                self._compartilhado = _SQLiteFlights(db_path)
+            except sqlite3.Error as e:
+                logger.error(f"Não foi possível abrir {db_path} para single-flight: {str(e)}. Usando apenas o processo.")
+
+    def do(self, fonte, alvo, funcao):
+        """Executa `funcao()` uma única vez por (fonte, alvo) entre as chamadas simultâneas.
+
+        Quem espera levanta CrawlCancelled/CrawlDeadlineExceeded se o seu próprio
+        cancelamento for acionado ou o seu prazo acabar antes do resultado.
+        """
+        chave = (fonte, normalizar_alvo(fonte, alvo))
+        while True:
+            with self._lock:
+                chamada = self._chamadas.get(chave)
+                lider = chamada is None
+                if lider:
+                    chamada = self._chamadas[chave] = _Chamada(promocao_atual() or threading.Event())
+                else:
+                    self.aguardando += 1
+            if lider:
+                return self._liderar(chave, chamada, funcao)
+
+            if prioridade_atual() == PRIORITY_INTERACTIVE:
+                chamada.promocao.set()
+            try:
+                _esperar(chamada.pronto)
+            finally:
+                with self._lock:
+                    self.aguardando -= 1
+            if chamada.interrompida:
+                logger.info(f"Execução de {fonte} para {chave[1]} foi interrompida; refazendo para quem esperava.")
+                with self._lock:
+                    self.retomadas += 1
+                continue
+            with self._lock:
+                self.compartilhadas += 1
+            logger.info(f"Verificação {fonte} para {chave[1]} aproveitou uma execução em andamento.")
+            if chamada.erro is not None:
+                raise chamada.erro
+            return chamada.resultado
+
+    def _liderar(self, chave, chamada, funcao):
+        try:
+            with crawl_context(promocao=chamada.promocao):
+                chamada.resultado = self._executar_entre_processos(chave, funcao)
+        except BaseException as e:
+            chamada.erro = e
+            chamada.interrompida = isinstance(e, (CrawlCancelled, CrawlDeadlineExceeded)) or _contexto_interrompido()
+            raise
+        else:
+            chamada.interrompida = _contexto_interrompido()
+        finally:
+            with self._lock:
+                del self._chamadas[chave]
+                self.execucoes += 1
+            chamada.pronto.set()
+        return chamada.resultado
+
+    def _executar_entre_processos(self, chave, funcao):
+        if self._compartilhado is None:
+            return funcao()
+        fonte, alvo = chave
+        dono = f"{os.getpid()}:{threading.get_ident()}"
+        while True:
+            try:
+                estado, resultado = self._compartilhado.reservar(fonte, alvo, dono)
+            except sqlite3.Error as e:
+                logger.warning(f"Erro no single-flight compartilhado: {str(e)}. Executando localmente.")
+                return funcao()
+            if estado == "pronto":
+                logger.info(f"Verificação {fonte} para {alvo} aproveitou o resultado de outro worker.")
+                return resultado
+            if estado == "dono":
+                break
+            _checar_espera()
+            time.sleep(_INTERVALO_CONSULTA)
+
+        resultado = None
+        try:
+            resultado = funcao()
+            return resultado
+        finally:
+            try:
+                # Resultado de uma execução interrompida não é repassado aos outros workers
+                self._compartilhado.concluir(fonte, alvo, dono, None if _contexto_interrompido() else resultado)
+            except sqlite3.Error as e:
+                logger.warning(f"Erro ao concluir single-flight compartilhado: {str(e)}")
+
+    def stats(self):
+        with self._lock:
+            return {"em_andamento": len(self._chamadas), "execucoes": self.execucoes,
+                    "compartilhadas": self.compartilhadas, "retomadas": self.retomadas,
+                    "aguardando": self.aguardando}
+
+
+single_flight = SingleFlight()
@@ -8,10 +8,20 @@ function showLoading(elementId, message = "Verificando...") {
     }
 }
 
-function updateResult(elementId, status, message, data = null) {
+function formatCheckedAt(checkedAt) {
+    // checked_at comes from the server as a naive UTC ISO timestamp
+    const date = new Date(/(?:[zZ]|[+-]\d\d:\d\d)$/.test(checkedAt) ? checkedAt : `${checkedAt}Z`);
+    return isNaN(date) ? checkedAt : date.toLocaleString("pt-BR");
+}
+
+function updateResult(elementId, status, message, data = null, checkedAt = null) {
     const el = document.getElementById(elementId);
     if (el) {
         let html = `<span class="status-${status}">${message}</span>`;
+        if (checkedAt) {
+            // Stale-while-revalidate: last known result while a fresh check runs on the server
+            html += `<div class="stale-note"><i class="fas fa-history"></i> Resultado de ${formatCheckedAt(checkedAt)}; atualizando em segundo plano.</div>`;
+        }
         // Special handling for QSA data
         if (elementId === "qsa_result" && status === "found" && data) {
             html += `<div class="qsa-details">`;
@@ -35,6 +45,7 @@ function getStatusText(status) {
         case "found": return "Encontrado";
         case "not_found": return "Não encontrado";
         case "error": return "Erro";
+        case "timeout": return "Tempo esgotado";
         case "pending": return "Pendente";
         case "not_checked": return "Não verificado";
         default: return status;
@@ -59,7 +70,7 @@ async function verifyInstagram() {
         });
         const data = await response.json();
         if (!response.ok) throw new Error(data.error || `HTTP error ${response.status}`);
-        updateResult(resultDivId, data.status, data.message);
+        updateResult(resultDivId, data.status, data.message, null, data.stale ? data.checked_at : null);
     } catch (error) {
         console.error("Error verifying Instagram:", error);
         updateResult(resultDivId, "error", `Erro: ${error.message}`);
@@ -82,7 +93,7 @@ async function verifyGoogle() {
         });
         const data = await response.json();
         if (!response.ok) throw new Error(data.error || `HTTP error ${response.status}`);
-        updateResult(resultDivId, data.status, data.message);
+        updateResult(resultDivId, data.status, data.message, null, data.stale ? data.checked_at : null);
     } catch (error) {
         console.error("Error verifying Google:", error);
         updateResult(resultDivId, "error", `Erro: ${error.message}`);
@@ -105,18 +116,137 @@ async function verifyQSA() {
         });
         const data = await response.json();
         if (!response.ok) throw new Error(data.error || `HTTP error ${response.status}`);
-        updateResult(resultDivId, data.status, data.message, data.data); // Pass simplified data
+        updateResult(resultDivId, data.status, data.message, data.data, data.stale ? data.checked_at : null); // Pass simplified data
     } catch (error) {
         console.error("Error verifying QSA:", error);
         updateResult(resultDivId, "error", `Erro: ${error.message}`);
     }
 }
 
+// --- Progress of Background Qualification Jobs ---
+
+const CHECK_RESULT_IDS = { facebook: "instagram_result", google: "google_result", qsa: "qsa_result" };
+const CHECK_LABELS = { facebook: "Anúncios Instagram/Meta", google: "Anúncios Google", qsa: "Consulta QSA" };
+
+function renderCheck(check) {
+    // Renders one finished verification as soon as the server reports it
+    const resultDivId = CHECK_RESULT_IDS[check.source];
+    if (!resultDivId) return;
+    let message = (check.status === "error" || check.status === "timeout") && check.error ? check.error : getStatusText(check.status);
+    let qsaData = null;
+    if (check.source === "qsa" && check.status === "found" && check.data) {
+        qsaData = {
+            razao_social: check.data.razao_social,
+            situacao: check.data.situacao,
+            socios: (check.data.qsa || []).map(s => `${s.nome || "?"} (${s.qual || "?"})`)
+        };
+    }
+    updateResult(resultDivId, check.status, message, qsaData);
+
+    const progressList = document.getElementById("loadingProgress");
+    if (progressList) {
+        progressList.innerHTML += `<li class="status-${check.status}">${CHECK_LABELS[check.source]}: ${getStatusText(check.status)}</li>`;
+    }
+}
+
+function pollJob(job, resolve, reject, rendered = new Set()) {
+    // Fallback for browsers without EventSource or when the stream drops
+    fetch(job.status_url)
+        .then(response => response.json().then(data => ({ response, data })))
+        .then(({ response, data }) => {
+            if (!response.ok) throw new Error(data.error || `HTTP error ${response.status}`);
+            Object.entries(data.checks || {}).forEach(([source, check]) => {
+                if (check.status !== "pending" && !rendered.has(source)) {
+                    rendered.add(source);
+                    renderCheck({ source, ...check });
+                }
+            });
+            if (data.status === "done") resolve(data.result);
+            else if (data.status === "error" || data.status === "cancelled") reject(new Error(data.error));
+            else setTimeout(() => pollJob(job, resolve, reject, rendered), 1500);
+        })
+        .catch(reject);
+}
+
+function waitForJob(job) {
+    return new Promise((resolve, reject) => {
+        if (!window.EventSource) {
+            pollJob(job, resolve, reject);
+            return;
+        }
+        const rendered = new Set();
+        const source = new EventSource(job.events_url);
+        source.addEventListener("check", event => {
+            const check = JSON.parse(event.data);
+            rendered.add(check.source);
+            renderCheck(check);
+        });
+        source.addEventListener("done", event => {
+            source.close();
+            resolve(JSON.parse(event.data));
+        });
+        source.addEventListener("cancelled", event => {
+            source.close();
+            reject(new Error(JSON.parse(event.data).error));
+        });
+        source.addEventListener("error", event => {
+            source.close();
+            if (event.data) {
+                reject(new Error(JSON.parse(event.data).error));
+            } else {
+                pollJob(job, resolve, reject, rendered); // Connection lost: keep following via polling
+            }
+        });
+    });
+}
+
 // --- Main Qualification Function ---
 
+function renderQualification(data) {
+    const resultadoDiv = document.getElementById("resultado");
+    const verificationDetailsDiv = document.getElementById("verificationDetails");
+    const errorMessagesDiv = document.getElementById("errorMessages");
+
+    // --- डिस्प्ले परिणाम ---
+    // स्कोर और क्वालिफिकेशन
+    resultadoDiv.innerHTML = `Pontuação Final: <strong>${data.score}</strong><br>`;
+    resultadoDiv.innerHTML += data.qualification.message;
+    resultadoDiv.className = `result-box status-${data.qualification.status}`;
+    if (data.qualification.alert) {
+        resultadoDiv.innerHTML += `<div class="alert">${data.qualification.alert}</div>`;
+    }
+
+    // वेरिफिकेशन डिटेल्स (from the final calculation)
+    let detailsHTML = "<ul>";
+    detailsHTML += `<li class="status-${data.verifications.facebook_ads_status}">Anúncios Instagram/Meta: ${getStatusText(data.verifications.facebook_ads_status)}</li>`;
+    detailsHTML += `<li class="status-${data.verifications.google_ads_status}">Anúncios Google: ${getStatusText(data.verifications.google_ads_status)}</li>`;
+    detailsHTML += `<li class="status-${data.verifications.qsa_status}">Consulta QSA: ${getStatusText(data.verifications.qsa_status)}</li>`;
+    // Add QSA details if found
+    if (data.verifications.qsa_status === "found" && data.verifications.qsa_data) {
+         detailsHTML += `<li class="qsa-summary"> (Razão: ${data.verifications.qsa_data.razao_social || "N/A"}, Situação: ${data.verifications.qsa_data.situacao || "N/A"})</li>`;
+    }
+    detailsHTML += "</ul>";
+    verificationDetailsDiv.innerHTML = detailsHTML;
+
+    // एरर संदेश (from the final calculation)
+    if (data.verifications.error_messages && data.verifications.error_messages.length > 0) {
+        let errorHTML = "<ul>";
+        data.verifications.error_messages.forEach(msg => {
+            errorHTML += `<li class="status-error">${msg}</li>`;
+        });
+        errorHTML += "</ul>";
+        errorMessagesDiv.innerHTML = errorHTML;
+        errorMessagesDiv.style.display = "block";
+    } else {
+         errorMessagesDiv.innerHTML = "";
+         errorMessagesDiv.style.display = "none";
+    }
+}
+
 async function qualifyLead() {
     const calculateButton = document.getElementById("calculateButton");
     const loadingDiv = document.getElementById("loading");
+    const loadingProgress = document.getElementById("loadingProgress");
     const resultSection = document.getElementById("resultSection");
     const resultadoDiv = document.getElementById("resultado");
     const verificationDetailsDiv = document.getElementById("verificationDetails");
@@ -125,6 +255,7 @@ async function qualifyLead() {
     // Disable button and show loading overlay
     calculateButton.disabled = true;
     loadingDiv.style.display = "flex"; // Use flex for centering
+    if (loadingProgress) loadingProgress.innerHTML = "";
     resultSection.style.display = "none";
     resultadoDiv.innerHTML = "";
     verificationDetailsDiv.innerHTML = "";
@@ -169,58 +300,27 @@ async function qualifyLead() {
         cnpj: cnpj,
         valorInicial: valorInicial,
         valorAtual: valorAtual,
-        checklist: checklistData
+        checklist: checklistData,
+        profile: "standard" // Only the fields rendered below
     };
 
-    // --- एपीआई कॉल (Main Qualification) ---
+    // --- एपीआई कॉल (Background Qualification Job) ---
     try {
-        const response = await fetch("/api/qualify", {
+        const response = await fetch("/api/qualify/jobs", {
             method: "POST",
             headers: { "Content-Type": "application/json" },
             body: JSON.stringify(payload),
         });
 
-        const data = await response.json();
-        resultSection.style.display = "block"; // Show results section
-
+        const job = await response.json();
         if (!response.ok) {
-            throw new Error(data.error || `HTTP error! status: ${response.status}`);
-        }
-
-        // --- डिस्प्ले परिणाम ---
-        // स्कोर और क्वालिफिकेशन
-        resultadoDiv.innerHTML = `Pontuação Final: <strong>${data.score}</strong><br>`;
-        resultadoDiv.innerHTML += data.qualification.message;
-        resultadoDiv.className = `result-box status-${data.qualification.status}`;
-        if (data.qualification.alert) {
-            resultadoDiv.innerHTML += `<div class="alert">${data.qualification.alert}</div>`;
+            throw new Error(job.error || `HTTP error! status: ${response.status}`);
         }
 
-        // वेरिफिकेशन डिटेल्स (from the final calculation)
-        let detailsHTML = "<ul>";
-        detailsHTML += `<li class="status-${data.verifications.facebook_ads_status}">Anúncios Instagram/Meta: ${getStatusText(data.verifications.facebook_ads_status)}</li>`;
-        detailsHTML += `<li class="status-${data.verifications.google_ads_status}">Anúncios Google: ${getStatusText(data.verifications.google_ads_status)}</li>`;
-        detailsHTML += `<li class="status-${data.verifications.qsa_status}">Consulta QSA: ${getStatusText(data.verifications.qsa_status)}</li>`;
-        // Add QSA details if found
-        if (data.verifications.qsa_status === "found" && data.verifications.qsa_data) {
-             detailsHTML += `<li class="qsa-summary"> (Razão: ${data.verifications.qsa_data.razao_social || "N/A"}, Situação: ${data.verifications.qsa_data.situacao || "N/A"})</li>`;
-        }
-        detailsHTML += "</ul>";
-        verificationDetailsDiv.innerHTML = detailsHTML;
-
-        // एरर संदेश (from the final calculation)
-        if (data.verifications.error_messages && data.verifications.error_messages.length > 0) {
-            let errorHTML = "<ul>";
-            data.verifications.error_messages.forEach(msg => {
-                errorHTML += `<li class="status-error">${msg}</li>`;
-            });
-            errorHTML += "</ul>";
-            errorMessagesDiv.innerHTML = errorHTML;
-            errorMessagesDiv.style.display = "block";
-        } else {
-             errorMessagesDiv.innerHTML = "";
-             errorMessagesDiv.style.display = "none";
-        }
+        // Each check is rendered as it finishes; the final result arrives with the "done" event
+        const data = await waitForJob(job);
+        resultSection.style.display = "block"; // Show results section
+        renderQualification(data);
 
     } catch (error) {
         console.error("Error qualifying lead:", error);
@@ -254,6 +354,39 @@ document.getElementById("cnpj").addEventListener("input", function (e) {
     e.target.value = value;
 });
 
+// --- Prefetch ---
+// Once a field holds a complete value, the server starts that check in the background (low priority),
+// so the verify buttons and the final qualification usually find it done or already running.
+
+const PREFETCH_DEBOUNCE_MS = 800;
+const PREFETCH_VALIDATORS = {
+    instagram_username: value => /^@?[A-Za-z0-9._]{1,30}$/.test(value),
+    domain: value => /^(https?:\/\/)?(www\.)?([A-Za-z0-9-]+\.)+[A-Za-z]{2,}(\/.*)?$/.test(value),
+    cnpj: value => value.replace(/\D/g, "").length === 14,
+};
+const prefetchSent = new Set();
+const prefetchTimers = {};
+
+function schedulePrefetch(field) {
+    clearTimeout(prefetchTimers[field]);
+    prefetchTimers[field] = setTimeout(() => {
+        const value = document.getElementById(field).value.trim();
+        const key = `${field}:${value.toLowerCase()}`;
+        if (!PREFETCH_VALIDATORS[field](value) || prefetchSent.has(key)) return;
+        prefetchSent.add(key);
+        fetch("/api/prefetch", {
+            method: "POST",
+            headers: { "Content-Type": "application/json" },
+            body: JSON.stringify({ [field]: value }),
+            keepalive: true,
+        }).catch(() => prefetchSent.delete(key)); // Best effort: the real check still runs on demand
+    }, PREFETCH_DEBOUNCE_MS);
+}
+
+Object.keys(PREFETCH_VALIDATORS).forEach(field => {
+    document.getElementById(field).addEventListener("input", () => schedulePrefetch(field));
+});
+
 // Optional: Clear individual results when input changes?
 // document.getElementById("instagram_username").addEventListener("input", () => document.getElementById("instagram_result").innerHTML = "");
 // document.getElementById("domain").addEventListener("input", () => document.getElementById("google_result").innerHTML = "");
@@ -1,7 +1,14 @@
 # -*- coding: utf-8 -*-
 import os
+import random
 import time
 import asyncio # Adicionado para Crawl4AI
+import contextvars
+import hashlib
+import threading
+from concurrent.futures import (
+    FIRST_COMPLETED, CancelledError, ThreadPoolExecutor, TimeoutError as FutureTimeoutError, wait,
+)
 
 # Remover importações do Selenium
 # from selenium import webdriver
@@ -11,10 +18,23 @@ import asyncio # Adicionado para Crawl4AI
 # from selenium.webdriver.support import expected_conditions as EC
 # from selenium.common.exceptions import TimeoutException, WebDriverException
 
-# Adicionar importações do Crawl4AI
-from crawl4ai import AsyncWebCrawler, BrowserConfig, CrawlerRunConfig, CacheMode
+# O Crawl4AI (e o Playwright) só é importado na primeira extração via navegador; ver _configuracoes_crawl4ai
+from src.analyzer import get_analyzer
+from src.browser_pool import get_browser_pool
+from src.cache import verification_cache
+from src.crawl_scheduler import (
+    CrawlCancelled, CrawlDeadlineExceeded, cancelamento_atual, crawl_context, crawl_scheduler, tempo_restante,
+)
+from src.http_client import HTTP_CONNECT_TIMEOUT, get_session
+from src.cnpj_store import consultar_cnpj_local
+from src.rate_limit import RateLimitExceeded, get_limiter, parse_retry_after
+from src.content_pruning import podar_conteudo
+from src.extractors import EXTRACTOR_BACKEND, extrair_via_http
+from src.fast_path import ACTIVE, UNCERTAIN, classificar_rapido, fast_path_stats
+from src.latency_budget import com_hedge
+from src.metrics import cache_lookups, medir_etapa, verification_outcomes
+from src.single_flight import single_flight
 
-from crewai import Agent, Task, Crew
 import requests
 from dotenv import load_dotenv
 import logging
@@ -34,130 +54,453 @@ else:
     os.environ["OPENAI_API_KEY"] = OPENAI_API_KEY
 
 # --- Configurações do Crawl4AI ---
-BROWSER_CONFIG = BrowserConfig(
-    headless=True,
-    browser_type="chromium", # Pode ser "firefox" ou "webkit" se preferir e estiver instalado
-    viewport_width=1280,
-    viewport_height=720,
-    # Adicionar quaisquer outros parâmetros de browser necessários, como user_agent, proxy, etc.
-    # user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/98.0.4758.102 Safari/537.36"
-)
 
-CRAWLER_RUN_CONFIG = CrawlerRunConfig(
-    cache_mode=CacheMode.BYPASS, # BYPASS para sempre buscar dados frescos, ou use CACHE_FIRST/ONLY_CACHE conforme necessidade
-    delay_before_return_html=8,  # Espera adicional para renderização (ajustar conforme necessário)
-    magic=True,  # Ativa heurísticas automáticas de espera
-    # Outras configurações como max_retries, timeout, etc.
-    # timeout=60 # Timeout total para a operação de crawling
-)
+# Espera por prontidão: em vez de dormir 8s fixos, o crawl retorna assim que a área de
+# resultados aparece. READINESS_MAX_WAIT_MS limita a espera ao antigo teto de 8s.
+READINESS_MAX_WAIT_MS = int(os.getenv("READINESS_MAX_WAIT_MS", "8000"))
+READINESS_CHECKS = {
+    "facebook": "/~?\\s*[\\d.,]+\\s*(resultados?|results?)\\b|nenhum anúncio|no ads/i.test(document.body.innerText)",
+    "google": "!!document.querySelector('creative-preview') || /nenhum anúncio|não veiculou|no ads found|verificado|verified/i.test(document.body.innerText)",
+}
+
+_CONFIGS_CRAWL4AI = ("BROWSER_CONFIG", "CRAWLER_RUN_CONFIG", "PLATFORM_RUN_CONFIGS")
+_configs_crawl4ai = None
+_configs_lock = threading.Lock()
+
+def _configuracoes_crawl4ai():
+    """Importa o Crawl4AI e monta as configurações na primeira extração via navegador.
+
+    Assim, importar este módulo (e src/main.py) não carrega o Playwright; o
+    warmup() antecipa essa carga nos workers do gunicorn.
+    """
+    global _configs_crawl4ai
+    with _configs_lock:
+        if _configs_crawl4ai is not None:
+            return _configs_crawl4ai
+        from crawl4ai import BrowserConfig, CacheMode, CrawlerRunConfig
+
+        browser_config = BrowserConfig(
+            headless=True,
+            browser_type="chromium", # Pode ser "firefox" ou "webkit" se preferir e estiver instalado
+            viewport_width=1280,
+            viewport_height=720,
+            # Adicionar quaisquer outros parâmetros de browser necessários, como user_agent, proxy, etc.
+            # user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/98.0.4758.102 Safari/537.36"
+        )
+
+        # O cache de página do Crawl4AI fica desligado: o cache de resultados (src/cache.py)
+        # guarda o status final por alvo normalizado, já com a análise de IA.
+        crawler_run_config = CrawlerRunConfig(
+            cache_mode=CacheMode.BYPASS, # BYPASS para sempre buscar dados frescos, ou use CACHE_FIRST/ONLY_CACHE conforme necessidade
+            delay_before_return_html=0.5,  # A espera de renderização é feita por prontidão (wait_for), ver READINESS_CHECKS
+            magic=True,  # Ativa heurísticas automáticas de espera
+            excluded_tags=["nav", "footer", "script", "style", "noscript", "svg"],  # Navegação e rodapé não chegam ao markdown
+            page_timeout=CRAWL_PAGE_TIMEOUT_MS,  # Navegação e wait_for; o job inteiro é limitado por CRAWL_TIMEOUT/prazo
+        )
+        _configs_crawl4ai = {
+            "BROWSER_CONFIG": browser_config,
+            "CRAWLER_RUN_CONFIG": crawler_run_config,
+            "PLATFORM_RUN_CONFIGS": {
+                plataforma: crawler_run_config.clone(
+                    wait_for=f"js:() => ({condicao}) || performance.now() > {READINESS_MAX_WAIT_MS}"
+                )
+                for plataforma, condicao in READINESS_CHECKS.items()
+            },
+        }
+        return _configs_crawl4ai
+
+def __getattr__(nome):
+    # BROWSER_CONFIG, CRAWLER_RUN_CONFIG e PLATFORM_RUN_CONFIGS continuam acessíveis como atributos do módulo
+    if nome in _CONFIGS_CRAWL4AI:
+        return _configuracoes_crawl4ai()[nome]
+    raise AttributeError(f"module {__name__!r} has no attribute {nome!r}")
 
 # --- Funções de Extração (Modificadas para Crawl4AI) ---
 
-async def _extract_with_crawl4ai(url: str, target_name: str):
-    """Função auxiliar para extrair conteúdo de uma URL usando Crawl4AI."""
+# Tempo máximo (s) que uma extração pode ocupar um navegador do pool
+CRAWL_TIMEOUT = float(os.getenv("CRAWL_TIMEOUT", "90"))
+# Tempo máximo (ms) de navegação/espera de cada página no Crawl4AI
+CRAWL_PAGE_TIMEOUT_MS = int(os.getenv("CRAWL_PAGE_TIMEOUT_MS", "45000"))
+
+async def _extract_with_crawl4ai(url: str, target_name: str, crawler=None, run_config=None):
+    """Função auxiliar para extrair conteúdo de uma URL usando Crawl4AI.
+
+    Usa o `crawler` recebido (emprestado do pool); sem ele, abre um navegador próprio.
+    """
     logger.info(f"Acessando {target_name} em: {url} com Crawl4AI")
+    configs = _configuracoes_crawl4ai()
+    run_config = run_config or configs["CRAWLER_RUN_CONFIG"]
     try:
-        async with AsyncWebCrawler(config=BROWSER_CONFIG) as crawler:
-            result = await crawler.arun(url=url, config=CRAWLER_RUN_CONFIG)
-            if result.success and result.markdown:
-                logger.info(f"Extração de {target_name} concluída com sucesso.")
-                return result.markdown.raw_markdown
-            elif result.success and not result.markdown:
-                logger.warning(f"Extração de {target_name} bem-sucedida, mas sem conteúdo markdown. Retornando texto da página se disponível.")
-                # Tenta pegar o texto bruto se o markdown não estiver disponível
-                if result.page_content:
-                    return result.page_content
-                return "Erro ao extrair: Conteúdo Markdown não gerado e page_content vazio."
-            else:
-                error_msg = result.error_message or "Erro desconhecido durante a extração."
-                logger.error(f"Falha na extração de {target_name}: {error_msg}")
-                return f"Erro ao extrair: {error_msg}"
+        if crawler is None:
+            from crawl4ai import AsyncWebCrawler
+
+            async with AsyncWebCrawler(config=configs["BROWSER_CONFIG"]) as crawler:
+                with medir_etapa("crawl"):
+                    result = await crawler.arun(url=url, config=run_config)
+        else:
+            with medir_etapa("crawl"):
+                result = await crawler.arun(url=url, config=run_config)
+        return _conteudo_do_resultado(result, target_name)
     except Exception as e:
         logger.error(f"Erro durante a extração de {target_name} para {url}: {str(e)}")
         return f"Erro ao extrair dados: {str(e)}"
 
+def _conteudo_do_resultado(result, target_name):
+    """Markdown (ou texto) de um CrawlResult, ou a mensagem "Erro ao extrair: ..."."""
+    if result is None:
+        logger.error(f"Falha na extração de {target_name}: página sem resultado.")
+        return "Erro ao extrair: Página sem resultado."
+    if result.success and result.markdown:
+        logger.info(f"Extração de {target_name} concluída com sucesso.")
+        return result.markdown.raw_markdown
+    elif result.success and not result.markdown:
+        logger.warning(f"Extração de {target_name} bem-sucedida, mas sem conteúdo markdown. Retornando texto da página se disponível.")
+        # Tenta pegar o texto bruto se o markdown não estiver disponível
+        if result.page_content:
+            return result.page_content
+        return "Erro ao extrair: Conteúdo Markdown não gerado e page_content vazio."
+    else:
+        error_msg = result.error_message or "Erro desconhecido durante a extração."
+        logger.error(f"Falha na extração de {target_name}: {error_msg}")
+        return f"Erro ao extrair: {error_msg}"
+
+async def _extract_many_with_crawl4ai(paginas, crawler):
+    """Abre as páginas [(url, target_name, run_config)] em abas paralelas do mesmo navegador.
+
+    Usa arun_many com uma configuração por URL (url_matcher) e devolve {target_name: conteúdo}.
+    """
+    from crawl4ai import SemaphoreDispatcher
+
+    for url, target_name, _ in paginas:
+        logger.info(f"Acessando {target_name} em: {url} com Crawl4AI (em conjunto)")
+    configs = [
+        run_config.clone(url_matcher=lambda u, alvo=url: u == alvo)
+        for url, _, run_config in paginas
+    ]
+    try:
+        with medir_etapa("crawl_many"):
+            results = await crawler.arun_many(
+                [url for url, _, _ in paginas], config=configs,
+                dispatcher=SemaphoreDispatcher(semaphore_count=len(paginas)),
+            )
+    except Exception as e:
+        logger.error(f"Erro durante a extração conjunta de {len(paginas)} páginas: {str(e)}")
+        return {target_name: f"Erro ao extrair dados: {str(e)}" for _, target_name, _ in paginas}
+    por_url = {result.url: result for result in results}
+    return {target_name: _conteudo_do_resultado(por_url.get(url), target_name) for url, target_name, _ in paginas}
+
+# Espera máxima (s) na fila da cota de Facebook/Google antes de desistir do crawl
+CRAWL_MAX_QUEUE_WAIT = float(os.getenv("CRAWL_MAX_QUEUE_WAIT", "60"))
+
+def _extraiu(conteudo):
+    return "Erro ao extrair" not in conteudo
+
+def _aguardar_cota(plataforma):
+    """Espera a vez na cota da plataforma, no máximo CRAWL_MAX_QUEUE_WAIT ou o prazo restante.
+
+    Levanta RateLimitExceeded se a vez não chegar a tempo.
+    """
+    restante = tempo_restante()
+    get_limiter(plataforma).acquire(
+        max_wait=CRAWL_MAX_QUEUE_WAIT if restante is None else min(CRAWL_MAX_QUEUE_WAIT, restante))
+
+def _hedge_na_cota(plataformas, tentativa, falha):
+    """Segunda tentativa de com_hedge: também é uma requisição à plataforma e passa pela cota.
+
+    Se a cota não abrir a tempo, devolve `falha(mensagem)` (resultado não aceitável).
+    """
+    def hedge():
+        try:
+            for plataforma in plataformas:
+                _aguardar_cota(plataforma)
+        except RateLimitExceeded as e:
+            logger.warning(f"Segunda tentativa de extração descartada: {str(e)}")
+            return falha(f"Erro ao extrair: {str(e)}")
+        return tentativa()
+    return hedge
+
+def _extrair_via_pool(url, target_name, plataforma):
+    """Submete a extração ao pool compartilhado de navegadores e espera o resultado.
+
+    A vez no navegador é dada pelo agendador de crawls (prioridade, prazo e
+    cancelamento vêm do contexto da verificação). Se a extração passar do
+    orçamento de latência da plataforma (p95), uma segunda tentativa é aberta
+    em outra aba, depois de passar pela cota da plataforma, e vale a que
+    terminar primeiro (src/latency_budget.py).
+    """
+    tentativa = lambda: _extrair_via_pool_uma_vez(url, target_name, plataforma)
+    return com_hedge(
+        f"crawl:{plataforma}",
+        tentativa,
+        aceitavel=_extraiu,
+        pode_disparar=crawl_scheduler.tem_vaga,
+        hedge=_hedge_na_cota((plataforma,), tentativa, lambda erro: erro),
+    )
+
+def _extrair_via_pool_uma_vez(url, target_name, plataforma):
+    def executar(restante):
+        configs = _configuracoes_crawl4ai()
+        timeout = CRAWL_TIMEOUT if restante is None else min(CRAWL_TIMEOUT, restante)
+        return get_browser_pool(configs["BROWSER_CONFIG"]).submit(
+            lambda crawler: _extract_with_crawl4ai(
+                url, target_name, crawler=crawler, run_config=configs["PLATFORM_RUN_CONFIGS"][plataforma]
+            ),
+            timeout=timeout,
+            cancel_event=cancelamento_atual(),
+        )
+
+    try:
+        return crawl_scheduler.run(executar)
+    except (CrawlDeadlineExceeded, FutureTimeoutError):
+        logger.error(f"Extração de {target_name} excedeu o tempo disponível.")
+        return "Erro ao extrair: Tempo limite excedido."
+    except (CrawlCancelled, CancelledError):
+        logger.info(f"Extração de {target_name} cancelada.")
+        return "Erro ao extrair: Extração cancelada."
+    except Exception as e:
+        logger.error(f"Erro no pool de navegadores ao extrair {target_name}: {str(e)}")
+        return f"Erro ao extrair dados: {str(e)}"
+
+def extrair_paginas(paginas):
+    """Extrai várias páginas [(plataforma, url, target_name)] em uma única ida ao navegador.
+
+    As páginas abrem como abas paralelas de um mesmo crawler do pool (uma vez
+    na fila do agendador de crawls). Devolve {target_name: conteúdo}, com
+    "Erro ao extrair: ..." para as páginas que falharem. Como em
+    _extrair_via_pool, há uma segunda tentativa se o lote passar do orçamento.
+    """
+    tentativa = lambda: _extrair_paginas_uma_vez(paginas)
+    return com_hedge(
+        "crawl_many",
+        tentativa,
+        aceitavel=lambda conteudos: all(_extraiu(conteudo) for conteudo in conteudos.values()),
+        pode_disparar=crawl_scheduler.tem_vaga,
+        hedge=_hedge_na_cota(
+            sorted({plataforma for plataforma, _, _ in paginas}), tentativa,
+            lambda erro: {target_name: erro for _, _, target_name in paginas},
+        ),
+    )
+
+def _extrair_paginas_uma_vez(paginas):
+    nomes = [target_name for _, _, target_name in paginas]
+    descricao = " + ".join(nomes)
+
+    def executar(restante):
+        configs = _configuracoes_crawl4ai()
+        timeout = CRAWL_TIMEOUT if restante is None else min(CRAWL_TIMEOUT, restante)
+        lote = [(url, target_name, configs["PLATFORM_RUN_CONFIGS"][plataforma]) for plataforma, url, target_name in paginas]
+        return get_browser_pool(configs["BROWSER_CONFIG"]).submit(
+            lambda crawler: _extract_many_with_crawl4ai(lote, crawler),
+            timeout=timeout,
+            cancel_event=cancelamento_atual(),
+        )
+
+    try:
+        return crawl_scheduler.run(executar)
+    except (CrawlDeadlineExceeded, FutureTimeoutError):
+        logger.error(f"Extração de {descricao} excedeu o tempo disponível.")
+        erro = "Erro ao extrair: Tempo limite excedido."
+    except (CrawlCancelled, CancelledError):
+        logger.info(f"Extração de {descricao} cancelada.")
+        erro = "Erro ao extrair: Extração cancelada."
+    except Exception as e:
+        logger.error(f"Erro no pool de navegadores ao extrair {descricao}: {str(e)}")
+        erro = f"Erro ao extrair dados: {str(e)}"
+    return {nome: erro for nome in nomes}
+
+# Quanto tempo (s) a primeira plataforma que chega ao navegador espera a outra para abrirem juntas
+CRAWL_JOIN_WINDOW = float(os.getenv("CRAWL_JOIN_WINDOW", "2"))
+
+class _ColetaConjunta:
+    """Junta os crawls de Facebook e Google de uma mesma verificação em uma ida ao navegador.
+
+    Cada plataforma esperada ou pede a sua página (`extrair`) ou avisa que não
+    vai precisar do navegador (`desistir`: cache, backend HTTP, erro...). Quem
+    chega primeiro espera a outra por até CRAWL_JOIN_WINDOW segundos; depois
+    disso, cada uma segue com as páginas que já tiver.
+    """
+
+    def __init__(self, plataformas):
+        self._cond = threading.Condition()
+        self._esperadas = set(plataformas)
+        self._pedidos = {}
+        self._em_execucao = set()
+        self._resultados = {}
+
+    def desistir(self, plataforma):
+        with self._cond:
+            self._esperadas.discard(plataforma)
+            self._cond.notify_all()
+
+    def extrair(self, plataforma, url, target_name):
+        with self._cond:
+            self._pedidos[plataforma] = (url, target_name)
+            self._esperadas.discard(plataforma)
+            self._cond.notify_all()
+            limite = time.monotonic() + CRAWL_JOIN_WINDOW
+            while True:
+                if plataforma in self._resultados:
+                    return self._resultados[plataforma]
+                restante = limite - time.monotonic()
+                if plataforma not in self._em_execucao and (not self._esperadas or restante <= 0):
+                    lote = [p for p in self._pedidos if p not in self._resultados and p not in self._em_execucao]
+                    self._em_execucao.update(lote)
+                    break
+                self._cond.wait(restante if restante > 0 else None)
+
+        paginas = [(p, *self._pedidos[p]) for p in lote]
+        conteudos = {}
+        try:
+            if len(paginas) == 1:
+                conteudos = {target_name: _extrair_via_pool(url, target_name, plataforma)}
+            else:
+                conteudos = extrair_paginas(paginas)
+        finally:
+            with self._cond:
+                for p, _, target_name in paginas:
+                    self._resultados[p] = conteudos.get(target_name, "Erro ao extrair: Extração interrompida.")
+                self._em_execucao.difference_update(lote)
+                self._cond.notify_all()
+        return self._resultados[plataforma]
+
+_coleta_conjunta = contextvars.ContextVar("coleta_conjunta", default=None)
+
+def _extrair(plataforma, alvo, url, target_name):
+    """Extrai a página da plataforma pelo backend configurado (EXTRACTOR_BACKEND).
+
+    Antes, espera a vez na cota da plataforma. No modo "auto", o backend HTTP
+    direto é tentado primeiro e o navegador fica como alternativa. Dentro de
+    run_verification_tasks com Facebook e Google, as duas páginas abrem juntas
+    no mesmo navegador (_ColetaConjunta).
+    """
+    coleta = _coleta_conjunta.get()
+    try:
+        _aguardar_cota(plataforma)
+    except RateLimitExceeded as e:
+        logger.warning(f"Extração de {target_name} adiada: {str(e)}")
+        if coleta is not None:
+            coleta.desistir(plataforma)
+        return f"Erro ao extrair: {str(e)}"
+
+    if EXTRACTOR_BACKEND in ("auto", "http"):
+        with medir_etapa("extract_http"):
+            conteudo = extrair_via_http(plataforma, alvo)
+        if conteudo is not None or EXTRACTOR_BACKEND == "http":
+            if coleta is not None:
+                coleta.desistir(plataforma)
+            return conteudo if conteudo is not None else f"Erro ao extrair: backend HTTP sem dados para {target_name}."
+        logger.info(f"Backend HTTP sem resposta confiável para {target_name}. Usando navegador.")
+    if coleta is not None:
+        return coleta.extrair(plataforma, url, target_name)
+    return _extrair_via_pool(url, target_name, plataforma)
+
+# Endereços base das páginas consultadas (configuráveis para apontar a servidores locais no benchmark)
+FACEBOOK_ADS_LIBRARY_URL = os.getenv("FACEBOOK_ADS_LIBRARY_URL", "https://www.facebook.com/ads/library/")
+GOOGLE_ADS_TRANSPARENCY_URL = os.getenv("GOOGLE_ADS_TRANSPARENCY_URL", "https://adstransparency.google.com/")
+
 def extract_facebook_ads(instagram_username):
-    """Extrai o conteúdo da Biblioteca de Anúncios do Facebook para um dado usuário do Instagram usando Crawl4AI."""
+    """Extrai o conteúdo da Biblioteca de Anúncios do Facebook para um dado usuário do Instagram."""
     if not instagram_username:
         return ""
-    url = f"https://www.facebook.com/ads/library/?active_status=active&ad_type=all&country=BR&q={instagram_username}&search_type=keyword"
-    return asyncio.run(_extract_with_crawl4ai(url, f"Facebook Ads Library para {instagram_username}"))
+    url = f"{FACEBOOK_ADS_LIBRARY_URL}?active_status=active&ad_type=all&country=BR&q={instagram_username}&search_type=keyword"
+    return _extrair("facebook", instagram_username, url, f"Facebook Ads Library para {instagram_username}")
 
 def extract_google_ads(domain):
-    """Extrai o conteúdo do Centro de Transparência de Anúncios do Google para um dado domínio usando Crawl4AI."""
+    """Extrai o conteúdo do Centro de Transparência de Anúncios do Google para um dado domínio."""
     if not domain:
         return ""
-    url = f"https://adstransparency.google.com/?region=BR&domain={domain}"
-    return asyncio.run(_extract_with_crawl4ai(url, f"Google Ads Transparency para {domain}"))
+    url = f"{GOOGLE_ADS_TRANSPARENCY_URL}?region=BR&domain={domain}"
+    return _extrair("google", domain, url, f"Google Ads Transparency para {domain}")
+
 
+# --- Função de Análise com IA ---
 
-# --- Função de Análise com IA (Mantida como original) ---
+# Comparações amostradas do fast path com o LLM rodam fora do caminho da resposta
+FAST_PATH_SHADOW_WORKERS = int(os.getenv("FAST_PATH_SHADOW_WORKERS", "1"))
+FAST_PATH_SHADOW_MAX_PENDING = int(os.getenv("FAST_PATH_SHADOW_MAX_PENDING", "8"))  # Acima disso a amostra é descartada
+
+_comparacao_executor = ThreadPoolExecutor(
+    max_workers=FAST_PATH_SHADOW_WORKERS,
+    thread_name_prefix="comparacao-llm",
+)
+_comparacoes_pendentes = threading.BoundedSemaphore(FAST_PATH_SHADOW_MAX_PENDING)
+
+def _comparar_com_llm(plataforma, conteudo, consulta, decisao):
+    """Confere a decisão do fast path com o LLM em segundo plano (amostragem de FAST_PATH_SHADOW_RATE)."""
+    if not OPENAI_API_KEY or not fast_path_stats.deve_comparar():
+        return
+    if not _comparacoes_pendentes.acquire(blocking=False):
+        logger.info(f"Comparação do fast path para {consulta} ({plataforma}) descartada: fila cheia.")
+        return
+
+    def comparar():
+        try:
+            llm_ativo = get_analyzer().analisar(plataforma, conteudo, consulta, levantar=True)
+        except Exception:
+            return  # Erro ou 429 do LLM não é discordância; a amostra é descartada
+        finally:
+            _comparacoes_pendentes.release()
+        fast_path_stats.registrar_comparacao(plataforma, consulta, decisao, llm_ativo)
+
+    try:
+        _comparacao_executor.submit(comparar)
+    except RuntimeError:  # Executor encerrado (fim do processo)
+        _comparacoes_pendentes.release()
 
 def analyze_ads_with_ai(plataforma, conteudo, consulta):
-    """Analisa o conteúdo extraído usando CrewAI para determinar se há anúncios ativos."""
-    if not OPENAI_API_KEY:
-         logger.error("Chave API OpenAI não configurada. Análise de IA abortada.")
-         return False
+    """Analisa o conteúdo extraído para determinar se há anúncios ativos.
+
+    Páginas com marcadores inequívocos são decididas pelo fast path (src/fast_path.py);
+    apenas as incertas são enviadas ao LLM.
+    """
     if not conteudo or "Erro ao extrair" in conteudo:
         logger.warning(f"Conteúdo inválido ou erro na extração para {consulta} na plataforma {plataforma}. Análise de IA abortada.")
         return False
 
-    try:
-        logger.info(f"Iniciando análise de IA para {consulta} na plataforma {plataforma}")
-        agent = Agent(
-            role="Analista de Anúncios",
-            goal=f"Interpretar o conteúdo da página da {plataforma} para verificar se há anúncios ativos para \'{consulta}\'.",
-            backstory="Um especialista em marketing digital que analisa textos de páginas de bibliotecas de anúncios.",
-            tools=[],
-            verbose=False
-        )
+    decisao = classificar_rapido(plataforma, conteudo)
+    fast_path_stats.registrar_decisao(plataforma, decisao)
+    if decisao != UNCERTAIN:
+        logger.info(f"Fast path decidiu {decisao} para {consulta} ({plataforma}) sem chamar o LLM.")
+        _comparar_com_llm(plataforma, conteudo, consulta, decisao)
+        return decisao == ACTIVE
 
-        max_content_length = 15000
-        conteudo_limitado = conteudo[:max_content_length]
+    return _analisar_com_llm(plataforma, conteudo, consulta)
 
-        if plataforma == "facebook":
-            task_description = (
-                f"Analise o seguinte conteúdo da Biblioteca de Anúncios do Facebook e determine se existem anúncios ATIVOS para o usuário \'{consulta}\'.\n"
-                f"Conteúdo da página:\n--- INÍCIO ---\n{conteudo_limitado}\n--- FIM ---\n\n"
-                f"Procure por indicadores como 'nenhum anúncio encontrado', '0 resultados', ou a presença explícita de anúncios listados. "
-                f"Responda APENAS com 'Sim' se encontrar anúncios ativos, ou 'Não' caso contrário. Não inclua explicações."
-            )
-        else: # google
-            task_description = (
-                f"Analise o seguinte conteúdo do Centro de Transparência de Anúncios do Google e determine se existem anúncios ATIVOS para o domínio \'{consulta}\'.\n"
-                f"Conteúdo da página:\n--- INÍCIO ---\n{conteudo_limitado}\n--- FIM ---\n\n"
-                f"Procure por indicadores como 'Nenhum anúncio encontrado', 'não veiculou anúncios', ou a presença explícita de anúncios listados. "
-                f"Se o texto extraído contiver a palavra 'Verificado' pelo menos uma vez próxima ao nome do domínio ou nome de empresa, considere que há anúncios ativos vinculados ao domínio analisado. "
-                f"A presença da opção 'See all ads' também sugere que existem múltiplos anúncios disponíveis para navegação.\n"
-                f"Elementos como filtros por período (ex: 'Qualquer horário'), localização (ex: 'Onde aparecem: Brasil') e plataformas são sempre mostrados, mas não indicam diretamente a presença de anúncios.\n"
-                f"Responda APENAS com 'Sim' se encontrar anúncios ativos, ou 'Não' caso contrário. Não inclua explicações."
-            )
-
-        task = Task(
-            description=task_description,
-            expected_output="'Sim' ou 'Não'.",
-            agent=agent
-        )
+def _analisar_com_llm(plataforma, conteudo, consulta):
+    """Pergunta ao LLM (src/analyzer.py) se o conteúdo indica anúncios ativos."""
+    if not OPENAI_API_KEY:
+         logger.error("Chave API OpenAI não configurada. Análise de IA abortada.")
+         return False
+    return get_analyzer().analisar(plataforma, conteudo, consulta)
 
-        crew = Crew(
-            agents=[agent],
-            tasks=[task],
-            verbose=False
-        )
+# --- Função de Verificação QSA (Mantida como original) ---
 
-        result = crew.kickoff()
-        logger.info(f"Resultado da análise de IA para {consulta} ({plataforma}): {result}")
-        resposta_normalizada = str(result).strip().lower()
-        return resposta_normalizada == "sim"
+# Espera máxima (s) na fila da cota da ReceitaWS antes de desistir e informar o tempo estimado
+QSA_MAX_QUEUE_WAIT = float(os.getenv("QSA_MAX_QUEUE_WAIT", "30"))
+RECEITAWS_API_URL = os.getenv("RECEITAWS_API_URL", "https://www.receitaws.com.br/v1/cnpj/")
+QSA_READ_TIMEOUT = float(os.getenv("QSA_READ_TIMEOUT", "20"))
+QSA_RETRY_BACKOFF = float(os.getenv("QSA_RETRY_BACKOFF", "2"))  # Base (s) do backoff exponencial entre tentativas
+QSA_MIN_ATTEMPT_TIME = float(os.getenv("QSA_MIN_ATTEMPT_TIME", "3"))  # Não inicia tentativa com menos tempo que isso
 
-    except Exception as e:
-        logger.error(f"Erro durante a análise de IA para {consulta} ({plataforma}): {str(e)}")
-        return False
+def _espera_qsa(tentativa):
+    """Pausa antes da próxima tentativa: backoff exponencial com jitter, limitado ao prazo restante.
 
-# --- Função de Verificação QSA (Mantida como original) ---
+    Devolve None quando o prazo não comporta a pausa e mais uma tentativa.
+    """
+    espera = QSA_RETRY_BACKOFF * (2 ** tentativa) * random.uniform(0.5, 1.0)
+    restante = tempo_restante()
+    if restante is not None and restante - espera < QSA_MIN_ATTEMPT_TIME:
+        return None
+    return espera
 
 def consultar_qsa(cnpj):
-    """Consulta o QSA de um CNPJ na API da ReceitaWS."""
+    """Consulta o QSA de um CNPJ na base local (se configurada) ou na API da ReceitaWS.
+
+    A API respeita a cota via limitador de taxa. A espera na cota, o timeout de
+    leitura e as pausas entre tentativas são limitados pelo prazo restante da
+    verificação (crawl_context); sem tempo para outra tentativa, desiste com
+    "Tempo limite excedido".
+    """
     if not cnpj:
         return {"error": "CNPJ não fornecido"}
     try:
@@ -165,22 +508,46 @@ def consultar_qsa(cnpj):
         if len(cnpj_limpo) != 14:
              return {"error": "CNPJ inválido"}
 
-        url = f"https://www.receitaws.com.br/v1/cnpj/{cnpj_limpo}"
+        # Base local com os dados abertos da Receita: evita a API quando o CNPJ está lá
+        with medir_etapa("qsa_local"):
+            qsa_local = consultar_cnpj_local(cnpj_limpo)
+        if qsa_local is not None:
+            logger.info(f"QSA para CNPJ {cnpj_limpo} obtido da base local.")
+            return qsa_local
+
+        url = f"{RECEITAWS_API_URL}{cnpj_limpo}"
         logger.info(f"Consultando QSA para CNPJ: {cnpj_limpo}")
 
+        limiter = get_limiter("receitaws")
         max_retries = 3
-        delay = 60
+        sem_tempo = {"error": "Erro de conexão: Tempo limite excedido"}
         for attempt in range(max_retries):
+            restante = tempo_restante()
+            if restante is not None and restante < QSA_MIN_ATTEMPT_TIME:
+                logger.error(f"Prazo esgotado antes da tentativa {attempt + 1} de consultar QSA para CNPJ: {cnpj}")
+                return sem_tempo
+            max_wait = QSA_MAX_QUEUE_WAIT if restante is None else min(QSA_MAX_QUEUE_WAIT, restante - QSA_MIN_ATTEMPT_TIME)
+            try:
+                # Espera a vez na fila da cota da ReceitaWS; se a espera for longa demais,
+                # devolve o tempo estimado em vez de prender a thread.
+                limiter.acquire(max_wait=max_wait)
+            except RateLimitExceeded as e:
+                logger.warning(f"Consulta QSA para {cnpj_limpo} adiada: {str(e)}")
+                return {"error": f"Erro ao consultar API: {str(e)}", "retry_after": round(e.retry_after)}
+            restante = tempo_restante()
+            leitura = QSA_READ_TIMEOUT if restante is None else max(1.0, min(QSA_READ_TIMEOUT, restante))
             try:
-                response = requests.get(url, timeout=20)
+                with medir_etapa("qsa_http"):
+                    response = get_session().get(url, timeout=(HTTP_CONNECT_TIMEOUT, leitura))
                 if response.status_code == 429:
+                    retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                    limiter.penalize(retry_after)
                     if attempt < max_retries - 1:
-                        logger.warning(f"Rate limit atingido (429). Tentando novamente em {delay}s...")
-                        time.sleep(delay)
-                        delay *= 2
+                        logger.warning(f"Rate limit atingido (429). Retry-After: {retry_after:.0f}s.")
                     else:
                         logger.error("Rate limit atingido após múltiplas tentativas.")
-                        return {"error": "Erro ao consultar API: Rate limit (429) persistente."}
+                        return {"error": "Erro ao consultar API: Rate limit (429) persistente.",
+                                "retry_after": round(retry_after)}
                 elif response.status_code == 200:
                     data = response.json()
                     logger.info(f"Consulta QSA bem-sucedida para CNPJ: {cnpj_limpo}")
@@ -196,16 +563,16 @@ def consultar_qsa(cnpj):
                     return {"error": f"Erro ao consultar API: {response.status_code}"}
             except requests.exceptions.Timeout:
                  logger.error(f"Timeout na tentativa {attempt + 1} ao consultar QSA para CNPJ: {cnpj}")
-                 if attempt < max_retries - 1:
-                     time.sleep(5)
-                 else:
+                 espera = _espera_qsa(attempt) if attempt < max_retries - 1 else None
+                 if espera is None:
                      return {"error": "Erro de conexão: Timeout persistente"}
+                 time.sleep(espera)
             except requests.exceptions.RequestException as e:
                  logger.error(f"Erro na requisição QSA (tentativa {attempt + 1}) para CNPJ {cnpj}: {str(e)}")
-                 if attempt < max_retries - 1:
-                     time.sleep(5)
-                 else:
+                 espera = _espera_qsa(attempt) if attempt < max_retries - 1 else None
+                 if espera is None:
                     return {"error": f"Erro de conexão: {str(e)}"}
+                 time.sleep(espera)
 
         return {"error": "Erro ao consultar API após múltiplas tentativas."}
 
@@ -214,9 +581,219 @@ def consultar_qsa(cnpj):
         return {"error": f"Erro inesperado no servidor: {str(e)}"}
 
 
-# --- Verificações (Adaptada para usar as novas funções de extração) ---
-def run_verification_tasks(instagram_username, domain, cnpj):
-    """Executa as tarefas de verificação."""
+# --- Verificações por Fonte ---
+
+# Apenas resultados conclusivos são guardados em cache; erros sempre são refeitos.
+CACHEABLE_STATUSES = {"active", "inactive", "found"}
+
+def desfecho(resultado):
+    """Classifica o resultado para as métricas: o próprio status ou error_<tipo>."""
+    if resultado["status"] == "timeout":
+        return "error_timeout"
+    if resultado["status"] != "error":
+        return resultado["status"]
+    mensagem = (resultado.get("error") or "").lower()
+    if "tempo limite" in mensagem or "timeout" in mensagem:
+        return "error_timeout"
+    if "rate limit" in mensagem or "limite de requisições" in mensagem or (resultado.get("data") or {}).get("retry_after"):
+        return "error_rate_limited"
+    if "cancelad" in mensagem:
+        return "error_cancelled"
+    if "erro ao extrair" in mensagem or "não extraído" in mensagem:
+        return "error_extraction"
+    if "inválido" in mensagem or "não fornecido" in mensagem:
+        return "error_invalid_input"
+    return "error_other"
+
+def _com_cache(fonte, alvo, verificacao, force_refresh=False):
+    """Devolve o resultado em cache para (fonte, alvo) ou executa `verificacao` e o armazena."""
+    if not force_refresh:
+        em_cache = verification_cache.get(fonte, alvo)
+        cache_lookups.inc(fonte, "miss" if em_cache is None else "hit")
+        if em_cache is not None:
+            logger.info(f"Resultado de {fonte} para {alvo} obtido do cache: {em_cache['status']}")
+            verification_outcomes.inc(fonte, desfecho(em_cache))
+            return dict(em_cache, cached=True)
+
+    def executar():
+        # Quem assume a execução pode ter esperado outra chamada idêntica terminar
+        if not force_refresh:
+            recente = verification_cache.peek(fonte, alvo)
+            if recente is not None:
+                return dict(recente, cached=True)
+        return _registrar_resultado(fonte, alvo, verificacao(alvo))
+
+    # Chamadas simultâneas para o mesmo alvo compartilham uma única extração/consulta
+    return dict(single_flight.do(fonte, alvo, executar))
+
+def _registrar_resultado(fonte, alvo, resultado):
+    """Conta o desfecho nas métricas e guarda no cache os resultados conclusivos."""
+    verification_outcomes.inc(fonte, desfecho(resultado))
+    if resultado["status"] in CACHEABLE_STATUSES:
+        verification_cache.set(fonte, alvo, resultado)
+    return dict(resultado, cached=False)
+
+def _verificar_anuncios(plataforma, rotulo, extrator, consulta):
+    """Executa extração + análise de IA para uma plataforma de anúncios e devolve o status."""
+    logger.info(f"Iniciando verificação {rotulo} para: {consulta}")
+    conteudo = podar_conteudo(plataforma, extrator(consulta), consulta)
+    if "Erro ao extrair" in conteudo:
+        resultado = {"status": "error", "error": f"{rotulo}: {conteudo}"}
+    elif not conteudo:
+        resultado = {"status": "error", "error": f"{rotulo}: Conteúdo não extraído."}
+    else:
+        tem_anuncios = analyze_ads_with_ai(plataforma, conteudo, consulta)
+        resultado = {"status": "active" if tem_anuncios else "inactive", "error": None}
+    logger.info(f"Resultado {rotulo} para {consulta}: {resultado['status']}")
+    return resultado
+
+def _verificar_qsa(cnpj):
+    logger.info(f"Iniciando verificação QSA para: {cnpj}")
+    qsa_result = consultar_qsa(cnpj)
+    if qsa_result.get("success"):
+        resultado = {"status": "found", "data": qsa_result, "error": None}
+    else:
+        resultado = {"status": "error", "data": qsa_result,
+                     "error": f"QSA: {qsa_result.get('error', 'Erro desconhecido')}"}
+    logger.info(f"Resultado QSA para {cnpj}: {resultado['status']}")
+    return resultado
+
+def verificar_facebook_ads(instagram_username, force_refresh=False):
+    """Verifica se há anúncios ativos no Facebook/Instagram para o usuário informado."""
+    return _com_cache(
+        "facebook", instagram_username,
+        lambda alvo: _verificar_anuncios("facebook", "Facebook Ads", extract_facebook_ads, alvo),
+        force_refresh,
+    )
+
+def verificar_google_ads(domain, force_refresh=False):
+    """Verifica se há anúncios ativos no Google para o domínio informado."""
+    return _com_cache(
+        "google", domain,
+        lambda alvo: _verificar_anuncios("google", "Google Ads", extract_google_ads, alvo),
+        force_refresh,
+    )
+
+def verificar_qsa(cnpj, force_refresh=False):
+    """Consulta o QSA do CNPJ e devolve o status junto com os dados retornados."""
+    return _com_cache("qsa", cnpj, _verificar_qsa, force_refresh)
+
+
+# --- Verificação Incremental (monitoramento) ---
+
+# Rótulo e extrator de cada plataforma de anúncios
+PLATAFORMAS_ANUNCIOS = {
+    "facebook": ("Facebook Ads", extract_facebook_ads),
+    "google": ("Google Ads", extract_google_ads),
+}
+
+def hash_conteudo(conteudo):
+    """Impressão digital do conteúdo podado (exatamente o que a análise de IA receberia)."""
+    return hashlib.sha256(conteudo.encode("utf-8")).hexdigest()
+
+def reverificar_anuncios(plataforma, consulta, hash_anterior=None, status_anterior=None):
+    """Verificação incremental usada pelo monitoramento (src/watchlist.py).
+
+    Extrai e poda a página como _verificar_anuncios; se o hash do conteúdo podado
+    for igual ao da última verificação conclusiva, repete o status anterior sem
+    chamar a análise de IA. Devolve (resultado, hash, analisado).
+    """
+    rotulo, extrator = PLATAFORMAS_ANUNCIOS[plataforma]
+    conteudo = podar_conteudo(plataforma, extrator(consulta), consulta)
+    if "Erro ao extrair" in conteudo:
+        return {"status": "error", "error": f"{rotulo}: {conteudo}"}, None, False
+    if not conteudo:
+        return {"status": "error", "error": f"{rotulo}: Conteúdo não extraído."}, None, False
+    impressao = hash_conteudo(conteudo)
+    if impressao == hash_anterior and status_anterior in ("active", "inactive"):
+        logger.info(f"Conteúdo de {rotulo} para {consulta} não mudou; mantendo {status_anterior} sem análise de IA.")
+        return {"status": status_anterior, "error": None}, impressao, False
+    tem_anuncios = analyze_ads_with_ai(plataforma, conteudo, consulta)
+    return {"status": "active" if tem_anuncios else "inactive", "error": None}, impressao, True
+
+
+# --- Verificação de Anúncios em Lote (src/bulk.py) ---
+
+def preparar_anuncios(plataforma, consulta, force_refresh=False):
+    """Primeira metade da verificação de anúncios, para a análise de IA em lote.
+
+    Consulta o cache, extrai e poda a página e aplica o fast path. Devolve
+    (resultado, None) quando o status já está decidido (cache, erro de extração
+    ou fast path) e (None, conteudo) quando a página precisa do LLM; nesse caso
+    o resultado vem de concluir_anuncios, depois de analisar_anuncios_em_lote.
+    """
+    if not force_refresh:
+        em_cache = verification_cache.get(plataforma, consulta)
+        cache_lookups.inc(plataforma, "miss" if em_cache is None else "hit")
+        if em_cache is not None:
+            verification_outcomes.inc(plataforma, desfecho(em_cache))
+            return dict(em_cache, cached=True), None
+
+    rotulo, extrator = PLATAFORMAS_ANUNCIOS[plataforma]
+    conteudo = podar_conteudo(plataforma, extrator(consulta), consulta)
+    if "Erro ao extrair" in conteudo:
+        return _registrar_resultado(plataforma, consulta, {"status": "error", "error": f"{rotulo}: {conteudo}"}), None
+    if not conteudo:
+        return _registrar_resultado(
+            plataforma, consulta, {"status": "error", "error": f"{rotulo}: Conteúdo não extraído."}
+        ), None
+
+    decisao = classificar_rapido(plataforma, conteudo)
+    fast_path_stats.registrar_decisao(plataforma, decisao)
+    if decisao != UNCERTAIN:
+        logger.info(f"Fast path decidiu {decisao} para {consulta} ({plataforma}) sem chamar o LLM.")
+        _comparar_com_llm(plataforma, conteudo, consulta, decisao)
+        return concluir_anuncios(plataforma, consulta, decisao == ACTIVE), None
+    return None, conteudo
+
+def concluir_anuncios(plataforma, consulta, tem_anuncios):
+    """Segunda metade de preparar_anuncios: registra o status decidido pela análise."""
+    resultado = {"status": "active" if tem_anuncios else "inactive", "error": None}
+    logger.info(f"Resultado {PLATAFORMAS_ANUNCIOS[plataforma][0]} para {consulta}: {resultado['status']}")
+    return _registrar_resultado(plataforma, consulta, resultado)
+
+
+# --- Execução Concorrente das Verificações ---
+
+# Cada fonte roda em paralelo e tem seu próprio tempo limite (em segundos), contado
+# a partir do momento em que a tarefa sai da fila do executor.
+# O QSA pode esperar até 60s + 120s em caso de 429, por isso o limite maior.
+# Com um SLA (ex: /api/qualify), nenhuma fonte passa do SLA, contado desde a chamada;
+# quem ainda estiver na fila ou rodando no prazo volta com status "timeout" e a
+# pontuação segue sem ela.
+VERIFICATION_TIMEOUTS = {
+    "facebook": float(os.getenv("FACEBOOK_CHECK_TIMEOUT", "120")),
+    "google": float(os.getenv("GOOGLE_CHECK_TIMEOUT", "120")),
+    "qsa": float(os.getenv("QSA_CHECK_TIMEOUT", "300")),
+}
+
+# Até 3 fontes por requisição, vindas das threads do gunicorn e dos workers de jobs
+VERIFICATION_MAX_WORKERS = int(os.getenv(
+    "VERIFICATION_MAX_WORKERS",
+    str(3 * (int(os.getenv("GUNICORN_THREADS", "8")) + int(os.getenv("JOB_MAX_WORKERS", "4")))),
+))
+# Espera máxima (s) na fila do executor antes de a fonte voltar com "timeout"
+VERIFICATION_MAX_QUEUE_WAIT = float(os.getenv("VERIFICATION_MAX_QUEUE_WAIT", "60"))
+_ESPERA_FILA = 0.25  # Intervalo (s) entre verificações enquanto alguma fonte ainda está na fila
+
+# Campo de status no dicionário de resultados e rótulo usado nas mensagens de erro
+VERIFICATION_SOURCES = {
+    "facebook": ("facebook_ads_status", "Facebook Ads"),
+    "google": ("google_ads_status", "Google Ads"),
+    "qsa": ("qsa_status", "QSA"),
+}
+
+_verification_executor = ThreadPoolExecutor(
+    max_workers=VERIFICATION_MAX_WORKERS,
+    thread_name_prefix="verificacao",
+)
+
+def montar_resultados(instagram_username, domain, cnpj, resultados_por_fonte):
+    """Monta o dicionário consolidado de resultados a partir dos resultados de cada fonte.
+
+    Os resultados são aplicados na ordem fixa facebook -> google -> qsa,
+    mantendo error_messages igual à execução sequencial.
+    """
     results = {
         "instagram_username": instagram_username,
         "domain": domain,
@@ -227,52 +804,162 @@ def run_verification_tasks(instagram_username, domain, cnpj):
         "qsa_data": None,
         "error_messages": []
     }
+    for fonte in VERIFICATION_SOURCES:
+        if fonte in resultados_por_fonte:
+            _aplicar_resultado(results, fonte, resultados_por_fonte[fonte])
+    return results
 
-    # --- Verificação Facebook Ads ---
+def _aplicar_resultado(results, fonte, resultado):
+    """Copia o resultado de uma fonte para o dicionário de resultados consolidado."""
+    campo_status, _ = VERIFICATION_SOURCES[fonte]
+    results[campo_status] = resultado["status"]
+    if fonte == "qsa":
+        results["qsa_data"] = resultado.get("data")
+    if resultado.get("error"):
+        results["error_messages"].append(resultado["error"])
+
+def _resultado_com_falha(fonte, mensagem, erro_qsa, status="error"):
+    """Monta o resultado de uma fonte que não terminou (timeout ou exceção)."""
+    _, rotulo = VERIFICATION_SOURCES[fonte]
+    resultado = {"status": status, "error": f"{rotulo}: {mensagem}"}
+    if fonte == "qsa":
+        resultado["data"] = {"error": erro_qsa}
+    return resultado
+
+def _resultado_do_future(fonte, future):
+    try:
+        return future.result()
+    except Exception as e:
+        _, rotulo = VERIFICATION_SOURCES[fonte]
+        logger.error(f"Erro inesperado na verificação {rotulo}: {str(e)}")
+        return _resultado_com_falha(fonte, f"Erro inesperado: {str(e)}", f"Erro inesperado no servidor: {str(e)}")
+
+def _executar_com_prazo(limite, prazo_sla, prazos, funcao, *args, fonte=None, coleta=None):
+    """Roda a verificação com o prazo da fonte, que começa a contar agora (e não na fila).
+
+    O prazo efetivo (limitado pelo SLA) fica em `prazos[fonte]` para quem espera o resultado.
+    """
+    prazo = time.monotonic() + limite
+    if prazo_sla is not None:
+        prazo = min(prazo, prazo_sla)
+    prazos[fonte] = prazo
+    if coleta is not None:
+        _coleta_conjunta.set(coleta)
+    try:
+        with crawl_context(prazo=prazo):
+            return funcao(*args)
+    finally:
+        if coleta is not None:
+            coleta.desistir(fonte)  # Terminou sem precisar do navegador (cache, HTTP, erro...)
+
+def run_verification_tasks(instagram_username, domain, cnpj, force_refresh=False, on_progress=None, sla=None):
+    """Executa as tarefas de verificação em paralelo, cada uma com seu próprio tempo limite.
+
+    Com `force_refresh=True` o cache de resultados é ignorado e atualizado.
+    `on_progress(fonte, resultado)`, se informado, é chamado assim que cada fonte termina.
+    O limite de cada fonte (VERIFICATION_TIMEOUTS) conta a partir do início da
+    sua tarefa; `sla` (s) limita o tempo total desde a chamada, inclusive a fila.
+    Fontes que não terminam no prazo, ou que esperam na fila mais que
+    VERIFICATION_MAX_QUEUE_WAIT, voltam com status "timeout".
+    """
+    tarefas = []
     if instagram_username:
-        logger.info(f"Iniciando verificação Facebook Ads para: {instagram_username}")
-        fb_content = extract_facebook_ads(instagram_username) # Agora usa Crawl4AI
-        if "Erro ao extrair" in fb_content:
-            results["facebook_ads_status"] = "error"
-            results["error_messages"].append(f"Facebook Ads: {fb_content}")
-        elif not fb_content:
-             results["facebook_ads_status"] = "error"
-             results["error_messages"].append(f"Facebook Ads: Conteúdo não extraído.")
-        else:
-            has_fb_ads = analyze_ads_with_ai("facebook", fb_content, instagram_username)
-            results["facebook_ads_status"] = "active" if has_fb_ads else "inactive"
-        logger.info(f"Resultado Facebook Ads para {instagram_username}: {results['facebook_ads_status']}")
-
-    # --- Verificação Google Ads ---
+        tarefas.append(("facebook", verificar_facebook_ads, instagram_username))
     if domain:
-        logger.info(f"Iniciando verificação Google Ads para: {domain}")
-        google_content = extract_google_ads(domain) # Agora usa Crawl4AI
-        if "Erro ao extrair" in google_content:
-            results["google_ads_status"] = "error"
-            results["error_messages"].append(f"Google Ads: {google_content}")
-        elif not google_content:
-             results["google_ads_status"] = "error"
-             results["error_messages"].append(f"Google Ads: Conteúdo não extraído.")
-        else:
-            has_google_ads = analyze_ads_with_ai("google", google_content, domain)
-            results["google_ads_status"] = "active" if has_google_ads else "inactive"
-        logger.info(f"Resultado Google Ads para {domain}: {results['google_ads_status']}")
-
-    # --- Verificação QSA ---
+        tarefas.append(("google", verificar_google_ads, domain))
     if cnpj:
-        logger.info(f"Iniciando verificação QSA para: {cnpj}")
-        qsa_result = consultar_qsa(cnpj)
-        if qsa_result.get("success"):
-            results["qsa_status"] = "found"
-            results["qsa_data"] = qsa_result
-        else:
-            results["qsa_status"] = "error"
-            results["qsa_data"] = qsa_result
-            results["error_messages"].append(f"QSA: {qsa_result.get('error', 'Erro desconhecido')}")
-        logger.info(f"Resultado QSA para {cnpj}: {results['qsa_status']}")
+        tarefas.append(("qsa", verificar_qsa, cnpj))
+
+    inicio = time.monotonic()
+    limites = {fonte: VERIFICATION_TIMEOUTS[fonte] if sla is None else min(sla, VERIFICATION_TIMEOUTS[fonte])
+               for fonte, _, _ in tarefas}
+    prazo_sla = None if sla is None else inicio + sla
+    prazo_fila = inicio + VERIFICATION_MAX_QUEUE_WAIT
+    if prazo_sla is not None:
+        prazo_fila = min(prazo_fila, prazo_sla)
+    prazos = {}  # fonte -> prazo, preenchido quando a tarefa começa (_executar_com_prazo)
+    # Com usuário e domínio, as páginas de Facebook e Google que precisarem do navegador abrem juntas
+    coleta = _ColetaConjunta(("facebook", "google")) if instagram_username and domain else None
+    # Cada tarefa leva uma cópia do contexto (prioridade/cancelamento de quem chamou) mais o seu prazo
+    pendentes = {
+        _verification_executor.submit(contextvars.copy_context().run, _executar_com_prazo,
+                                      VERIFICATION_TIMEOUTS[fonte], prazo_sla, prazos, funcao, alvo, force_refresh,
+                                      fonte=fonte, coleta=coleta if fonte != "qsa" else None): fonte
+        for fonte, funcao, alvo in tarefas
+    }
+    resultados = {}
 
+    def concluir(fonte, resultado):
+        resultados[fonte] = resultado
+        if on_progress is not None:
+            try:
+                on_progress(fonte, resultado)
+            except Exception as e:
+                logger.error(f"Erro no callback de progresso para {fonte}: {str(e)}")
+
+    while pendentes:
+        agora = time.monotonic()
+        na_fila = any(fonte not in prazos for fonte in pendentes.values())
+        proximo_prazo = min(prazos.get(fonte, prazo_fila) for fonte in pendentes.values())
+        espera = max(0.0, proximo_prazo - agora)
+        if na_fila:
+            espera = min(espera, _ESPERA_FILA)  # O prazo de quem sair da fila ainda vai ser definido
+        concluidos, _ = wait(pendentes, timeout=espera, return_when=FIRST_COMPLETED)
+        for future in concluidos:
+            fonte = pendentes.pop(future)
+            concluir(fonte, _resultado_do_future(fonte, future))
+
+        agora = time.monotonic()
+        for future, fonte in list(pendentes.items()):
+            if fonte in prazos:
+                if agora < prazos[fonte]:
+                    continue
+                future.cancel()
+                limite = limites[fonte]
+                logger.error(f"Verificação {VERIFICATION_SOURCES[fonte][1]} excedeu o tempo limite de {limite:.0f}s.")
+                mensagem = f"Tempo limite de {limite:.0f}s excedido."
+            elif agora < prazo_fila or not future.cancel():  # Não cancela se acabou de começar
+                continue
+            else:
+                logger.error(f"Verificação {VERIFICATION_SOURCES[fonte][1]} não saiu da fila do executor a tempo.")
+                mensagem = f"Fila de verificações cheia por {agora - inicio:.0f}s."
+            del pendentes[future]
+            verification_outcomes.inc(fonte, "error_timeout")
+            concluir(fonte, _resultado_com_falha(fonte, mensagem, "Tempo limite excedido", status="timeout"))
+
+    results = montar_resultados(instagram_username, domain, cnpj, resultados)
+    logger.info(f"Verificações concluídas em {time.monotonic() - inicio:.1f}s")
     return results
 
+# --- Pré-aquecimento ---
+
+# Abre também um navegador do pool no warm-up (só faz sentido se o navegador for usado)
+WARMUP_BROWSER = os.getenv("WARMUP_BROWSER", "0").lower() in ("1", "true", "yes")
+
+def warmup(navegador=WARMUP_BROWSER):
+    """Carrega os backends pesados antes da primeira verificação (ex: post_fork do gunicorn).
+
+    Importa o Crawl4AI e monta as configurações (se o navegador puder ser usado),
+    monta os Crews do analisador e, com `navegador`, inicia um navegador do pool.
+    Falhas só são registradas: a carga sob demanda continua valendo.
+    """
+    inicio = time.perf_counter()
+    etapas = [("análise de IA", lambda: get_analyzer().preparar() if OPENAI_API_KEY else None)]
+    if EXTRACTOR_BACKEND != "http":
+        etapas.insert(0, ("Crawl4AI", _configuracoes_crawl4ai))
+        if navegador:
+            async def _abrir(crawler):
+                return None
+            etapas.append(("navegador", lambda: get_browser_pool(_configuracoes_crawl4ai()["BROWSER_CONFIG"]).submit(
+                _abrir, timeout=CRAWL_TIMEOUT)))
+    for nome, etapa in etapas:
+        try:
+            etapa()
+        except Exception as e:
+            logger.warning(f"Warm-up de {nome} falhou: {str(e)}")
+    logger.info(f"Warm-up concluído em {time.perf_counter() - inicio:.1f}s (pid {os.getpid()}).")
+
+
 # --- Bloco Principal (Exemplo de uso, se necessário para teste) ---
 # if __name__ == '__main__':
 #     # Exemplo de como chamar (requer .env com OPENAI_API_KEY)
@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+"""Monitoramento do status de anúncios de alvos acompanhados (watchlist).
+
+Cada alvo (usuário do Instagram ou domínio) é reverificado na sua cadência por
+uma thread de agendamento. A reverificação é incremental: a página é extraída
+e podada, e se o hash do conteúdo podado não mudou desde a última verificação
+conclusiva, o status anterior é mantido sem chamar a análise de IA. Só quando
+o status muda (active <-> inactive) um evento é gravado em `status_changes`,
+registrado no log e, com WATCHLIST_WEBHOOK_URL, enviado por POST.
+
+Com vários workers, cada alvo vencido é "reservado" avançando o next_check_at
+com um UPDATE condicional: só o worker que conseguiu a reserva o reverifica.
+"""
+import contextvars
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from src.cache import normalizar_alvo, verification_cache
+from src.crawl_scheduler import PRIORITY_BULK, crawl_context
+from src.http_client import get_session
+from src.metrics import watchlist_checks
+from src.models.lead import StatusChange, WatchTarget
+from src.models.user import db
+from src.persistence import registrar_verificacao
+from src.verifications import CACHEABLE_STATUSES, reverificar_anuncios
+
+logger = logging.getLogger(__name__)
+
+WATCHLIST_ENABLED = os.getenv("WATCHLIST_ENABLED", "1").lower() in ("1", "true", "yes")
+WATCHLIST_INTERVAL = int(os.getenv("WATCHLIST_INTERVAL", str(6 * 3600)))  # Cadência padrão (s)
+WATCHLIST_MIN_INTERVAL = int(os.getenv("WATCHLIST_MIN_INTERVAL", "300"))
+WATCHLIST_POLL_INTERVAL = float(os.getenv("WATCHLIST_POLL_INTERVAL", "30"))  # Procura alvos vencidos a cada N s
+WATCHLIST_BATCH_SIZE = int(os.getenv("WATCHLIST_BATCH_SIZE", "20"))
+WATCHLIST_MAX_WORKERS = int(os.getenv("WATCHLIST_MAX_WORKERS", "2"))
+WATCHLIST_WEBHOOK_URL = os.getenv("WATCHLIST_WEBHOOK_URL")
+
+# Campo do pedido -> fonte monitorada
+WATCH_FIELDS = {"instagram_username": "facebook", "domain": "google"}
+
+
+# --- Cadastro ---
+
+def _intervalo(segundos):
+    return max(WATCHLIST_MIN_INTERVAL, int(segundos or WATCHLIST_INTERVAL))
+
+
+def adicionar_alvo(fonte, alvo, intervalo=None, lead_id=None):
+    """Passa a monitorar (fonte, alvo); se já existir, reativa e atualiza a cadência."""
+    chave = normalizar_alvo(fonte, alvo)
+    registro = WatchTarget.query.filter_by(source=fonte, target=chave).first()
+    if registro is None:
+        registro = WatchTarget(source=fonte, target=chave, interval_seconds=_intervalo(intervalo),
+                               lead_id=lead_id, next_check_at=datetime.utcnow())
+        db.session.add(registro)
+    else:
+        registro.active = True
+        registro.interval_seconds = _intervalo(intervalo or registro.interval_seconds)
+        registro.lead_id = lead_id or registro.lead_id
+    db.session.commit()
+    return registro
+
+
+def remover_alvo(watch_id):
+    registro = db.session.get(WatchTarget, watch_id)
+    if registro is None:
+        return None
+    registro.active = False
+    db.session.commit()
+    return registro
+
+
+def listar_alvos(incluir_inativos=False):
+    consulta = WatchTarget.query
+    if not incluir_inativos:
+        consulta = consulta.filter_by(active=True)
+    return [registro.to_dict() for registro in consulta.order_by(WatchTarget.next_check_at).all()]
+
+
+def listar_mudancas(desde_id=0, limite=100):
+    """Mudanças de status com id maior que `desde_id` (para consulta incremental)."""
+    mudancas = (StatusChange.query.filter(StatusChange.id > desde_id)
+                .order_by(StatusChange.id).limit(limite).all())
+    return [mudanca.to_dict() for mudanca in mudancas]
+
+
+# --- Reverificação ---
+
+def _emitir(mudanca):
+    logger.info(f"Status de {mudanca['source']} para {mudanca['target']} mudou: "
+                f"{mudanca['old_status']} -> {mudanca['new_status']}")
+    if not WATCHLIST_WEBHOOK_URL:
+        return
+    try:
+        get_session().post(WATCHLIST_WEBHOOK_URL, json={"event": "ads_status_changed", **mudanca})
+    except Exception as e:
+        logger.warning(f"Erro ao enviar mudança de status ao webhook: {str(e)}")
+
+
+def reverificar(watch_id):
+    """Reverifica um alvo da watchlist; devolve a mudança de status (dict) ou None.
+
+    Precisa de um app context; a extração e a análise rodam fora da sessão do banco.
+    """
+    registro = db.session.get(WatchTarget, watch_id)
+    if registro is None or not registro.active:
+        return None
+    fonte, alvo = registro.source, registro.target
+    hash_anterior, status_anterior = registro.content_hash, registro.last_status
+    db.session.remove()  # Não segura conexão durante o crawl
+
+    with crawl_context(prioridade=PRIORITY_BULK):
+        resultado, impressao, analisado = reverificar_anuncios(fonte, alvo, hash_anterior, status_anterior)
+
+    agora = datetime.utcnow()
+    registro = db.session.get(WatchTarget, watch_id)
+    registro.last_checked_at = agora
+    mudanca = None
+    if resultado["status"] not in CACHEABLE_STATUSES:
+        registro.last_error = resultado.get("error")
+        watchlist_checks.inc(fonte, "error")
+    else:
+        registro.last_error = None
+        registro.content_hash = impressao
+        if resultado["status"] != status_anterior:
+            registro.last_status = resultado["status"]
+            registro.last_changed_at = agora
+            if status_anterior is not None:
+                evento = StatusChange(watch_target_id=registro.id, source=fonte, target=alvo,
+                                      old_status=status_anterior, new_status=resultado["status"], created_at=agora)
+                db.session.add(evento)
+                db.session.flush()
+                mudanca = evento.to_dict()
+        watchlist_checks.inc(fonte, "changed" if mudanca else ("analyzed" if analisado else "unchanged"))
+        # Quem consultar o alvo em seguida aproveita o resultado
+        verification_cache.set(fonte, alvo, resultado)
+        registrar_verificacao(fonte, alvo, resultado)
+    db.session.commit()
+
+    if mudanca is not None:
+        _emitir(mudanca)
+    return mudanca
+
+
+# --- Agendamento ---
+
+class WatchlistScheduler:
+    """Thread que procura alvos vencidos e os reverifica (uma por processo, recriada após fork)."""
+
+    def __init__(self, intervalo=WATCHLIST_POLL_INTERVAL, max_workers=WATCHLIST_MAX_WORKERS):
+        self.app = None
+        self.intervalo = intervalo
+        self.max_workers = max_workers
+        self._thread = None
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._em_andamento = set()
+
+    def garantir(self):
+        """Inicia a thread no processo atual, se a watchlist estiver ligada e ainda não houver uma."""
+        if self.app is None or not WATCHLIST_ENABLED:
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._em_andamento = set()
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="watchlist")
+            self._thread = threading.Thread(target=self._loop, name="watchlist", daemon=True)
+            self._thread.start()
+
+    def _loop(self):
+        while True:
+            try:
+                self.executar_vencidos()
+            except Exception as e:
+                logger.error(f"Erro no agendamento da watchlist: {str(e)}")
+            time.sleep(self.intervalo)
+
+    def _reservar_vencidos(self):
+        """Avança o next_check_at dos alvos vencidos; devolve os ids que este processo reservou."""
+        agora = datetime.utcnow()
+        vencidos = (WatchTarget.query
+                    .filter(WatchTarget.active.is_(True), WatchTarget.next_check_at <= agora)
+                    .order_by(WatchTarget.next_check_at).limit(WATCHLIST_BATCH_SIZE).all())
+        reservados = []
+        for registro in vencidos:
+            if registro.id in self._em_andamento:
+                continue
+            atualizados = (WatchTarget.query
+                           .filter_by(id=registro.id, next_check_at=registro.next_check_at)
+                           .update({"next_check_at": agora + timedelta(seconds=registro.interval_seconds)},
+                                   synchronize_session=False))
+            if atualizados:
+                reservados.append(registro.id)
+        db.session.commit()
+        return reservados
+
+    def executar_vencidos(self):
+        with self.app.app_context():
+            try:
+                reservados = self._reservar_vencidos()
+            finally:
+                db.session.remove()
+        for watch_id in reservados:
+            self._em_andamento.add(watch_id)
+            self._executor.submit(contextvars.copy_context().run, self._executar, watch_id)
+        return reservados
+
+    def _executar(self, watch_id):
+        with self.app.app_context():
+            try:
+                reverificar(watch_id)
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Erro ao reverificar alvo {watch_id} da watchlist: {str(e)}")
+            finally:
+                db.session.remove()
+                self._em_andamento.discard(watch_id)
+
+
+watchlist_scheduler = WatchlistScheduler()
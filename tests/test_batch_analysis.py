@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from src import batch_analysis
+from src.analyzer import AdsAnalyzer
+
+
+class _Analisador:
+    """Substitui o AdsAnalyzer: responde o lote com `resposta` (ou levanta `erro`) e conta as chamadas individuais."""
+
+    def __init__(self, resposta="", erro=None):
+        self.resposta = resposta
+        self.erro = erro
+        self.lotes = []
+        self.individuais = []
+
+    def executar_crew(self, chave, criar, inputs):
+        self.lotes.append(inputs["total"])
+        if self.erro is not None:
+            raise self.erro
+        return self.resposta
+
+    def analisar(self, plataforma, conteudo, consulta, levantar=False):
+        self.individuais.append(consulta)
+        return True
+
+
+def _itens(total):
+    return [("facebook", f"loja{numero}", f"página de loja{numero}") for numero in range(1, total + 1)]
+
+
+@pytest.fixture
+def analisador(monkeypatch):
+    analisador = _Analisador()
+    monkeypatch.setattr(batch_analysis, "OPENAI_API_KEY", "teste")
+    monkeypatch.setattr(batch_analysis, "get_analyzer", lambda: analisador)
+    return analisador
+
+
+def test_erro_na_chamada_e_levantado_sem_chamadas_individuais(analisador):
+    analisador.erro = RuntimeError("429 depois das novas tentativas")
+
+    with pytest.raises(RuntimeError):
+        batch_analysis.analisar_anuncios_em_lote(_itens(3), classificar=False)
+
+    assert analisador.lotes == [3]
+    assert analisador.individuais == []
+
+
+def test_so_itens_ilegiveis_sao_reanalisados(analisador):
+    analisador.resposta = "1: Sim\n2: talvez\n3: Não"
+
+    resultados = batch_analysis.analisar_anuncios_em_lote(_itens(3), classificar=False)
+
+    assert resultados == [True, True, False]
+    assert analisador.individuais == ["loja2"]
+
+
+def test_crew_do_lote_e_montado_uma_vez(monkeypatch):
+    class _Crew:
+        def __init__(self):
+            self.descricoes = []
+
+        def calculate_usage_metrics(self):
+            return None
+
+        def kickoff(self, inputs):
+            self.descricoes.append(batch_analysis._TAREFA_LOTE.format(**inputs))
+            return "\n".join(f"{numero}: Sim" for numero in range(1, inputs["total"] + 1))
+
+    crews = []
+
+    def criar():
+        crews.append(_Crew())
+        return crews[-1]
+
+    monkeypatch.setattr(batch_analysis, "OPENAI_API_KEY", "teste")
+    monkeypatch.setattr(batch_analysis, "_criar_crew_lote", criar)
+    monkeypatch.setattr(batch_analysis, "get_analyzer", lambda: analisador)
+    analisador = AdsAnalyzer(modo="crew")
+
+    for _ in range(3):
+        lotes = batch_analysis._montar_lotes([(i, p, c, t) for i, (p, c, t) in enumerate(_itens(4))], max_itens=2)
+        for lote in lotes:
+            assert batch_analysis._analisar_lote(lote) == {1: True, 2: True}
+
+    assert len(crews) == 1
+    assert len(crews[0].descricoes) == 6
+    assert "Responda com exatamente 2 linhas" in crews[0].descricoes[0]
+    assert "[ITEM 2]" in crews[0].descricoes[0]
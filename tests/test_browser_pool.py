@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import concurrent.futures
+import threading
+import time
+
+import pytest
+
+from src import browser_pool, latency_budget
+from src.crawl_scheduler import cancelamento_atual
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    """Pool com navegadores falsos que contam quantas vezes foram iniciados e fechados."""
+    contagem = {"start": 0, "close": 0}
+
+    async def start(pooled):
+        contagem["start"] += 1
+        pooled.crawler = object()
+        pooled.pages = 0
+        pooled.healthy = True
+
+    async def close(pooled):
+        contagem["close"] += 1
+        pooled.crawler = None
+
+    monkeypatch.setattr(browser_pool._PooledCrawler, "start", start)
+    monkeypatch.setattr(browser_pool._PooledCrawler, "close", close)
+    pool = browser_pool.BrowserPool(None, size=2, max_pages=0, max_rss_mb=0)
+    pool.contagem = contagem
+    yield pool
+    pool.shutdown(timeout=1)
+
+
+def _esperar_devolucoes(pool):
+    limite = time.monotonic() + 5
+    while pool._in_flight and time.monotonic() < limite:
+        time.sleep(0.01)
+    assert pool._in_flight == 0
+
+
+def test_cancelamento_pedido_nao_recicla_o_navegador(pool):
+    async def lento(crawler):
+        await asyncio.sleep(5)
+
+    cancelamento = threading.Event()
+    threading.Timer(0.1, cancelamento.set).start()
+    with pytest.raises(concurrent.futures.CancelledError):
+        pool.submit(lento, cancel_event=cancelamento)
+    _esperar_devolucoes(pool)
+
+    assert pool.contagem == {"start": 1, "close": 0}
+
+
+def test_timeout_recicla_o_navegador(pool):
+    async def lento(crawler):
+        await asyncio.sleep(5)
+
+    with pytest.raises(concurrent.futures.TimeoutError):
+        pool.submit(lento, timeout=0.1, cancel_event=threading.Event())
+    _esperar_devolucoes(pool)
+
+    assert pool.contagem == {"start": 2, "close": 1}
+
+
+def test_hedge_nao_reinicia_o_pool(pool, monkeypatch):
+    orcamentos = latency_budget.LatencyBudgets(min_amostras=1)
+    orcamentos.observar("crawl:teste", 0.05)
+    monkeypatch.setattr(latency_budget, "latency_budgets", orcamentos)
+    monkeypatch.setattr(latency_budget, "LATENCY_BUDGET_MIN", 0.05)
+    monkeypatch.setattr(latency_budget, "HEDGE_ENABLED", True)
+    chamadas = []
+
+    def tentativa():
+        primeira = not chamadas
+        chamadas.append(primeira)
+
+        async def job(crawler):
+            await asyncio.sleep(5 if primeira else 0.01)
+            return "primeira" if primeira else "hedge"
+
+        return pool.submit(job, cancel_event=cancelamento_atual())
+
+    assert latency_budget.com_hedge("crawl:teste", tentativa) == "hedge"
+    _esperar_devolucoes(pool)
+
+    assert chamadas == [True, False]
+    assert pool.contagem == {"start": 2, "close": 0}
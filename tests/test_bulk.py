@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+import threading
+
+from src import batch_analysis, bulk
+
+
+def _leads(total):
+    return [(numero, {"instagram_username": f"loja{numero}", "domain": ""}) for numero in range(2, total + 2)]
+
+
+def _configurar(monkeypatch, chunk):
+    chamadas = []
+    lock = threading.Lock()
+
+    def analisar_lote(lote):
+        with lock:
+            chamadas.append([consulta for _, _, consulta, _ in lote])
+        return {numero: True for numero in range(1, len(lote) + 1)}
+
+    monkeypatch.setattr(bulk, "BULK_ANALYSIS_CHUNK", chunk)
+    monkeypatch.setattr(bulk, "preparar_anuncios", lambda plataforma, alvo, force_refresh: (None, f"anúncios de {alvo}"))
+    monkeypatch.setattr(
+        bulk, "concluir_anuncios",
+        lambda plataforma, alvo, ativo: {"status": "active" if ativo else "inactive", "error": None},
+    )
+    monkeypatch.setattr(batch_analysis, "OPENAI_API_KEY", "teste")
+    monkeypatch.setattr(batch_analysis, "_analisar_lote", analisar_lote)
+    return chamadas
+
+
+def test_uma_chamada_ao_llm_por_bloco(monkeypatch):
+    chamadas = _configurar(monkeypatch, chunk=4)
+
+    resultados = list(bulk.qualificar_leads(_leads(10), concorrencia={"facebook": 3}))
+
+    assert len(resultados) == 10
+    assert all(r["verifications"]["facebook_ads_status"] == "active" for r in resultados)
+    # 10 páginas indecisas em blocos de até 4: 3 chamadas, nenhuma análise individual
+    assert sorted(len(bloco) for bloco in chamadas) == [2, 4, 4]
+    assert sorted(consulta for bloco in chamadas for consulta in bloco) == sorted(f"loja{n}" for n in range(2, 12))
+
+
+def test_bloco_incompleto_sai_quando_as_extracoes_terminam(monkeypatch):
+    chamadas = _configurar(monkeypatch, chunk=10)
+
+    resultados = list(bulk.qualificar_leads(_leads(3)))
+
+    assert len(resultados) == 3
+    assert [len(bloco) for bloco in chamadas] == [3]
+
+
+def test_falha_na_analise_vira_erro_do_bloco(monkeypatch):
+    chamadas = _configurar(monkeypatch, chunk=4)
+    individuais = []
+
+    def falhar(lote):
+        chamadas.append(len(lote))
+        raise RuntimeError("OpenAI indisponível")
+
+    monkeypatch.setattr(batch_analysis, "_analisar_lote", falhar)
+    monkeypatch.setattr(batch_analysis, "get_analyzer", lambda: individuais.append(1))
+
+    resultados = list(bulk.qualificar_leads(_leads(4)))
+
+    assert len(resultados) == 4
+    assert all(r["verifications"]["facebook_ads_status"] == "error" for r in resultados)
+    assert chamadas == [4]
+    assert individuais == []
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from src import verifications
+from src.cache import CACHE_MAX_ENTRIES, VerificationCache, normalizar_alvo
+
+
+class _Relogio:
+    def __init__(self, agora=1_000_000.0):
+        self.agora = agora
+
+    def __call__(self):
+        return self.agora
+
+
+@pytest.fixture
+def relogio():
+    return _Relogio()
+
+
+def _valor(status="active"):
+    return {"status": status, "error": None, "data": None}
+
+
+def test_ttl_por_fonte(relogio):
+    cache = VerificationCache(ttls={"facebook": 10, "qsa": 100, "google": 0}, db_path=None, relogio=relogio)
+    cache.set("facebook", "loja", _valor())
+    cache.set("qsa", "11222333000181", _valor("found"))
+    cache.set("google", "loja.com.br", _valor())
+
+    assert cache.get("google", "loja.com.br") is None  # TTL 0: nunca armazenado
+    relogio.agora += 9.9
+    assert cache.get("facebook", "loja") == _valor()
+    relogio.agora += 0.1
+    assert cache.get("facebook", "loja") is None
+    assert cache.get("qsa", "11222333000181") == _valor("found")
+    relogio.agora += 90
+    assert cache.get("qsa", "11222333000181") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_lru_descarta_o_menos_usado_acima_do_limite():
+    assert CACHE_MAX_ENTRIES == 2048
+    cache = VerificationCache(ttls={"facebook": 3600}, db_path=None)
+    for numero in range(CACHE_MAX_ENTRIES):
+        cache.set("facebook", f"loja{numero}", _valor())
+    assert cache.get("facebook", "loja0") is not None  # Passa a ser o mais recente
+
+    cache.set("facebook", "loja_nova", _valor())
+
+    assert cache.stats()["entries"] == CACHE_MAX_ENTRIES
+    assert cache.peek("facebook", "loja1") is None
+    assert cache.peek("facebook", "loja0") is not None
+    assert cache.peek("facebook", "loja_nova") is not None
+
+
+@pytest.mark.parametrize("fonte, alvo, equivalente", [
+    ("facebook", "@User", "user"),
+    ("facebook", "https://www.instagram.com/User/", "user"),
+    ("google", "https://www.x.com/", "x.com"),
+    ("google", "HTTP://X.com:8080/caminho?q=1", "x.com"),
+    ("qsa", "11.222.333/0001-81", "11222333000181"),
+])
+def test_alvos_equivalentes_usam_a_mesma_chave(fonte, alvo, equivalente):
+    assert normalizar_alvo(fonte, alvo) == normalizar_alvo(fonte, equivalente)
+
+    cache = VerificationCache(db_path=None)
+    cache.set(fonte, alvo, _valor())
+    assert cache.get(fonte, equivalente) == _valor()
+
+
+@pytest.mark.parametrize("status, armazenado", [
+    ("active", True), ("inactive", True), ("found", True),
+    ("error", False), ("timeout", False), ("not_found", False),
+])
+def test_so_resultados_conclusivos_vao_para_o_cache(monkeypatch, status, armazenado):
+    cache = VerificationCache(db_path=None)
+    monkeypatch.setattr(verifications, "verification_cache", cache)
+
+    resultado = verifications._registrar_resultado("facebook", "loja", _valor(status))
+
+    assert resultado["cached"] is False
+    assert (cache.peek("facebook", "loja") is not None) is armazenado
+    assert (status in verifications.CACHEABLE_STATUSES) is armazenado
+
+
+def test_sqlite_compartilha_o_cache_e_respeita_a_expiracao(tmp_path, relogio):
+    db = str(tmp_path / "cache.db")
+    worker_a = VerificationCache(ttls={"facebook": 10}, db_path=db, relogio=relogio)
+    worker_b = VerificationCache(ttls={"facebook": 10}, db_path=db, relogio=relogio)
+
+    worker_a.set("facebook", "@Loja", _valor())
+
+    assert worker_b.get("facebook", "loja") == _valor()
+    relogio.agora += 10
+    assert worker_b.get("facebook", "loja") is None
+    assert worker_a.get("facebook", "loja") is None
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+import os
+import threading
+
+import pytest
+
+from src import cnpj_store
+
+CNPJ = "12345678000190"
+
+
+def _csv(tmp_path, nome, linhas):
+    caminho = tmp_path / nome
+    caminho.write_text("\n".join(";".join(f'"{c}"' for c in linha) for linha in linhas), encoding="latin-1")
+    return str(caminho)
+
+
+def _arquivos(tmp_path, socios):
+    return {
+        "qualificacoes": [_csv(tmp_path, "qualificacoes.csv", [["49", "Sócio-Administrador"]])],
+        "empresas": [_csv(tmp_path, "empresas.csv", [["12345678", "EMPRESA TESTE LTDA"]])],
+        "estabelecimentos": [_csv(tmp_path, "estabelecimentos.csv", [["12345678", "0001", "90", "1", "", "02"]])],
+        "socios": [_csv(tmp_path, "socios.csv", [["12345678", "2", nome, "", "49"] for nome in socios])],
+    }
+
+
+def test_consulta_le_a_base_importada(tmp_path):
+    db = str(tmp_path / "cnpj.db")
+    cnpj_store.importar_arquivos(db, _arquivos(tmp_path, ["MARIA", "JOAO"]))
+
+    resultado = cnpj_store.CNPJStore(db).consultar(CNPJ)
+
+    assert resultado["razao_social"] == "EMPRESA TESTE LTDA"
+    assert resultado["situacao"] == "ATIVA"
+    assert sorted(s["nome"] for s in resultado["qsa"]) == ["JOAO", "MARIA"]
+    assert resultado["qsa"][0]["qual"] == "49-Sócio-Administrador"
+    assert not os.path.exists(f"{db}.importando")
+
+
+def test_reimportacao_nao_expoe_socios_pela_metade(tmp_path, monkeypatch):
+    db = str(tmp_path / "cnpj.db")
+    cnpj_store.importar_arquivos(db, _arquivos(tmp_path, ["MARIA"]))
+    store = cnpj_store.CNPJStore(db)
+    assert [s["nome"] for s in store.consultar(CNPJ)["qsa"]] == ["MARIA"]
+
+    # Pausa a reimportação depois de apagar os sócios e antes de reinseri-los
+    no_meio, continuar = threading.Event(), threading.Event()
+    linhas_originais = cnpj_store._linhas
+
+    def _linhas_pausadas(tipo, caminho):
+        if tipo == "socios":
+            no_meio.set()
+            continuar.wait(5)
+        yield from linhas_originais(tipo, caminho)
+
+    monkeypatch.setattr(cnpj_store, "_linhas", _linhas_pausadas)
+    monkeypatch.setattr(cnpj_store, "_RELEITURA_METADATA", 0)
+    arquivos = _arquivos(tmp_path, ["ANA", "PEDRO"])
+    importacao = threading.Thread(target=cnpj_store.importar_arquivos, args=(db, arquivos))
+    importacao.start()
+    try:
+        assert no_meio.wait(5)
+        assert store.importado_em is not None
+        assert [s["nome"] for s in store.consultar(CNPJ)["qsa"]] == ["MARIA"]
+    finally:
+        continuar.set()
+        importacao.join(5)
+
+    # A troca do arquivo é percebida na releitura da metadata e as conexões são reabertas
+    store.importado_em
+    assert sorted(s["nome"] for s in store.consultar(CNPJ)["qsa"]) == ["ANA", "PEDRO"]
+
+
+def test_importacao_com_erro_preserva_a_base(tmp_path, monkeypatch):
+    db = str(tmp_path / "cnpj.db")
+    cnpj_store.importar_arquivos(db, _arquivos(tmp_path, ["MARIA"]))
+
+    def _falha(tipo, caminho):
+        raise OSError("arquivo corrompido")
+        yield
+
+    monkeypatch.setattr(cnpj_store, "_linhas", _falha)
+    with pytest.raises(OSError):
+        cnpj_store.importar_arquivos(db, _arquivos(tmp_path, ["ANA"]))
+
+    assert [s["nome"] for s in cnpj_store.CNPJStore(db).consultar(CNPJ)["qsa"]] == ["MARIA"]
+    assert not os.path.exists(f"{db}.importando")
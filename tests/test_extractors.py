@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+import json
+
+import pytest
+import requests
+
+from src import extractors
+
+
+class _Sessao:
+    def __init__(self, resposta):
+        self.resposta = resposta
+
+    def get(self, *args, **kwargs):
+        return self.resposta
+
+    def post(self, *args, **kwargs):
+        return self.resposta
+
+
+def _resposta(corpo, status=200, tipo="application/json; charset=utf-8"):
+    resposta = requests.Response()
+    resposta.status_code = status
+    resposta._content = (corpo if isinstance(corpo, str) else json.dumps(corpo)).encode("utf-8")
+    if tipo:
+        resposta.headers["Content-Type"] = tipo
+    return resposta
+
+
+@pytest.fixture
+def responder(monkeypatch):
+    monkeypatch.setattr(extractors, "FACEBOOK_AD_LIBRARY_TOKEN", "token")
+
+    def configurar(resposta):
+        monkeypatch.setattr(extractors, "get_session", lambda: _Sessao(resposta))
+    return configurar
+
+
+RESPOSTAS_NAO_CONFIAVEIS = [
+    _resposta({}),  # Esquema mudou / chave ausente
+    _resposta({"1": None}),
+    _resposta({"1": "sem criativos", "data": "sem anúncios"}),
+    _resposta({"1": [1, 2], "data": ["a", "b"]}),
+    _resposta({"error": {"message": "Invalid OAuth access token", "code": 190}, "1": [], "data": []}),
+    _resposta([]),
+    _resposta("<html>Antes de continuar: consent.google.com</html>", tipo="text/html"),
+    _resposta({"1": [], "data": []}, tipo="text/html; charset=utf-8"),  # Página de captcha com JSON por acaso
+    _resposta({"1": [], "data": []}, tipo=None),
+    _resposta({"1": [], "data": []}, status=429),
+    _resposta({"1": [], "data": []}, status=302),
+    _resposta("{não é json", tipo="application/json"),
+]
+
+
+@pytest.mark.parametrize("resposta", RESPOSTAS_NAO_CONFIAVEIS)
+def test_google_cai_para_o_navegador_com_resposta_desconhecida(responder, resposta):
+    responder(resposta)
+    assert extractors.extrair_google_http("loja.com.br") is None
+
+
+@pytest.mark.parametrize("resposta", RESPOSTAS_NAO_CONFIAVEIS)
+def test_facebook_cai_para_o_navegador_com_resposta_desconhecida(responder, resposta):
+    responder(resposta)
+    assert extractors.extrair_facebook_http("loja") is None
+
+
+def test_google_sem_anuncios_so_com_lista_vazia_explicita(responder):
+    responder(_resposta({"1": []}))
+    assert extractors.extrair_google_http("loja.com.br") == "Nenhum anúncio encontrado para o domínio loja.com.br."
+
+
+def test_google_com_anuncios(responder):
+    responder(_resposta({"1": [{"1": "AR1", "12": "Loja Ltda"}, {"1": "AR2", "12": "Loja Ltda"}]}))
+    assert extractors.extrair_google_http("loja.com.br") == (
+        "2 anúncios encontrados para o domínio loja.com.br.\nAnunciante: Loja Ltda"
+    )
+
+
+def test_facebook_sem_anuncios_so_com_lista_vazia_explicita(responder):
+    responder(_resposta({"data": []}))
+    assert extractors.extrair_facebook_http("loja").startswith("0 resultados para loja.")
+
+
+def test_facebook_com_anuncios(responder):
+    responder(_resposta({"data": [{"page_name": "Loja", "ad_delivery_start_time": "2024-05-01"}],
+                         "paging": {"cursors": {}}}))
+    assert extractors.extrair_facebook_http("loja").startswith("1 resultados para loja.")
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+import json
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from src import jobs
+from src.jobs import CANCEL_ABANDONED, CANCEL_REQUESTED, CANCELLED, DONE, JobManager
+
+RAIZ = Path(__file__).resolve().parents[1]
+
+
+@pytest.fixture
+def manager(tmp_path):
+    return JobManager(max_workers=1, db_path=str(tmp_path / "jobs.db"))
+
+
+def _job_que_espera_cancelamento(manager):
+    comecou = threading.Event()
+
+    def work(job):
+        comecou.set()
+        job.cancel_event.wait(10)
+        return {"score": 0}
+
+    job = manager.submit(work, ["facebook"])
+    assert comecou.wait(5)
+    return job
+
+
+def _eventos(job):
+    """Consome o stream SSE do job até o fim; devolve [(evento, dados)]."""
+    eventos = []
+    for bloco in job.stream():
+        if bloco.startswith("event: "):
+            cabecalho, dados = bloco.strip().split("\n", 1)
+            eventos.append((cabecalho[len("event: "):], json.loads(dados[len("data: "):])))
+    return eventos
+
+
+def _em_outro_processo(db_path, codigo):
+    """Roda `codigo` em outro processo (como outro worker do gunicorn) com um JobManager no mesmo banco."""
+    preambulo = f"from src.jobs import JobManager\nmanager = JobManager(db_path={str(db_path)!r})\n"
+    saida = subprocess.run([sys.executable, "-c", preambulo + codigo], cwd=RAIZ,
+                           capture_output=True, text=True, timeout=30, check=True)
+    return json.loads(saida.stdout.strip().splitlines()[-1])
+
+
+def test_cancelamento_a_pedido_tem_motivo_proprio(manager):
+    job = _job_que_espera_cancelamento(manager)
+
+    manager.cancel(job.id)
+    eventos = _eventos(job)
+
+    job = manager.get(job.id)
+    assert job.status == CANCELLED
+    assert job.cancel_reason == CANCEL_REQUESTED
+    assert job.error == "Job cancelado a pedido do cliente."
+    assert eventos[-1] == ("cancelled", {"error": job.error, "reason": CANCEL_REQUESTED})
+
+
+def test_cancelamento_por_abandono(manager, monkeypatch):
+    monkeypatch.setattr(jobs, "JOB_ABANDON_GRACE", 0.2)
+    job = _job_que_espera_cancelamento(manager)
+
+    stream = job.stream()
+    next(stream)  # Um cliente acompanha e desconecta
+    stream.close()
+
+    for _ in range(40):  # Sem GET: consultar o status também conta como acompanhar o job
+        if manager._store.carregar(job.id)["status"] == CANCELLED:
+            break
+        time.sleep(0.1)
+    job = manager.get(job.id)
+    assert job.status == CANCELLED
+    assert job.to_dict()["cancel_reason"] == CANCEL_ABANDONED
+    assert job.error == "Job cancelado: nenhum cliente acompanhando."
+
+
+def test_job_sem_cancelamento_termina_normalmente(manager):
+    job = manager.submit(lambda job: {"score": 10}, [])
+    eventos = _eventos(job)
+
+    job = manager.get(job.id)
+    assert job.status == DONE
+    assert job.result == {"score": 10}
+    assert job.cancel_reason is None
+    assert eventos[-1] == ("done", {"score": 10})
+
+
+def test_status_eventos_e_cancelamento_em_outro_worker(manager, tmp_path):
+    liberar = threading.Event()
+
+    def work(job):
+        job.update_check("qsa", {"status": "found"})
+        liberar.wait(10)
+        job.cancel_event.wait(10)
+        return {"score": 0}
+
+    job = manager.submit(work, ["qsa", "facebook"])
+    for _ in range(50):
+        if manager.get(job.id).checks["qsa"]["status"] == "found":
+            break
+        time.sleep(0.1)
+
+    status = _em_outro_processo(tmp_path / "jobs.db", f"""
+import json
+job = manager.get({job.id!r})
+print(json.dumps(job.to_dict()))
+""")
+    assert status["status"] == "running"
+    assert status["checks"]["qsa"] == {"status": "found"}
+
+    liberar.set()
+    eventos = _em_outro_processo(tmp_path / "jobs.db", f"""
+import json
+job = manager.cancel({job.id!r})
+print(json.dumps([bloco.split("\\n", 1)[0] for bloco in manager.get({job.id!r}).stream()
+                  if bloco.startswith("event: ")]))
+""")
+    assert eventos == ["event: status", "event: check", "event: cancelled"]
+    job = manager.get(job.id)
+    assert job.status == CANCELLED
+    assert job.cancel_reason == CANCEL_REQUESTED
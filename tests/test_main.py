@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+import socket
+
+import pytest
+
+from src import main
+from src.crawl_scheduler import cancelamento_atual
+
+
+@pytest.fixture
+def conexao():
+    servidor, cliente = socket.socketpair()
+    yield servidor, cliente
+    servidor.close()
+    cliente.close()
+
+
+def test_cliente_conectado_ou_com_dados_pendentes_nao_conta_como_desconexao(conexao):
+    servidor, cliente = conexao
+
+    assert main._client_disconnected(servidor) is False
+    cliente.sendall(b"GET / HTTP/1.1\r\n")  # Próxima requisição do keep-alive
+    assert main._client_disconnected(servidor) is False
+
+
+def test_desconexao_aciona_o_cancelamento_dos_crawls(conexao, monkeypatch):
+    servidor, cliente = conexao
+    monkeypatch.setattr(main, "DISCONNECT_POLL_INTERVAL", 0.05)
+
+    with main.app.test_request_context("/api/qualify", method="POST", environ_base={"werkzeug.socket": servidor}):
+        with main.cancel_on_disconnect() as cancelamento:
+            assert cancelamento_atual() is cancelamento
+            assert not cancelamento.wait(0.2)
+            cliente.close()
+            assert cancelamento.wait(2)
+        assert cancelamento_atual() is None
+
+
+def test_sem_socket_roda_sem_cancelamento():
+    with main.app.test_request_context("/api/qualify", method="POST"):
+        with main.cancel_on_disconnect() as cancelamento:
+            assert cancelamento is None
+            assert cancelamento_atual() is None
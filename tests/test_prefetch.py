@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+
+from src.crawl_scheduler import promocao_atual
+from src.prefetch import Prefetcher
+
+
+def _esperar(condicao, limite=5):
+    fim = time.monotonic() + limite
+    while not condicao() and time.monotonic() < fim:
+        time.sleep(0.02)
+    return condicao()
+
+
+def test_pre_busca_com_erro_sai_do_registro(tmp_path):
+    prefetcher = Prefetcher(db_path=str(tmp_path / "prefetch.db"))
+    chamadas = []
+
+    def falha(alvo):
+        chamadas.append(alvo)
+        raise RuntimeError("upstream fora do ar")
+
+    assert prefetcher.iniciar("facebook", "loja.teste", falha) == "started"
+    assert _esperar(lambda: prefetcher.stats() == {"pendentes": 0, "concluidas": 0})
+    assert prefetcher.reivindicar("facebook", "loja.teste") is False
+    assert prefetcher.iniciar("facebook", "loja.teste", falha) == "started"
+    assert _esperar(lambda: len(chamadas) == 2)
+
+
+def test_pre_busca_com_timeout_sai_do_registro():
+    prefetcher = Prefetcher(db_path=None)
+    concluida = threading.Event()
+
+    def timeout(alvo):
+        concluida.set()
+        return {"status": "timeout"}
+
+    assert prefetcher.iniciar("google", "loja.com.br", timeout) == "started"
+    assert concluida.wait(5)
+    assert _esperar(lambda: prefetcher.stats()["concluidas"] == 0)
+    assert prefetcher.iniciar("google", "loja.com.br", timeout) == "started"
+
+
+def test_reivindicar_em_outro_worker_promove_a_pre_busca(tmp_path):
+    # Duas instâncias com o mesmo banco fazem o papel de dois workers do gunicorn
+    db = str(tmp_path / "prefetch.db")
+    executando, outro_worker = Prefetcher(db_path=db), Prefetcher(db_path=db)
+    promocoes, liberar = [], threading.Event()
+
+    def verificar(alvo):
+        promocoes.append(promocao_atual())
+        liberar.wait(5)
+        return {"status": "active"}
+
+    assert executando.iniciar("facebook", "@Loja.Teste", verificar) == "started"
+    assert _esperar(lambda: promocoes)
+    assert outro_worker.iniciar("facebook", "loja.teste", verificar) == "in_flight"
+
+    assert outro_worker.reivindicar("facebook", "https://instagram.com/loja.teste/") is True
+    assert promocoes[0].wait(5)
+
+    liberar.set()
+    assert _esperar(lambda: executando.stats() == {"pendentes": 0, "concluidas": 1})
+    assert outro_worker.iniciar("facebook", "loja.teste", verificar) == "done"
+    assert len(promocoes) == 1
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from src import rate_limit
+from src.rate_limit import RateLimitExceeded, SQLiteTokenBucket, TokenBucket, parse_retry_after
+
+
+class _Relogio:
+    """Relógio manual: `dormir` só avança o tempo."""
+
+    def __init__(self, agora=1_000_000.0):
+        self.agora = agora
+        self.dormidas = []
+
+    def __call__(self):
+        return self.agora
+
+    def avancar(self, segundos):
+        self.agora += segundos
+
+    def dormir(self, segundos):
+        self.dormidas.append(segundos)
+        self.avancar(segundos)
+
+
+@pytest.fixture
+def relogio():
+    return _Relogio()
+
+
+def _bucket(relogio, por_minuto=60, burst=3):
+    return TokenBucket("teste", por_minuto, burst, relogio=relogio, dormir=relogio.dormir)
+
+
+def test_rajada_passa_sem_espera_e_depois_espaca_pelo_intervalo(relogio):
+    bucket = _bucket(relogio)
+
+    assert [bucket.reserve() for _ in range(5)] == [0.0, 0.0, 0.0, 1.0, 2.0]
+
+
+def test_vagas_voltam_com_o_tempo(relogio):
+    bucket = _bucket(relogio)
+    for _ in range(3):
+        bucket.reserve()
+    assert bucket.estimate_wait() == 1.0
+
+    relogio.avancar(1.0)
+    assert bucket.estimate_wait() == 0.0
+    relogio.avancar(10.0)  # Parado por muito tempo: a rajada volta inteira, sem acumular além dela
+    assert [bucket.reserve() for _ in range(4)] == [0.0, 0.0, 0.0, 1.0]
+
+
+def test_estimativa_nao_reserva_vaga(relogio):
+    bucket = _bucket(relogio, burst=1)
+
+    assert bucket.estimate_wait() == 0.0
+    assert bucket.estimate_wait() == 0.0
+    assert bucket.reserve() == 0.0
+    assert bucket.estimate_wait() == 1.0
+
+
+def test_espera_acima_do_limite_nao_reserva(relogio):
+    bucket = _bucket(relogio, por_minuto=6, burst=1)  # Uma vaga a cada 10s
+    bucket.reserve()
+
+    with pytest.raises(RateLimitExceeded) as erro:
+        bucket.reserve(max_wait=5)
+    assert erro.value.retry_after == 10.0
+    assert bucket.estimate_wait() == 10.0
+    assert bucket.reserve(max_wait=10) == 10.0
+
+
+def test_acquire_dorme_so_o_necessario(relogio):
+    bucket = _bucket(relogio, burst=2)
+
+    assert [bucket.acquire() for _ in range(4)] == [0.0, 0.0, 1.0, 1.0]
+    assert relogio.dormidas == [1.0, 1.0]
+
+
+def test_retry_after_pausa_o_bucket(relogio):
+    bucket = _bucket(relogio)
+
+    bucket.penalize(30)
+
+    assert bucket.estimate_wait() == 30.0
+    relogio.avancar(30)
+    # Terminada a pausa, as chamadas voltam espaçadas pelo intervalo (sem rajada acumulada)
+    assert [bucket.reserve() for _ in range(3)] == [0.0, 1.0, 2.0]
+
+
+def test_limitador_por_plataforma(monkeypatch):
+    monkeypatch.setattr(rate_limit, "_limiters", {})
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_DB", None)
+    monkeypatch.setattr(rate_limit, "RATE_LIMITS", {"facebook": (6, 1), "google": (60, 2)})
+
+    facebook = rate_limit.get_limiter("facebook")
+    assert rate_limit.get_limiter("facebook") is facebook
+    google = rate_limit.get_limiter("google")
+    assert (facebook.interval, facebook.tolerance) == (10.0, 0.0)
+    assert (google.interval, google.tolerance) == (1.0, 1.0)
+
+    facebook.reserve()
+    assert facebook.estimate_wait() > 9
+    assert google.estimate_wait() == 0.0
+
+
+def test_sqlite_compartilha_a_cota_entre_processos(tmp_path, relogio):
+    # Duas instâncias com o mesmo arquivo fazem o papel de dois workers
+    db = str(tmp_path / "rate_limits.db")
+    worker_a = SQLiteTokenBucket("receitaws", 60, 2, path=db, relogio=relogio, dormir=relogio.dormir)
+    worker_b = SQLiteTokenBucket("receitaws", 60, 2, path=db, relogio=relogio, dormir=relogio.dormir)
+    outro = SQLiteTokenBucket("google", 60, 2, path=db, relogio=relogio, dormir=relogio.dormir)
+
+    assert worker_a.reserve() == 0.0
+    assert worker_b.reserve() == 0.0
+    assert worker_a.reserve() == 1.0
+    assert worker_b.estimate_wait() == 2.0
+    assert outro.estimate_wait() == 0.0
+
+    worker_b.penalize(60)
+    assert worker_a.estimate_wait() == 60.0
+    with pytest.raises(RateLimitExceeded):
+        worker_a.reserve(max_wait=30)
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("12") == 12.0
+    assert parse_retry_after("-3") == 0.0
+    assert parse_retry_after(None) == 60.0
+    assert parse_retry_after("amanhã", padrao=5.0) == 5.0
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
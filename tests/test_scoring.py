@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from src.scoring import CRITERIA_POINTS, calculate_score, determine_qualification, score_batch, what_if
+
+
+def _verificacoes(facebook="inactive", google="inactive", qsa="not_found", socios=None):
+    return {
+        "facebook_ads_status": facebook,
+        "google_ads_status": google,
+        "qsa_status": qsa,
+        "qsa_data": None if socios is None else {"qsa": socios, "razao_social": "EMPRESA LTDA"},
+    }
+
+
+_SOCIO = [{"nome": "MARIA", "qual": "49-Sócio-Administrador"}]
+
+LEADS = {
+    "cnpj_duplicado": {
+        "checklist": {"validacao_cnpj_localizado": True, "faturamento_1M_4M": True, "perfil_linkedin": True},
+        "verifications": _verificacoes(qsa="found", socios=_SOCIO),
+        "valor_inicial": 1000, "valor_atual": 0,
+    },
+    "qsa_vazio": {
+        "checklist": {"faturamento_401k_1M": True, "interesse_assessoria": True},
+        "verifications": _verificacoes(qsa="found", socios=[]),
+        "valor_inicial": 500.0, "valor_atual": 0,
+    },
+    "qsa_sem_dados": {
+        "checklist": {"interesse_assessoria": True},
+        "verifications": dict(_verificacoes(qsa="found"), qsa_data=None),
+        "valor_inicial": 500.0, "valor_atual": 0,
+    },
+    "anuncios_nos_dois": {
+        "checklist": {"faturamento_1M_4M": True, "perfil_nome_completo": True, "perfil_linkedin": True,
+                      "perfil_cargo_estrategico": True},
+        "verifications": _verificacoes(facebook="active", google="active", qsa="found", socios=_SOCIO),
+        "valor_inicial": 2000.0, "valor_atual": "5000",
+    },
+    "so_google": {
+        "checklist": {"faturamento_1M_4M": True, "interesse_assessoria": True, "perfil_linkedin": True},
+        "verifications": _verificacoes(google="active"),
+        "valor_inicial": 1200.0, "valor_atual": "1000.50",
+    },
+    "so_meta": {
+        "checklist": {"faturamento_1M_4M": True, "interesse_assessoria": True},
+        "verifications": _verificacoes(facebook="active", google="error"),
+        "valor_inicial": 800.0, "valor_atual": "",
+    },
+    "sem_anuncios": {
+        "checklist": {"faturamento_ate_100k": True, "social_sem_presenca": True},
+        "verifications": _verificacoes(facebook="not_checked", google="timeout"),
+        "valor_inicial": 300.0, "valor_atual": None,
+    },
+    # 80 pontos: faixa de multiplicador 1.0, com teto = valor_inicial como informado
+    "faixa_1_0": {
+        "checklist": {"faturamento_1M_4M": True, "interesse_assessoria": True, "social_insta_5k": True},
+        "verifications": _verificacoes(),
+        "valor_inicial": 1000, "valor_atual": "1000.01",
+    },
+    "criterio_desconhecido_e_falso": {
+        "checklist": {"nao_existe": True, "faturamento_1M_4M": False, "perfil_linkedin": "sim"},
+        "verifications": {},
+        "valor_inicial": 100.0, "valor_atual": 0,
+    },
+    "limite_comprar": {
+        "checklist": {"faturamento_1M_4M": True, "interesse_assessoria": True, "perfil_nome_completo": True,
+                      "perfil_linkedin": True, "contato_email_corp": True},
+        "verifications": _verificacoes(),
+        "valor_inicial": 1500.0, "valor_atual": "2700",
+    },
+}
+
+
+def _escalar(lead):
+    score = calculate_score(lead["checklist"], lead["verifications"])
+    return {"score": score,
+            "qualification": determine_qualification(score, lead["valor_inicial"], lead["valor_atual"])}
+
+
+def test_score_batch_igual_ao_caminho_escalar():
+    leads = list(LEADS.values())
+
+    lote = score_batch(leads)
+
+    for nome, lead, resultado in zip(LEADS, leads, lote):
+        esperado = _escalar(lead)
+        assert resultado == esperado, nome
+        assert type(resultado["qualification"]["teto"]) is type(esperado["qualification"]["teto"]), nome
+
+
+@pytest.mark.parametrize("nome, score, status", [
+    ("cnpj_duplicado", 110, "acompanhar_alto"),
+    ("qsa_vazio", 70, "descartar"),
+    ("anuncios_nos_dois", 190, "comprar"),
+    ("faixa_1_0", 80, "acompanhar_baixo"),
+    ("limite_comprar", 130, "comprar"),
+])
+def test_casos_de_referencia(nome, score, status):
+    resultado, = score_batch([LEADS[nome]])
+
+    assert resultado["score"] == score
+    assert resultado["qualification"]["status"] == status
+
+
+def test_faixa_1_0_mantem_o_valor_inicial_e_alerta():
+    qualificacao = score_batch([LEADS["faixa_1_0"]])[0]["qualification"]
+
+    assert qualificacao["teto"] == 1000 and isinstance(qualificacao["teto"], int)
+    assert qualificacao["message"] == "⚠️ Acompanhar (Teto Sugerido: R$ 1000.00)"
+    assert qualificacao["alert"].startswith("❗ Valor atual (R$ 1000.01)")
+
+
+def test_what_if_com_a_tabela_atual_igual_ao_score_batch():
+    leads = list(LEADS.values())
+    alternativa = dict(CRITERIA_POINTS, investimento_meta=40, validacao_pessoa_qsa=0)
+
+    cenarios = what_if(leads, {"atual": CRITERIA_POINTS, "alternativa": alternativa})
+
+    assert cenarios["atual"] == [resultado["score"] for resultado in score_batch(leads)]
+    assert cenarios["alternativa"] == [resultado["score"] for resultado in score_batch(leads, alternativa)]
+    assert cenarios["alternativa"] != cenarios["atual"]
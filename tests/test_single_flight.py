@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.crawl_scheduler import (
+    PRIORITY_INTERACTIVE, PRIORITY_PREFETCH, CrawlCancelled, CrawlDeadlineExceeded, crawl_context, promocao_atual,
+)
+from src.single_flight import SingleFlight
+
+
+class _Lider:
+    """Função de execução que avisa quando começou e só termina quando liberada."""
+
+    def __init__(self, resultado=None, erro=None):
+        self.resultado = resultado if resultado is not None else {"status": "active"}
+        self.erro = erro
+        self.comecou = threading.Event()
+        self.liberar = threading.Event()
+        self.chamadas = 0
+
+    def __call__(self):
+        self.chamadas += 1
+        self.comecou.set()
+        self.liberar.wait(5)
+        if self.erro is not None:
+            raise self.erro
+        return self.resultado
+
+
+def _esperar_seguidores(voo, quantidade):
+    for _ in range(200):
+        if voo.stats()["aguardando"] >= quantidade:
+            return
+        time.sleep(0.01)
+    raise AssertionError("Seguidores não entraram na espera.")
+
+
+def _com_contexto(funcao, **contexto):
+    with crawl_context(**contexto):
+        return funcao()
+
+
+@pytest.fixture
+def voo():
+    return SingleFlight(db_path=None)
+
+
+@pytest.fixture
+def executor():
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        yield executor
+
+
+def test_chamadas_simultaneas_compartilham_uma_execucao(voo, executor):
+    lider = _Lider()
+    primeira = executor.submit(voo.do, "google", "https://www.Loja.com.br/", lider)
+    assert lider.comecou.wait(5)
+    seguidores = [executor.submit(voo.do, "google", "loja.com.br", lider) for _ in range(3)]
+    _esperar_seguidores(voo, 3)
+
+    lider.liberar.set()
+
+    assert [f.result(5) for f in [primeira, *seguidores]] == [{"status": "active"}] * 4
+    assert lider.chamadas == 1
+    assert voo.stats()["compartilhadas"] == 3
+
+
+def test_excecao_do_lider_e_repassada(voo, executor):
+    erro = ValueError("upstream fora do ar")
+    lider = _Lider(erro=erro)
+    primeira = executor.submit(voo.do, "qsa", "11.222.333/0001-81", lider)
+    assert lider.comecou.wait(5)
+    seguidor = executor.submit(voo.do, "qsa", "11222333000181", lider)
+    _esperar_seguidores(voo, 1)
+
+    lider.liberar.set()
+
+    for future in (primeira, seguidor):
+        with pytest.raises(ValueError) as excinfo:
+            future.result(5)
+        assert excinfo.value is erro
+    assert lider.chamadas == 1
+
+
+def test_resultado_de_lider_cancelado_nao_e_repassado(voo, executor):
+    cancelamento = threading.Event()
+    chamadas = []
+    comecou = threading.Event()
+
+    def verificar():
+        chamadas.append(threading.current_thread().name)
+        if len(chamadas) == 1:
+            comecou.set()
+            cancelamento.wait(5)  # O job do líder é cancelado no meio da extração
+            return {"status": "error", "error": "Erro ao extrair: Extração cancelada."}
+        return {"status": "inactive"}
+
+    primeira = executor.submit(_com_contexto, lambda: voo.do("facebook", "loja", verificar),
+                               cancelamento=cancelamento)
+    assert comecou.wait(5)
+    seguidor = executor.submit(voo.do, "facebook", "@Loja", verificar)
+    _esperar_seguidores(voo, 1)
+
+    cancelamento.set()
+
+    assert primeira.result(5)["status"] == "error"
+    assert seguidor.result(5) == {"status": "inactive"}
+    assert len(chamadas) == 2
+    assert voo.stats()["retomadas"] == 1
+
+
+def test_seguidor_respeita_o_proprio_prazo_e_cancelamento(voo, executor):
+    lider = _Lider()
+    primeira = executor.submit(voo.do, "facebook", "loja", lider)
+    assert lider.comecou.wait(5)
+
+    inicio = time.monotonic()
+    with pytest.raises(CrawlDeadlineExceeded):
+        _com_contexto(lambda: voo.do("facebook", "loja", lider), prazo=time.monotonic() + 0.2)
+    assert time.monotonic() - inicio < 2
+
+    cancelamento = threading.Event()
+    seguidor = executor.submit(_com_contexto, lambda: voo.do("facebook", "loja", lider), cancelamento=cancelamento)
+    _esperar_seguidores(voo, 1)
+    cancelamento.set()
+    with pytest.raises(CrawlCancelled):
+        seguidor.result(5)
+
+    lider.liberar.set()
+    assert primeira.result(5) == {"status": "active"}
+    assert lider.chamadas == 1
+
+
+def test_seguidor_interativo_promove_a_execucao_em_andamento(voo, executor):
+    promovida = threading.Event()
+    comecou = threading.Event()
+
+    def verificar():
+        comecou.set()
+        promocao_atual().wait(5)  # O agendador de crawls acompanha este evento
+        promovida.set()
+        return {"status": "found"}
+
+    primeira = executor.submit(_com_contexto, lambda: voo.do("qsa", "11222333000181", verificar),
+                               prioridade=PRIORITY_PREFETCH)
+    assert comecou.wait(5)
+    assert not promovida.is_set()
+
+    seguidor = executor.submit(_com_contexto, lambda: voo.do("qsa", "11222333000181", verificar),
+                               prioridade=PRIORITY_INTERACTIVE)
+
+    assert promovida.wait(5)
+    assert primeira.result(5) == seguidor.result(5) == {"status": "found"}
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from src import verifications
+from src.fast_path import ACTIVE, FastPathStats
+
+
+class _AnalisadorLento:
+    def __init__(self, resposta):
+        self.resposta = resposta
+        self.liberar = threading.Event()
+        self.terminou = threading.Event()
+
+    def analisar(self, plataforma, conteudo, consulta, levantar=False):
+        try:
+            self.liberar.wait(5)
+            if isinstance(self.resposta, Exception):
+                raise self.resposta
+            return self.resposta
+        finally:
+            self.terminou.set()
+
+
+def _configurar_comparacao(monkeypatch, resposta):
+    analisador = _AnalisadorLento(resposta)
+    stats = FastPathStats(shadow_rate=1.0)
+    monkeypatch.setattr(verifications, "OPENAI_API_KEY", "teste")
+    monkeypatch.setattr(verifications, "get_analyzer", lambda: analisador)
+    monkeypatch.setattr(verifications, "fast_path_stats", stats)
+    monkeypatch.setattr(verifications, "classificar_rapido", lambda plataforma, conteudo: ACTIVE)
+    return analisador, stats
+
+
+def test_comparacao_do_fast_path_nao_bloqueia_a_resposta(monkeypatch):
+    analisador, stats = _configurar_comparacao(monkeypatch, True)
+
+    assert verifications.analyze_ads_with_ai("facebook", "conteúdo", "loja") is True
+    assert not analisador.terminou.is_set()
+
+    analisador.liberar.set()
+    assert analisador.terminou.wait(5)
+    verifications._comparacao_executor.submit(lambda: None).result(5)  # Espera o registro
+    assert stats.snapshot()["concordancia"]["facebook"]["comparacoes"] == 1
+
+
+def test_falha_do_llm_nao_conta_como_divergencia(monkeypatch):
+    analisador, stats = _configurar_comparacao(monkeypatch, RuntimeError("429 Too Many Requests"))
+    analisador.liberar.set()
+
+    assert verifications.analyze_ads_with_ai("facebook", "conteúdo", "loja") is True
+    assert analisador.terminou.wait(5)
+    verifications._comparacao_executor.submit(lambda: None).result(5)
+    assert stats.snapshot()["concordancia"] == {}
+    assert not stats.divergencias
+
+
+def test_segunda_tentativa_do_crawl_passa_pela_cota(monkeypatch):
+    from src import latency_budget
+
+    cotas = []
+    tentativas = []
+    primeira_liberada = threading.Event()
+
+    class _Cota:
+        def acquire(self, max_wait=None):
+            cotas.append(max_wait)
+
+    def extrair_uma_vez(url, target_name, plataforma):
+        tentativas.append(url)
+        if len(tentativas) == 1:
+            primeira_liberada.wait(5)  # A primeira tentativa passa do orçamento
+        return "conteúdo"
+
+    budgets = latency_budget.LatencyBudgets(min_amostras=1)
+    budgets.observar("crawl:facebook", 0.01)
+    monkeypatch.setattr(latency_budget, "latency_budgets", budgets)
+    monkeypatch.setattr(latency_budget, "LATENCY_BUDGET_MIN", 0.05)
+    monkeypatch.setattr(verifications, "get_limiter", lambda plataforma: _Cota())
+    monkeypatch.setattr(verifications, "_extrair_via_pool_uma_vez", extrair_uma_vez)
+    monkeypatch.setattr(verifications.crawl_scheduler, "tem_vaga", lambda: True)
+
+    try:
+        assert verifications._extrair_via_pool("https://exemplo", "exemplo", "facebook") == "conteúdo"
+    finally:
+        primeira_liberada.set()
+    assert len(tentativas) == 2
+    assert len(cotas) == 1  # Só a segunda tentativa; a cota da primeira é tomada em _extrair
+
+
+def _verificacao_lenta(segundos, status):
+    def verificar(alvo, force_refresh=False):
+        time.sleep(segundos)
+        return {"status": status, "error": None, "data": None}
+    return verificar
+
+
+def test_prazo_da_fonte_comeca_quando_sai_da_fila(monkeypatch):
+    # Executor saturado: as fontes rodam uma de cada vez, cada uma dentro do seu limite
+    monkeypatch.setattr(verifications, "_verification_executor", ThreadPoolExecutor(max_workers=1))
+    monkeypatch.setattr(verifications, "VERIFICATION_TIMEOUTS", {"facebook": 0.5, "google": 0.5, "qsa": 0.5})
+    monkeypatch.setattr(verifications, "verificar_facebook_ads", _verificacao_lenta(0.3, "active"))
+    monkeypatch.setattr(verifications, "verificar_google_ads", _verificacao_lenta(0.3, "inactive"))
+    monkeypatch.setattr(verifications, "verificar_qsa", _verificacao_lenta(0.3, "found"))
+
+    resultados = verifications.run_verification_tasks("loja", "loja.com.br", "11222333000181")
+
+    assert resultados["facebook_ads_status"] == "active"
+    assert resultados["google_ads_status"] == "inactive"
+    assert resultados["qsa_status"] == "found"
+
+
+def test_fonte_presa_na_fila_volta_com_timeout(monkeypatch):
+    executor = ThreadPoolExecutor(max_workers=1)
+    liberar = threading.Event()
+    executor.submit(liberar.wait, 5)  # Ocupa o único worker
+    monkeypatch.setattr(verifications, "_verification_executor", executor)
+    monkeypatch.setattr(verifications, "VERIFICATION_MAX_QUEUE_WAIT", 0.3)
+    monkeypatch.setattr(verifications, "verificar_facebook_ads", _verificacao_lenta(0, "active"))
+
+    try:
+        inicio = time.monotonic()
+        resultados = verifications.run_verification_tasks("loja", "", "")
+        assert time.monotonic() - inicio < 2
+    finally:
+        liberar.set()
+    assert resultados["facebook_ads_status"] == "timeout"